@@ -1,45 +1,323 @@
+"""
+Incremental, content-addressed backups of the ChromaDB directory.
+
+Every file is stored once under backups/objects, named by the SHA-256 of
+its content, and each snapshot is a small JSON manifest mapping paths to
+objects. Files whose size and modification time match the previous
+snapshot are not read again, so an hourly backup of an unchanged multi-GB
+store only writes a manifest. SQLite databases are copied through the
+SQLite online backup API, which gives a consistent copy while the app keeps
+writing; their -wal/-shm/-journal files are not copied.
+
+    python data/tools/backup_chromadb.py backup --compress --keep 24
+    python data/tools/backup_chromadb.py list
+    python data/tools/backup_chromadb.py restore latest --target ./chroma_db
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
 import os
 import shutil
+import sqlite3
+import tempfile
 from datetime import datetime
-import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def backup_chromadb():
+SOURCE_DIR = "./chroma_db"
+BACKUP_DIR = "./backups"
+SQLITE_HEADER = b"SQLite format 3\x00"
+SQLITE_SIDE_FILES = ('-wal', '-shm', '-journal')
+COPY_BUFFER = 1024 * 1024
+
+
+def _is_sqlite(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    except OSError:
+        return False
+
+
+def _stat_key(path):
+    """Size and mtime of a file and, for SQLite, of its write-ahead log."""
+    key = []
+    for candidate in (path, path + '-wal'):
+        try:
+            st = os.stat(candidate)
+            key += [st.st_size, st.st_mtime_ns]
+        except FileNotFoundError:
+            key += [None, None]
+    return key
+
+
+def _object_path(backup_dir, digest, compressed):
+    name = digest + ('.gz' if compressed else '')
+    return os.path.join(backup_dir, 'objects', digest[:2], name)
+
+
+def _find_object(backup_dir, digest):
+    for compressed in (False, True):
+        path = _object_path(backup_dir, digest, compressed)
+        if os.path.exists(path):
+            return path, compressed
+    return None, False
+
+
+def _store_object(backup_dir, source_path, compress):
+    """
+    Hash a file while copying it into the object store, in a single pass.
+
+    Returns:
+        (sha256, compressed) of the stored object; an object that already
+        exists is kept as is
+    """
+    tmp_dir = os.path.join(backup_dir, 'objects', 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    sha = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with open(source_path, 'rb') as src, os.fdopen(fd, 'wb') as raw:
+            out = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) if compress else raw
+            try:
+                for block in iter(lambda: src.read(COPY_BUFFER), b''):
+                    sha.update(block)
+                    out.write(block)
+            finally:
+                if compress:
+                    out.close()
+        digest = sha.hexdigest()
+        existing, existing_compressed = _find_object(backup_dir, digest)
+        if existing:
+            os.remove(tmp_path)
+            return digest, existing_compressed
+        target = _object_path(backup_dir, digest, compress)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)
+        return digest, compress
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _sqlite_snapshot(path, tmp_dir):
+    """Consistent copy of a live SQLite database through the online backup API."""
+    fd, copy_path = tempfile.mkstemp(dir=tmp_dir, suffix='.sqlite3')
+    os.close(fd)
+    source = sqlite3.connect(path, timeout=30)
+    target = sqlite3.connect(copy_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    return copy_path
+
+
+def list_snapshots(backup_dir=BACKUP_DIR):
+    """Snapshot names, oldest first."""
+    snapshot_dir = os.path.join(backup_dir, 'snapshots')
+    if not os.path.isdir(snapshot_dir):
+        return []
+    return sorted(name[:-5] for name in os.listdir(snapshot_dir) if name.endswith('.json'))
+
+
+def load_snapshot(name, backup_dir=BACKUP_DIR):
+    if name == 'latest':
+        snapshots = list_snapshots(backup_dir)
+        if not snapshots:
+            raise FileNotFoundError(f"No snapshot in {backup_dir}")
+        name = snapshots[-1]
+    with open(os.path.join(backup_dir, 'snapshots', name + '.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def backup_chromadb(source_dir=SOURCE_DIR, backup_dir=BACKUP_DIR, compress=False):
+    """
+    Take an incremental snapshot of source_dir.
+
+    Args:
+        source_dir: ChromaDB directory
+        backup_dir: Directory holding the object store and snapshot manifests
+        compress: Gzip objects written by this snapshot
+
+    Returns:
+        Name of the snapshot, or None on failure
+    """
     try:
-        source_dir = "./chroma_db"
         if not os.path.exists(source_dir):
             logger.error(f"Source directory {source_dir} does not exist")
-            return False
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_dir = f"./backups/chromadb_{timestamp}"
-        
-        os.makedirs(os.path.dirname(backup_dir), exist_ok=True)
-        shutil.copytree(source_dir, backup_dir)
-        
-        logger.info(f"Successfully backed up ChromaDB to {backup_dir}")
-        return True
+            return None
+
+        snapshots = list_snapshots(backup_dir)
+        previous = load_snapshot(snapshots[-1], backup_dir)['files'] if snapshots else {}
+        tmp_dir = os.path.join(backup_dir, 'objects', 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        files = {}
+        stored = reused = 0
+        for root, _, names in os.walk(source_dir):
+            for filename in sorted(names):
+                path = os.path.join(root, filename)
+                relative = os.path.relpath(path, source_dir).replace(os.sep, '/')
+                if filename.endswith(SQLITE_SIDE_FILES) or os.path.islink(path):
+                    continue
+                stat_key = _stat_key(path)
+                before = previous.get(relative)
+                if before and before.get('stat') == stat_key and \
+                        _find_object(backup_dir, before['sha256'])[0]:
+                    files[relative] = before
+                    reused += 1
+                    continue
+
+                sqlite = _is_sqlite(path)
+                copy_path = _sqlite_snapshot(path, tmp_dir) if sqlite else path
+                try:
+                    digest, compressed = _store_object(backup_dir, copy_path, compress)
+                    size = os.path.getsize(copy_path)
+                finally:
+                    if sqlite:
+                        os.remove(copy_path)
+                files[relative] = {
+                    'sha256': digest,
+                    'size': size,
+                    'stat': stat_key,
+                    'sqlite': sqlite,
+                    'compressed': compressed
+                }
+                stored += 1
+
+        name = datetime.now().strftime("chromadb_%Y%m%d_%H%M%S")
+        suffix = 0
+        while name + (f"_{suffix}" if suffix else '') in snapshots:
+            suffix += 1
+        name += f"_{suffix}" if suffix else ''
+        manifest = {'name': name, 'created': datetime.now().isoformat(), 'files': files}
+
+        snapshot_dir = os.path.join(backup_dir, 'snapshots')
+        os.makedirs(snapshot_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=snapshot_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, os.path.join(snapshot_dir, name + '.json'))
+
+        logger.info(
+            f"Backed up ChromaDB to snapshot {name}: "
+            f"{stored} files stored, {reused} unchanged files reused"
+        )
+        return name
     except Exception as e:
         logger.error(f"Error backing up ChromaDB: {str(e)}")
-        return False
+        return None
+
+
+def restore_chromadb(snapshot='latest', target_dir=SOURCE_DIR, backup_dir=BACKUP_DIR):
+    """
+    Restore a snapshot into target_dir, verifying every file against its hash.
+
+    The snapshot is materialized next to target_dir and swapped in at the
+    end; an existing target_dir is kept as target_dir.before-restore-<time>.
+    Stop the app before restoring.
 
-def cleanup_old_backups(max_backups=5):
+    Returns:
+        Path of the previous directory moved aside, or None
+    """
+    manifest = load_snapshot(snapshot, backup_dir)
+    target_dir = os.path.abspath(target_dir)
+    staging = target_dir + '.restore-tmp'
+    if os.path.exists(staging):
+        shutil.rmtree(staging)
+
+    for relative, entry in manifest['files'].items():
+        object_path, compressed = _find_object(backup_dir, entry['sha256'])
+        if object_path is None:
+            raise FileNotFoundError(f"Missing object {entry['sha256']} for {relative}")
+        destination = os.path.join(staging, *relative.split('/'))
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        sha = hashlib.sha256()
+        opener = gzip.open if compressed else open
+        with opener(object_path, 'rb') as src, open(destination, 'wb') as dst:
+            for block in iter(lambda: src.read(COPY_BUFFER), b''):
+                sha.update(block)
+                dst.write(block)
+        if sha.hexdigest() != entry['sha256']:
+            raise ValueError(f"Corrupted object for {relative}")
+
+    moved = None
+    if os.path.exists(target_dir):
+        moved = f"{target_dir}.before-restore-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        os.replace(target_dir, moved)
+    os.replace(staging, target_dir)
+    logger.info(f"Restored snapshot {manifest['name']} to {target_dir}")
+    return moved
+
+
+def cleanup_old_backups(max_backups=5, backup_dir=BACKUP_DIR):
+    """Keep the max_backups newest snapshots and delete objects no snapshot uses."""
     try:
-        backup_dir = "./backups"
-        if not os.path.exists(backup_dir):
-            return
-        
-        backups = [os.path.join(backup_dir, d) for d in os.listdir(backup_dir)]
-        backups.sort(key=lambda x: os.path.getctime(x), reverse=True)
-        
-        for backup in backups[max_backups:]:
-            shutil.rmtree(backup)
-            logger.info(f"Removed old backup: {backup}")
+        snapshots = list_snapshots(backup_dir)
+        for name in snapshots[:-max_backups] if max_backups else snapshots:
+            os.remove(os.path.join(backup_dir, 'snapshots', name + '.json'))
+            logger.info(f"Removed old snapshot: {name}")
+
+        referenced = set()
+        for name in list_snapshots(backup_dir):
+            files = load_snapshot(name, backup_dir)['files']
+            referenced.update(entry['sha256'] for entry in files.values())
+
+        removed = 0
+        objects_dir = os.path.join(backup_dir, 'objects')
+        for root, dirs, names in os.walk(objects_dir):
+            # Files still being written by a running backup
+            dirs[:] = [d for d in dirs if d != 'tmp']
+            for filename in names:
+                digest = filename[:-3] if filename.endswith('.gz') else filename
+                if digest not in referenced:
+                    os.remove(os.path.join(root, filename))
+                    removed += 1
+        if removed:
+            logger.info(f"Removed {removed} unreferenced objects")
     except Exception as e:
         logger.error(f"Error cleaning up old backups: {str(e)}")
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental ChromaDB backups.")
+    parser.add_argument('--backup-dir', default=BACKUP_DIR)
+    commands = parser.add_subparsers(dest='command')
+
+    backup = commands.add_parser('backup', help="take a snapshot (default command)")
+    backup.add_argument('--source', default=SOURCE_DIR)
+    backup.add_argument('--compress', action='store_true', help="gzip new objects")
+    backup.add_argument('--keep', type=int, default=5, help="number of snapshots to keep")
+
+    restore = commands.add_parser('restore', help="restore a snapshot")
+    restore.add_argument('snapshot', nargs='?', default='latest')
+    restore.add_argument('--target', default=SOURCE_DIR)
+
+    commands.add_parser('list', help="list snapshots")
+    prune = commands.add_parser('prune', help="delete old snapshots and unused objects")
+    prune.add_argument('--keep', type=int, default=5)
+
+    args = parser.parse_args(argv)
+    if args.command == 'restore':
+        restore_chromadb(args.snapshot, args.target, args.backup_dir)
+    elif args.command == 'list':
+        for name in list_snapshots(args.backup_dir):
+            print(name)
+    elif args.command == 'prune':
+        cleanup_old_backups(args.keep, args.backup_dir)
+    else:
+        source = getattr(args, 'source', SOURCE_DIR)
+        if backup_chromadb(source, args.backup_dir, getattr(args, 'compress', False)):
+            cleanup_old_backups(getattr(args, 'keep', 5), args.backup_dir)
+        else:
+            raise SystemExit(1)
+
+
 if __name__ == "__main__":
-    if backup_chromadb():
-        cleanup_old_backups()
\ No newline at end of file
+    main()
@@ -1,6 +1,35 @@
+import argparse
 import json
 import os
+import random
+import re
 from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+# Channel directory -> channel_name, as in data/youtube_transcripts
+CHANNELS = {
+    "Lex_Fridman": "Lex Fridman",
+    "Andrew_Huberman": "Andrew Huberman",
+    "The_Diary_Of_A_CEO": "The Diary Of A CEO",
+}
+
+CORPUS_SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+TOPICS = [
+    "sleep", "dopamine", "artificial intelligence", "consciousness", "nutrition", "exercise",
+    "focus", "stress", "habits", "relationships", "startups", "money", "history", "physics",
+    "creativity", "longevity", "meditation", "leadership", "learning", "memory"
+]
+# Rare names and acronyms, useful to exercise exact lexical matching
+ENTITIES = [
+    "DOGE", "Claude", "GPT-4", "Neuralink", "SpaceX", "creatine", "melatonin", "Tesla",
+    "OpenAI", "ketamine", "Ozempic", "Bitcoin", "NASA", "CRISPR", "Stoicism"
+]
+FILLER = (
+    "you know I think that the really what is and so it's a kind of like we were talking about "
+    "when people actually do this because there is something very important here right"
+).split()
+
 
 def generate_sample_transcript(channel: str, episode_number: int, date: datetime):
     return {
@@ -15,7 +44,125 @@ def generate_sample_transcript(channel: str, episode_number: int, date: datetime
         }
     }
 
+
+def _segment_text(rng: random.Random, topics: List[str]) -> str:
+    words = []
+    for _ in range(rng.randint(4, 9)):
+        roll = rng.random()
+        if roll < 0.15:
+            words.append(rng.choice(topics))
+        elif roll < 0.18:
+            words.append(rng.choice(ENTITIES))
+        else:
+            words.append(rng.choice(FILLER))
+    return " ".join(words)
+
+
+def generate_episode(
+    channel_name: str,
+    episode_number: int,
+    date: datetime,
+    rng: random.Random,
+    segments: int = 300
+) -> Dict[str, Any]:
+    """
+    Generate one episode in the schema written by the transcript downloader.
+
+    Args:
+        channel_name: Display name stored in metadata.channel_name
+        episode_number: Episode number, used in the title and video ID
+        date: Publication date
+        rng: Random generator, seeded for reproducible corpora
+        segments: Number of transcript segments (about 6 words each)
+
+    Returns:
+        Dictionary with metadata, transcript segments and full_text
+    """
+    topics = rng.sample(TOPICS, 3)
+    guest = rng.choice(ENTITIES)
+    title = f"{guest}: {topics[0].title()} and {topics[1].title()} | #{episode_number}"
+    transcript = []
+    start = 0.0
+    for _ in range(segments):
+        duration = round(rng.uniform(1.5, 5.0), 3)
+        transcript.append({
+            "text": _segment_text(rng, topics),
+            "start": round(start, 3),
+            "duration": duration
+        })
+        start += duration * 0.8
+    return {
+        "metadata": {
+            "video_id": f"{rng.getrandbits(48):012x}",
+            "channel_name": channel_name,
+            "video_title": title,
+            "published_at": date.strftime("%Y-%m-%d"),
+            "view_count": f"{rng.randint(10_000, 5_000_000):,}",
+            "like_count": f"{rng.randint(100, 100_000):,}",
+            "comment_count": f"{rng.randint(10, 20_000):,}"
+        },
+        "transcript": transcript,
+        "full_text": " ".join(segment["text"] for segment in transcript)
+    }
+
+
+def generate_corpus(
+    output_dir: str,
+    episodes: int,
+    segments: int = 300,
+    seed: int = 0,
+    start_date: datetime = datetime(2024, 12, 31)
+) -> List[str]:
+    """
+    Write a synthetic corpus laid out like data/youtube_transcripts.
+
+    Episodes are spread round-robin over the channels, one day apart per channel.
+
+    Returns:
+        Paths of the written transcript files
+    """
+    rng = random.Random(seed)
+    channel_dirs = list(CHANNELS)
+    paths = []
+    for channel_dir in channel_dirs:
+        os.makedirs(os.path.join(output_dir, channel_dir), exist_ok=True)
+
+    for i in range(episodes):
+        channel_dir = channel_dirs[i % len(channel_dirs)]
+        date = start_date - timedelta(days=i // len(channel_dirs))
+        episode = generate_episode(CHANNELS[channel_dir], i + 1, date, rng, segments)
+        slug = re.sub(r"[^a-z0-9]+", "_", episode["metadata"]["video_title"].lower())[:50]
+        filename = f"{date.strftime('%Y-%m-%d')}_{i:06d}_{slug.strip('_')}.json"
+        path = os.path.join(output_dir, channel_dir, filename)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(episode, f)
+        paths.append(path)
+    return paths
+
+
 def main():
+    parser = argparse.ArgumentParser(
+        description="Write sample transcripts, or a synthetic corpus with --size."
+    )
+    parser.add_argument(
+        "--size",
+        help="Synthetic corpus size: 1k, 10k, 100k or an explicit count of episodes"
+    )
+    parser.add_argument(
+        "--output",
+        default=os.path.join(os.path.dirname(__file__), "..", "synthetic_transcripts"),
+        help="Synthetic corpus directory, laid out like data/youtube_transcripts"
+    )
+    parser.add_argument("--segments", type=int, default=300, help="Segments per episode")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.size:
+        episodes = CORPUS_SIZES.get(args.size) or int(args.size)
+        paths = generate_corpus(args.output, episodes, segments=args.segments, seed=args.seed)
+        print(f"Wrote {len(paths)} episodes to {os.path.abspath(args.output)}")
+        return
+
     channels = ["Lex Fridman", "Huberman Lab", "DOAC"]
     base_path = os.path.join(os.path.dirname(__file__), "..", "youtube_transcripts")
     
@@ -33,5 +180,6 @@ def main():
             
             date -= timedelta(days=7)  # One episode per week
 
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
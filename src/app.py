@@ -1,109 +1,112 @@
 import streamlit as st
 import os
-import json
 from dotenv import load_dotenv
-from openai import OpenAI
-from chromadb import PersistentClient
 import logging
-import hashlib
-from typing import Dict, Any, Tuple, List
+from typing import Any, Callable, Dict, Optional, Tuple
 from ui_components import UIComponents
-from query_processor import QueryProcessor
-import concurrent.futures
+from ingestion import hash_file
+from ingest_worker import MAX_ATTEMPTS, SYNC_JOB, IngestWorker, JobQueue, WriterLock
+from query_cache import QueryCache
+from resources import registry
+from factory import (
+    HEALTH_CHECK_INTERVAL, INGEST_LOCK_FILENAME, INGEST_QUEUE_FILENAME, VECTOR_STORE,
+    chroma_path, create_ingestor, get_chroma_client, get_collection, get_embedding_service,
+    get_lexical_index, get_openai_client, get_query_processor, get_tracer, get_transcript_store
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Controls that change the answer and therefore belong to the query cache key
+CACHE_CONTROL_KEYS = (
+    'max_sources', 'min_relevance', 'podcast_sources', 'response_style', 'date_range'
+)
+NO_RESULTS_MESSAGE = (
+    "No relevant results found. Try lowering the relevance threshold or rephrasing your query."
+)
+# Port of the Prometheus text endpoint (http://host:METRICS_PORT/metrics)
+METRICS_PORT = os.getenv('METRICS_PORT')
+
+
+def create_query_cache() -> QueryCache:
+    """Query cache shared by every session and rerun."""
+    return QueryCache(
+        max_entries=int(os.getenv('QUERY_CACHE_SIZE', 256)),
+        ttl_seconds=float(os.getenv('QUERY_CACHE_TTL', 3600)),
+        semantic_distance=float(os.getenv('QUERY_CACHE_SEMANTIC_DISTANCE', 0.03))
+    )
+
+
 class PodcastInsightsApp:
     def __init__(self):
         # Load environment variables
         load_dotenv()
-        
-        # Initialize clients
-        self.chroma_client = PersistentClient(path="./chroma_db")
-        self.openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        
+
+        # Long-lived clients are created once per process and reused across reruns
+        self.chroma_client = get_chroma_client() if VECTOR_STORE == 'chroma' else None
+        self.openai_client = get_openai_client()
+        self.embedding_service = get_embedding_service()
+        self.transcript_store = get_transcript_store()
+
         # Initialize components
-        self.ui = UIComponents()
+        self.ui = UIComponents(self.transcript_store)
         self.query_processor = None
+        self.query_cache = registry.get('query_cache', create_query_cache)
+        self.ingest_queue = registry.get(
+            'ingest_queue', lambda: JobQueue(chroma_path(INGEST_QUEUE_FILENAME))
+        )
+        self.tracer = get_tracer(METRICS_PORT)
+        self.lexical_index = get_lexical_index()
 
     @staticmethod
     def generate_hash(file_path):
         """Generate a hash for a file to check if it's already processed."""
-        with open(file_path, 'rb') as f:
-            return hashlib.md5(f.read()).hexdigest()
+        return hash_file(file_path)
+
+    def start_ingest_worker(self) -> IngestWorker:
+        """Start this process's ingest worker and queue a first sync."""
+        self.ingest_queue.enqueue(SYNC_JOB)
+        return IngestWorker(
+            create_ingestor,
+            self.ingest_queue,
+            WriterLock(chroma_path(INGEST_LOCK_FILENAME)),
+            max_attempts=int(os.getenv('INGEST_MAX_ATTEMPTS', MAX_ATTEMPTS))
+        ).start()
 
-    def load_transcripts(self):
-        """Load transcripts into ChromaDB with caching."""
+    def ensure_ingest_worker(self) -> IngestWorker:
+        """This process's ingest worker, restarted if its thread died."""
+        return registry.get(
+            'ingest_worker',
+            self.start_ingest_worker,
+            health_check=lambda worker: worker.running,
+            health_interval=HEALTH_CHECK_INTERVAL
+        )
+
+    def load_transcripts(self, timeout: Optional[float] = None):
+        """
+        Queue a transcript sync and wait for it to run; whichever process
+        holds the writer lock (this one's worker or a standalone one) runs it.
+        """
         try:
-            collection = self.chroma_client.get_or_create_collection("youtube_transcripts")
-            if collection.count() > 0:
-                st.info("Transcripts already loaded in ChromaDB. Skipping loading.")
-                return collection
-            
-            # Base path setup
-            base_path = os.path.join(os.getcwd(), "youtube_transcripts")
-            logger.info(f"Loading transcripts from: {base_path}")
-            if not os.path.exists(base_path):
-                st.error(f"Directory {base_path} does not exist. Please check the path.")
-                return collection
-
-            documents, metadatas, ids = [], [], []
-            cache = {}
-
-            def process_file(file_path, channel, filename):
-                file_hash = self.generate_hash(file_path)
-                if cache.get(file_hash):
-                    logger.info(f"File {filename} already processed. Skipping.")
-                    return None
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        transcript_data = json.load(f)
-                    text = transcript_data.get('text', '')
-                    metadata = {
-                        'channel': channel,
-                        'filename': filename,
-                        'title': filename.split('.json')[0],
-                        'date': filename.split('_')[0]
-                    }
-                    cache[file_hash] = True
-                    return text, metadata, f"{channel}_{filename}"
-                except Exception as e:
-                    logger.error(f"Error processing {file_path}: {e}")
-                    return None
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-                futures = []
-                for channel in os.listdir(base_path):
-                    channel_path = os.path.join(base_path, channel)
-                    if not os.path.exists(channel_path):
-                        continue
-                    for filename in os.listdir(channel_path):
-                        if filename.endswith('.json'):
-                            file_path = os.path.join(channel_path, filename)
-                            futures.append(executor.submit(process_file, file_path, channel, filename))
-            
-            for future in concurrent.futures.as_completed(futures):
-                result = future.result()
-                if result:
-                    text, metadata, doc_id = result
-                    documents.append(text)
-                    metadatas.append(metadata)
-                    ids.append(doc_id)
-            
-            # Add documents to ChromaDB in batches
-            if documents:
-                BATCH_SIZE = 100
-                for i in range(0, len(documents), BATCH_SIZE):
-                    collection.add(
-                        documents=documents[i:i + BATCH_SIZE],
-                        metadatas=metadatas[i:i + BATCH_SIZE],
-                        ids=ids[i:i + BATCH_SIZE]
-                    )
-                st.success(f"Successfully loaded {len(documents)} transcripts into ChromaDB")
-            
-            return collection
+            self.ensure_ingest_worker()
+            job = self.ingest_queue.wait(self.ingest_queue.enqueue(SYNC_JOB), timeout=timeout)
+            if job['status'] == 'failed':
+                raise RuntimeError(job['error'])
+            stats = job['result'] or {}
+            if stats.get('generation') is not None:
+                self.query_cache.set_generation(stats['generation'])
+
+            if stats.get('added') or stats.get('updated') or stats.get('removed'):
+                st.success(
+                    f"Synced transcripts into ChromaDB: {stats['added']} added, "
+                    f"{stats['updated']} updated, {stats['removed']} removed "
+                    f"({stats['chunks']} chunks)"
+                )
+            if stats.get('failed'):
+                st.warning(f"{stats['failed']} transcript files could not be processed.")
+
+            return get_collection()
         except Exception as e:
             logger.error(f"Error loading transcripts: {e}")
             st.error(f"Error loading transcripts: {str(e)}")
@@ -113,51 +116,145 @@ class PodcastInsightsApp:
         """Setup application state."""
         self.ui.setup_page()
         self.ui.render_header()
-        
+
         try:
-            # Load transcripts if needed
-            collection = self.chroma_client.get_collection("youtube_transcripts")
-            if collection.count() == 0:
-                st.warning("Loading transcripts into ChromaDB...")
-                collection = self.load_transcripts()
-            
-            self.query_processor = QueryProcessor(collection, self.openai_client)
+            # Ingestion runs on a background worker started once per process, so
+            # queries are served from the existing index while it syncs;
+            # reloading queues another sync job
+            self.ensure_ingest_worker()
+            if st.sidebar.button("Reload transcripts"):
+                self.ingest_queue.enqueue(SYNC_JOB)
+
+            job = self.ingest_queue.latest(SYNC_JOB)
+            self.ui.render_ingest_status(job)
+            if job and job['result'] and job['result'].get('generation') is not None:
+                self.query_cache.set_generation(job['result']['generation'])
+
+            collection = get_collection()
+            if job and job['status'] in ('queued', 'running') and collection.count() == 0:
+                st.info("Transcripts are being loaded in the background; results will "
+                        "appear as episodes are indexed.")
+            self.query_processor = get_query_processor()
             return True
         except Exception as e:
             st.error(f"Error initializing application: {str(e)}")
             logger.error(f"Setup error: {e}")
             return False
 
-    def process_query(self, query: str, controls: Dict[str, Any]) -> Tuple[list, Dict[str, Any], str]:
-        """Process user query with improved results handling."""
+    def search(self, query: str, controls: Dict[str, Any]) -> Tuple[list, Dict[str, Any]]:
+        """Retrieve and score results for a query without generating an answer."""
+        logger.info(f"Processing query: {query}")
+        logger.info(f"Controls: {controls}")
+
+        return self.query_processor.process_query(
+            query=query,
+            max_results=controls['max_sources'],
+            min_relevance=controls['min_relevance'],
+            channels=controls['podcast_sources'],
+            response_style=controls.get('response_style'),
+            date_range=controls.get('date_range')
+        )
+
+    def _cache_lookup(self, query: str, controls: Dict[str, Any]):
+        """Return the cached (results, analysis, response) for a query, if any."""
+        cache_controls = {k: controls.get(k) for k in CACHE_CONTROL_KEYS}
+        trace = self.tracer.start('cache_lookup')
         try:
-            logger.info(f"Processing query: {query}")
-            logger.info(f"Controls: {controls}")
-            
-            results, analysis = self.query_processor.process_query(
-                query=query,
-                max_results=controls['max_sources'],
-                min_relevance=controls['min_relevance'],
-                channels=controls['podcast_sources'],
-                response_style=controls['response_style']
-            )
-            
+            with trace.span('cache_lookup') as span:
+                cached, tier = self.query_cache.lookup(
+                    query,
+                    cache_controls,
+                    embedding=lambda: self.embedding_service.embed(query)
+                )
+                span.set(tier=tier)
+        except Exception as e:
+            self.tracer.finish(trace, e)
+            raise
+        trace.set(tier=tier)
+        self.tracer.finish(trace)
+        self.tracer.metrics.increment('cache_lookups_total', tier=tier)
+        if cached:
+            logger.info(f"Query cache hit: {self.query_cache.stats()}")
+        return cached
+
+    def _cache_store(
+        self,
+        query: str,
+        controls: Dict[str, Any],
+        results: list,
+        analysis: Dict[str, Any],
+        response: str
+    ):
+        """Cache a completed answer under its query and controls."""
+        cache_controls = {k: controls.get(k) for k in CACHE_CONTROL_KEYS}
+        self.query_cache.put(
+            query,
+            cache_controls,
+            (results, analysis, response),
+            embedding=self.embedding_service.embed(query)
+        )
+
+    def process_query(
+        self,
+        query: str,
+        controls: Dict[str, Any],
+        respond: Optional[Callable[[list, Dict[str, Any]], str]] = None
+    ) -> Tuple[list, Dict[str, Any], str]:
+        """
+        Answer a query, serving repeated ones from the query cache.
+
+        Args:
+            query: User's query string
+            controls: UI controls; those in CACHE_CONTROL_KEYS are part of the cache key
+            respond: Turns the retrieved (results, analysis) into the answer,
+                e.g. by streaming it to the page; defaults to generate_response
+
+        Returns:
+            Tuple of (results, analysis, response)
+        """
+        try:
+            cached = self._cache_lookup(query, controls)
+            if cached:
+                return cached
+
+            with st.spinner('Searching...'):
+                results, analysis = self.search(query, controls)
+
             if not results:
                 logger.warning("No relevant results found for the query.")
-                return [], {}, "No relevant results found. Try lowering the relevance threshold or rephrasing your query."
+                return [], {}, NO_RESULTS_MESSAGE
 
-            response = self.query_processor.generate_response(
-                query=query, 
-                results=results,
-                query_analysis=analysis
-            )
-            
+            if respond is None:
+                response = self.query_processor.generate_response(
+                    query=query,
+                    results=results,
+                    query_analysis=analysis
+                )
+            else:
+                response = respond(results, analysis)
+            logger.info(f"Query timings: {analysis.get('timings')}")
+            logger.info(f"Prompt context: {analysis.get('context')}")
+            logger.info(f"Query trace: {analysis.get('trace', {}).get('trace_id')}")
+
+            self._cache_store(query, controls, results, analysis, response)
             return results, analysis, response
         except Exception as e:
             logger.error(f"Query processing error: {e}")
             st.error(f"Query processing error: {str(e)}")
             raise
 
+    def _stream_answer(self, query: str, results: list, analysis: Dict[str, Any]) -> str:
+        """Show the sources, then stream the answer as tokens arrive."""
+        self.ui.display_sources(results)
+        st.markdown("### Answer")
+        return self.ui.render_stream(
+            self.query_processor.generate_response_stream(
+                query=query,
+                results=results,
+                query_analysis=analysis
+            )
+        )
+
     def run(self):
         """Run the application."""
         if not self.setup():
@@ -166,35 +263,50 @@ class PodcastInsightsApp:
         try:
             # Get user input
             controls = self.ui.create_controls()
-            
+
             # Process query if provided and search clicked
             if controls['query'] and controls['search_clicked']:
-                with st.spinner('Analyzing...'):
-                    try:
-                        results, analysis, response = self.process_query(
-                            query=controls['query'],
-                            controls={k: v for k, v in controls.items() if k not in ['query', 'search_clicked']}
-                        )
-                        
-                        # Display results
-                        st.markdown(f"### Your Question\n{controls['query']}")
+                try:
+                    query = controls['query']
+                    query_controls = {
+                        k: v for k, v in controls.items() if k not in ['query', 'search_clicked']
+                    }
+                    st.markdown(f"### Your Question\n{query}")
+
+                    streamed = []
+
+                    def respond(results, analysis):
+                        streamed.append(True)
+                        return self._stream_answer(query, results, analysis)
+
+                    results, analysis, response = self.process_query(
+                        query, query_controls, respond=respond
+                    )
+                    if not results:
                         st.markdown("### Answer")
                         st.markdown(response)
-                        
-                        if controls.get('show_metadata', False):
-                            st.markdown("### Detailed Results")
-                            self.ui.display_results(
-                                results,
-                                analysis,
-                                show_confidence=True
-                            )
-                    except Exception as e:
-                        st.error(f"Error processing query: {str(e)}")
-                        logger.error(f"Query processing error: {e}", exc_info=True)
+                        return
+                    if not streamed:
+                        self.ui.display_sources(results)
+                        st.markdown("### Answer")
+                        st.markdown(response)
+                        st.caption("Served from cache")
+
+                    if controls.get('show_metadata', False):
+                        st.markdown("### Detailed Results")
+                        self.ui.display_results(
+                            results,
+                            analysis,
+                            show_confidence=True
+                        )
+                except Exception as e:
+                    st.error(f"Error processing query: {str(e)}")
+                    logger.error(f"Query processing error: {e}", exc_info=True)
         except Exception as e:
             st.error("An unexpected error occurred. Please try again later.")
             logger.error(f"Runtime error: {e}", exc_info=True)
 
+
 if __name__ == "__main__":
     app = PodcastInsightsApp()
-    app.run()
\ No newline at end of file
+    app.run()
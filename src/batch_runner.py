@@ -0,0 +1,319 @@
+"""
+Offline batch question answering over a JSONL file of queries.
+
+Each input line is a JSON object with a "query" and optionally an "id" and
+the controls accepted by QueryProcessor.process_query (max_results,
+min_relevance, channels, date_range, response_style). Results are appended
+to an output JSONL file as they complete, so an interrupted run resumes
+where it stopped:
+
+    python -m src.batch_runner questions.jsonl answers.jsonl --workers 4
+"""
+import argparse
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from .filters import build_where_filter
+    from .query_processor import QueryProcessor
+except ImportError:  # imported from src/ by `python src/batch_runner.py`
+    from filters import build_where_filter
+    from query_processor import QueryProcessor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_WORKERS = 4
+# Controls of an input record forwarded to process_query
+QUERY_CONTROLS = ('max_results', 'min_relevance', 'channels', 'date_range', 'response_style')
+
+
+def normalize_query(query: str) -> str:
+    return ' '.join(query.lower().split())
+
+
+def question_key(question: Dict[str, Any]) -> str:
+    """Deduplication key: the normalized query and the controls changing its answer."""
+    controls = {k: question.get(k) for k in QUERY_CONTROLS if question.get(k) is not None}
+    return json.dumps([normalize_query(question['query']), controls], sort_keys=True, default=str)
+
+
+def load_questions(path: str) -> List[Dict[str, Any]]:
+    """
+    Read the input JSONL file; lines without an id are numbered by position.
+
+    Raises:
+        ValueError: On a line that is not a JSON object with a query
+    """
+    questions = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON: {e}")
+            if not isinstance(record, dict) or not str(record.get('query', '')).strip():
+                raise ValueError(f"{path}:{line_number}: expected an object with a 'query'")
+            record.setdefault('id', f"line-{line_number}")
+            record['id'] = str(record['id'])
+            questions.append(record)
+    return questions
+
+
+def load_completed(path: str) -> Set[str]:
+    """Ids already answered in an existing output file; failed ones are retried."""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line cut short by an interruption
+                continue
+            if record.get('status') == 'ok':
+                completed.add(record['id'])
+    return completed
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def _summarize_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    metadata = result.get('metadata', {})
+    return {
+        'title': metadata.get('title'),
+        'channel': metadata.get('channel'),
+        'published_at': metadata.get('published_at'),
+        'relevance_score': float(result['relevance_score']),
+        'excerpt': result.get('excerpt') or result.get('content')
+    }
+
+
+class BatchRunner:
+    """
+    Answers a list of questions with bulk retrieval and bounded parallelism.
+
+    Unique pending questions are grouped by their filter and retrieved in
+    batches: one embedding request and one multi-embedding collection.query
+    per batch. Query analysis and answer generation then run on a thread pool
+    of `workers` threads, and every finished question is appended to the
+    output file immediately.
+    """
+
+    def __init__(
+        self,
+        processor: QueryProcessor,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        workers: int = DEFAULT_WORKERS,
+        generate: bool = True
+    ):
+        """
+        Initialize BatchRunner.
+
+        Args:
+            processor: Query processor answering the questions
+            batch_size: Maximum number of queries retrieved together
+            workers: Maximum number of questions analysed and answered at once
+            generate: Generate an answer, or only record the retrieved sources
+        """
+        self.processor = processor
+        self.batch_size = batch_size
+        self.workers = workers
+        self.generate = generate
+        self._write_lock = threading.Lock()
+
+    def _batches(
+        self,
+        questions: Iterable[Dict[str, Any]]
+    ) -> Iterable[Tuple[int, Optional[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """Group questions by candidate count and filter, in chunks of batch_size."""
+        groups: Dict[str, Tuple[int, Optional[Dict[str, Any]], List[Dict[str, Any]]]] = {}
+        for question in questions:
+            n_results = int(question.get('max_results', 5)) * 2
+            where = build_where_filter(question.get('channels'), question.get('date_range'))
+            group_key = json.dumps([n_results, where], sort_keys=True, default=str)
+            groups.setdefault(group_key, (n_results, where, []))[2].append(question)
+        for n_results, where, members in groups.values():
+            for i in range(0, len(members), self.batch_size):
+                yield n_results, where, members[i:i + self.batch_size]
+
+    def answer(
+        self,
+        question: Dict[str, Any],
+        candidates: Dict[str, Any],
+        retrieval_timings: Dict[str, float],
+        batch_size: int = 1
+    ) -> Dict[str, Any]:
+        """
+        Analyse, score and answer one question from its retrieved candidates.
+
+        Retrieval timings cover the whole batch and are reported with a
+        "batch_" prefix next to the batch size.
+        """
+        start = time.perf_counter()
+        controls = {k: question[k] for k in QUERY_CONTROLS if question.get(k) is not None}
+        results, analysis = self.processor.process_query(
+            question['query'], candidates=candidates, **controls
+        )
+        answer = None
+        if self.generate and results:
+            generation_start = time.perf_counter()
+            answer = self.processor.generate_response(question['query'], results, analysis)
+            analysis['timings']['generation_ms'] = (time.perf_counter() - generation_start) * 1000
+        timings = dict(analysis.get('timings', {}))
+        timings.update({f"batch_{k}": v for k, v in retrieval_timings.items()})
+        timings['total_ms'] = (time.perf_counter() - start) * 1000
+        return {
+            'query_type': analysis.get('query_type'),
+            'answer': answer,
+            'sources': [_summarize_result(r) for r in results],
+            'timings': timings,
+            'batch_size': batch_size,
+            'trace_id': analysis.get('trace', {}).get('trace_id')
+        }
+
+    def run(
+        self,
+        questions: List[Dict[str, Any]],
+        output_path: str,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, int]:
+        """
+        Answer the questions not yet answered in output_path.
+
+        Args:
+            questions: Records from load_questions
+            output_path: JSONL file the results are appended to
+            progress: Optional callback receiving (done, total) unique questions
+
+        Returns:
+            Counts of answered, failed, skipped (already answered) and
+            duplicate questions
+        """
+        completed = load_completed(output_path)
+        pending = [q for q in questions if q['id'] not in completed]
+        stats = {
+            'answered': 0, 'failed': 0, 'skipped': len(questions) - len(pending), 'duplicates': 0
+        }
+
+        # Repeated questions are answered once and the result written for each id
+        unique: Dict[str, List[Dict[str, Any]]] = {}
+        for question in pending:
+            unique.setdefault(question_key(question), []).append(question)
+        stats['duplicates'] = len(pending) - len(unique)
+        representatives = [group[0] for group in unique.values()]
+        done = 0
+
+        with open(output_path, 'a', encoding='utf-8') as output, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            if output.tell() and not _ends_with_newline(output_path):
+                # Terminate a line cut short by an interruption
+                output.write('\n')
+            for n_results, where, batch in self._batches(representatives):
+                retrieval_timings: Dict[str, float] = {}
+                try:
+                    candidates = self.processor.retrieve_candidates_many(
+                        [q['query'] for q in batch], n_results, retrieval_timings, where
+                    )
+                except Exception as e:
+                    logger.error(f"Batch retrieval failed for {len(batch)} queries: {e}")
+                    for question in batch:
+                        stats['failed'] += self._write(
+                            output, unique[question_key(question)], error=e
+                        )
+                    done += len(batch)
+                    if progress:
+                        progress(done, len(unique))
+                    continue
+
+                futures = {
+                    executor.submit(
+                        self.answer, question, question_candidates, retrieval_timings, len(batch)
+                    ): question
+                    for question, question_candidates in zip(batch, candidates)
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    group = unique[question_key(futures[future])]
+                    try:
+                        count = self._write(output, group, result=future.result())
+                        stats['answered'] += count
+                    except Exception as e:
+                        logger.error(f"Question {futures[future]['id']} failed: {e}")
+                        stats['failed'] += self._write(output, group, error=e)
+                    done += 1
+                    if progress:
+                        progress(done, len(unique))
+
+        logger.info(f"Batch run finished: {stats}")
+        return stats
+
+    def _write(
+        self,
+        output,
+        group: List[Dict[str, Any]],
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[BaseException] = None
+    ) -> int:
+        """Append one record per question of a duplicate group; returns the count."""
+        with self._write_lock:
+            for i, question in enumerate(group):
+                record = {'id': question['id'], 'query': question['query']}
+                if error is not None:
+                    record.update(status='error', error=f"{type(error).__name__}: {error}")
+                else:
+                    record.update(status='ok', **result)
+                if i:
+                    record['duplicate_of'] = group[0]['id']
+                output.write(json.dumps(record, default=str, ensure_ascii=False) + '\n')
+            output.flush()
+        return len(group)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions in batch.")
+    parser.add_argument('input', help="JSONL file with one {\"query\": ...} object per line")
+    parser.add_argument('output', help="JSONL file receiving the answers; reused to resume")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument(
+        '--no-answer', action='store_true', help="only retrieve and score sources"
+    )
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        from .factory import get_query_processor
+    except ImportError:
+        from factory import get_query_processor
+
+    questions = load_questions(args.input)
+    runner = BatchRunner(
+        get_query_processor(),
+        batch_size=args.batch_size,
+        workers=args.workers,
+        generate=not args.no_answer
+    )
+    stats = runner.run(
+        questions,
+        args.output,
+        progress=lambda done, total: logger.info(f"{done}/{total} questions done")
+    )
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import bisect
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+try:
+    from .filters import date_to_int
+except ImportError:  # imported from src/ by `streamlit run src/app.py`
+    from filters import date_to_int
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_TOKENS = 256
+DEFAULT_CHUNK_STRIDE = 192
+# Bump when chunk IDs, text or metadata change so ingestion rebuilds every file
+CHUNK_SCHEMA_VERSION = 2
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for chunk sizing (one token per word)."""
+    return len(text.split())
+
+
+def make_chunk_id(episode_id: str, chunk_index: int) -> str:
+    """Build the stable ChromaDB ID of a chunk within an episode."""
+    return f"{episode_id}::{chunk_index:05d}"
+
+
+def channel_name(channel_dir: str, source: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Channel name stored with chunks and matched by the channel filter.
+
+    The transcript's metadata.channel_name wins; without it the directory
+    name is used with underscores read as spaces (Lex_Fridman -> Lex Fridman).
+    """
+    return (source or {}).get('channel_name') or channel_dir.replace('_', ' ')
+
+
+def episode_metadata(
+    transcript_data: Dict[str, Any], channel: str, filename: str
+) -> Dict[str, Any]:
+    """
+    Build the episode-level metadata shared by every chunk of a transcript.
+
+    Args:
+        transcript_data: Parsed transcript file ({metadata, transcript, full_text})
+        channel: Channel directory name
+        filename: Transcript file name
+
+    Returns:
+        Metadata dictionary with ChromaDB-compatible (scalar) values
+    """
+    source = transcript_data.get('metadata') or {}
+    date = filename.split('_')[0]
+    published_at = source.get('published_at') or date
+    return {
+        'channel': channel_name(channel, source),
+        'filename': filename,
+        'title': source.get('video_title') or filename.split('.json')[0],
+        'date': date,
+        'published_at': published_at,
+        # Sortable integer (YYYYMMDD, 0 if unknown) for date range filters
+        'published_at_int': date_to_int(published_at) or 0,
+        'video_id': source.get('video_id') or '',
+        'episode_id': f"{channel}_{filename}",
+    }
+
+
+class TranscriptChunker:
+    """
+    Groups timestamped transcript segments into overlapping windows.
+    """
+
+    def __init__(
+        self, chunk_tokens: int = DEFAULT_CHUNK_TOKENS, stride: int = DEFAULT_CHUNK_STRIDE
+    ):
+        """
+        Initialize TranscriptChunker.
+
+        Args:
+            chunk_tokens: Target number of tokens per chunk
+            stride: Number of tokens between the starts of consecutive chunks;
+                a stride smaller than chunk_tokens makes chunks overlap
+        """
+        if chunk_tokens <= 0:
+            raise ValueError("chunk_tokens must be positive")
+        if not 0 < stride <= chunk_tokens:
+            raise ValueError("stride must be between 1 and chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.stride = stride
+
+    def chunk_segments(self, segments: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Split transcript segments into overlapping windows.
+
+        Args:
+            segments: Segments of the form {text, start, duration}
+
+        Yields:
+            Windows with text, start/end seconds, segment range and token count
+        """
+        texts: List[str] = []
+        starts: List[float] = []
+        ends: List[float] = []
+        offsets = [0]  # cumulative token counts, offsets[i] = tokens before segment i
+        for segment in segments:
+            text = ' '.join(str(segment.get('text', '')).split())
+            if not text:
+                continue
+            start = float(segment.get('start', 0.0))
+            texts.append(text)
+            starts.append(start)
+            ends.append(start + float(segment.get('duration', 0.0)))
+            offsets.append(offsets[-1] + estimate_tokens(text))
+
+        count = len(texts)
+        first = 0
+        while first < count:
+            # Smallest end index whose window reaches the token target
+            last = bisect.bisect_left(offsets, offsets[first] + self.chunk_tokens, lo=first + 1)
+            last = min(max(last, first + 1), count)
+            yield {
+                'text': ' '.join(texts[first:last]),
+                'start': starts[first],
+                'end': max(ends[first:last]),
+                'seg_start': first,
+                'seg_end': last,
+                'token_count': offsets[last] - offsets[first],
+            }
+            if last >= count:
+                break
+            # Advance by at least one segment and at most up to the window end
+            next_first = bisect.bisect_left(offsets, offsets[first] + self.stride, lo=first + 1)
+            first = min(max(next_first, first + 1), last)
+
+    def _records(
+        self,
+        windows: Iterator[Dict[str, Any]],
+        transcript_data: Callable[[], Dict[str, Any]],
+        channel: str,
+        filename: str
+    ) -> Iterator[Dict[str, Any]]:
+        base_metadata = None
+        for index, window in enumerate(windows):
+            if base_metadata is None:
+                # Resolved lazily: a streaming reader only knows the episode
+                # metadata once every segment has been consumed
+                base_metadata = episode_metadata(transcript_data(), channel, filename)
+            metadata = dict(base_metadata)
+            metadata.update({
+                'chunk_index': index,
+                'start': window['start'],
+                'end': window['end'],
+                'seg_start': window['seg_start'],
+                'seg_end': window['seg_end'],
+                'token_count': window['token_count'],
+            })
+            yield {
+                'id': make_chunk_id(base_metadata['episode_id'], index),
+                'document': window['text'],
+                'metadata': metadata,
+            }
+
+    def chunk_transcript(
+        self,
+        transcript_data: Dict[str, Any],
+        channel: str,
+        filename: str
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Chunk a parsed transcript file into ChromaDB-ready records.
+
+        Args:
+            transcript_data: Parsed transcript file
+            channel: Channel directory name
+            filename: Transcript file name
+
+        Yields:
+            Dictionaries with 'id', 'document' and 'metadata' keys
+        """
+        segments = transcript_data.get('transcript')
+        if not segments:
+            # Legacy single-text transcripts become one untimed segment
+            text = transcript_data.get('full_text') or transcript_data.get('text') or ''
+            segments = [{'text': text, 'start': 0.0, 'duration': 0.0}]
+        windows = self.chunk_segments(segments)
+        return self._records(windows, lambda: transcript_data, channel, filename)
+
+    def chunk_reader(self, reader, channel: str, filename: str) -> Iterator[Dict[str, Any]]:
+        """
+        Chunk a transcript streamed by a TranscriptReader.
+
+        Args:
+            reader: TranscriptReader over the transcript file
+            channel: Channel directory name
+            filename: Transcript file name
+
+        Yields:
+            Dictionaries with 'id', 'document' and 'metadata' keys
+        """
+        produced = False
+        windows = self.chunk_segments(reader.iter_segments())
+        records = self._records(windows, lambda: {'metadata': reader.metadata}, channel, filename)
+        for record in records:
+            produced = True
+            yield record
+        if not produced and reader.untimed_text:
+            yield from self.chunk_transcript(
+                {'metadata': reader.metadata, 'text': reader.untimed_text}, channel, filename
+            )
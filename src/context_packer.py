@@ -0,0 +1,238 @@
+import logging
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+try:
+    from .query_classifier import _content_words
+except ImportError:  # imported from src/ by `streamlit run src/app.py`
+    from query_classifier import _content_words
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_BUDGET = 1500
+DEFAULT_PASSAGE_TOKENS = 400
+# Passages that would be trimmed below this size are left out instead
+MIN_PASSAGE_TOKENS = 40
+# Words per pseudo-sentence for unpunctuated auto-generated transcripts
+FALLBACK_SENTENCE_WORDS = 30
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _load_encoder() -> Optional[Callable[[str], List[int]]]:
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base").encode
+    except Exception:
+        logger.info("tiktoken is unavailable; estimating token counts from text length")
+        return None
+
+
+_encode = _load_encoder()
+
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens with tiktoken, or estimate about four characters per token."""
+    if not text:
+        return 0
+    if _encode is not None:
+        return len(_encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text at sentence boundaries.
+
+    Auto-generated transcripts often have no punctuation; runs without a
+    sentence end are cut into fixed-size word groups instead.
+    """
+    sentences = []
+    for part in _SENTENCE_END.split(' '.join(text.split())):
+        words = part.split()
+        if len(words) <= FALLBACK_SENTENCE_WORDS * 2:
+            if words:
+                sentences.append(part)
+            continue
+        for i in range(0, len(words), FALLBACK_SENTENCE_WORDS):
+            sentences.append(' '.join(words[i:i + FALLBACK_SENTENCE_WORDS]))
+    return sentences
+
+
+def _word_overlap(head: List[str], tail: List[str]) -> int:
+    """Length of the longest suffix of head that is a prefix of tail."""
+    for size in range(min(len(head), len(tail)), 0, -1):
+        if head[-size:] == tail[:size]:
+            return size
+    return 0
+
+
+def stitch_passages(texts: Sequence[str]) -> str:
+    """
+    Join consecutive chunks of an episode, dropping the words each one
+    repeats from the end of the previous one.
+    """
+    words: List[str] = []
+    for text in texts:
+        following = text.split()
+        words += following[_word_overlap(words[-len(following):], following):]
+    return ' '.join(words)
+
+
+class ContextPacker:
+    """
+    Packs the best passages of a result set into a fixed prompt token budget.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = DEFAULT_CONTEXT_BUDGET,
+        max_passage_tokens: int = DEFAULT_PASSAGE_TOKENS,
+        min_passage_tokens: int = MIN_PASSAGE_TOKENS
+    ):
+        """
+        Initialize ContextPacker.
+
+        Args:
+            token_budget: Maximum tokens of packed context, headers included
+            max_passage_tokens: Maximum tokens kept from a single result
+            min_passage_tokens: Smallest trimmed passage worth including
+        """
+        self.token_budget = token_budget
+        self.max_passage_tokens = max_passage_tokens
+        self.min_passage_tokens = min_passage_tokens
+
+    @staticmethod
+    def _text(result: Dict[str, Any]) -> str:
+        content = result.get('content', '')
+        if isinstance(content, dict):
+            return str(content.get('text', ''))
+        return content if isinstance(content, str) else str(content)
+
+    @staticmethod
+    def _header(index: int, metadata: Dict[str, Any]) -> str:
+        title = metadata.get('title', 'Unknown Title')
+        channel = metadata.get('channel', 'Unknown Channel')
+        published_at = metadata.get('published_at', 'Unknown Date')
+        return f"[{index}] {title} | {channel} | {published_at}"
+
+    def _best_window(self, sentences: List[str], terms: set, max_tokens: int) -> str:
+        """Return the contiguous run of whole sentences within max_tokens with most query terms."""
+        tokens = [count_tokens(s) for s in sentences]
+        hits = [len(terms.intersection(_WORD.findall(s.lower()))) for s in sentences]
+        best, best_hits = (0, 0), -1
+        start, window_tokens, window_hits = 0, 0, 0
+        for end, (size, hit) in enumerate(zip(tokens, hits)):
+            window_tokens += size
+            window_hits += hit
+            while window_tokens > max_tokens and start <= end:
+                window_tokens -= tokens[start]
+                window_hits -= hits[start]
+                start += 1
+            if start <= end and window_hits > best_hits:
+                best, best_hits = (start, end + 1), window_hits
+        return ' '.join(sentences[best[0]:best[1]])
+
+    def _remove_overlap(
+        self,
+        words: List[str],
+        metadata: Dict[str, Any],
+        selected: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Drop words already packed from an overlapping chunk of the same episode."""
+        episode = metadata.get('episode_id')
+        if not episode:
+            return words
+        for passage in selected:
+            other = passage['metadata']
+            if other.get('episode_id') != episode:
+                continue
+            if other.get('seg_end', 0) < metadata.get('seg_start', 0) or \
+                    metadata.get('seg_end', 0) < other.get('seg_start', 0):
+                continue
+            packed = passage['words']
+            if len(words) <= len(packed) and any(
+                packed[i:i + len(words)] == words for i in range(len(packed) - len(words) + 1)
+            ):
+                return []
+            head = _word_overlap(packed, words)
+            if head:
+                words = words[head:]
+            tail = _word_overlap(words, packed)
+            if tail:
+                words = words[:-tail]
+        return words
+
+    def pack(self, query: str, results: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Select, deduplicate and trim passages to fit the token budget.
+
+        Results are taken by decreasing relevance score. Exact duplicates are
+        skipped, spans shared with an already packed chunk of the same episode
+        are removed, and long passages are cut to the run of whole sentences
+        holding the most query terms.
+
+        Args:
+            query: User's query string
+            results: Scored results with 'content' and 'metadata'
+
+        Returns:
+            Dictionary with the packed 'context' string, its 'passages'
+            (source index, header, text, tokens), 'context_tokens' and the
+            number of 'dropped' results
+        """
+        # Stopwords would favour windows of filler over the query's subject
+        terms = set(_content_words(query.lower()))
+        ranked = sorted(results, key=lambda r: r.get('relevance_score', 0.0), reverse=True)
+        selected: List[Dict[str, Any]] = []
+        seen_texts = set()
+        used = 0
+
+        for result in ranked:
+            remaining = self.token_budget - used
+            if remaining < self.min_passage_tokens:
+                break
+            metadata = result.get('metadata') or {}
+            words = self._text(result).split()
+            key = ' '.join(words).lower()
+            if not words or key in seen_texts:
+                continue
+            seen_texts.add(key)
+
+            words = self._remove_overlap(words, metadata, selected)
+            if not words:
+                continue
+
+            header = self._header(len(selected) + 1, metadata)
+            header_tokens = count_tokens(header) + 1
+            limit = min(self.max_passage_tokens, remaining - header_tokens)
+            if limit < self.min_passage_tokens:
+                continue
+            text = ' '.join(words)
+            if count_tokens(text) > limit:
+                text = self._best_window(split_sentences(text), terms, limit)
+                if count_tokens(text) < self.min_passage_tokens:
+                    continue
+            tokens = count_tokens(text)
+
+            selected.append({
+                'source': len(selected) + 1,
+                'header': header,
+                'text': text,
+                'tokens': tokens + header_tokens,
+                'metadata': metadata,
+                'words': text.split()
+            })
+            used += tokens + header_tokens
+
+        context = '\n\n'.join(f"{p['header']}\n{p['text']}" for p in selected)
+        for passage in selected:
+            del passage['words']
+        return {
+            'context': context,
+            'passages': selected,
+            'context_tokens': count_tokens(context),
+            'dropped': len(results) - len(selected)
+        }
@@ -0,0 +1,188 @@
+import concurrent.futures
+import hashlib
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-ada-002"
+
+
+def text_digest(text: str) -> str:
+    """Return the SHA-256 hex digest used as embedding cache key."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    """Check whether an API error is an HTTP 429 rate-limit response."""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status == 429 or type(error).__name__ == 'RateLimitError'
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (model, sha256(text)), backed by SQLite.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize EmbeddingCache.
+
+        Args:
+            path: SQLite database file, created if missing
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, digest TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, digest))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, digests: Sequence[str]) -> Dict[str, List[float]]:
+        """Return the cached vectors for the given digests, skipping misses."""
+        found = {}
+        with self._lock:
+            for i in range(0, len(digests), 500):
+                batch = list(digests[i:i + 500])
+                rows = self._conn.execute(
+                    f"SELECT digest, vector FROM embeddings WHERE model = ? "
+                    f"AND digest IN ({','.join('?' * len(batch))})",
+                    [model] + batch
+                )
+                for digest, blob in rows:
+                    found[digest] = array('f', blob).tolist()
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, Sequence[float]]):
+        """Store vectors keyed by text digest."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, digest, vector) VALUES (?, ?, ?)",
+                [
+                    (model, digest, array('f', vector).tobytes())
+                    for digest, vector in vectors.items()
+                ]
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingService:
+    """
+    Batched, rate-limited embedding client shared by ingestion and querying.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str = DEFAULT_EMBEDDING_MODEL,
+        cache: Optional[EmbeddingCache] = None,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        max_retries: int = 6,
+        backoff_base: float = 1.0,
+        max_backoff: float = 60.0
+    ):
+        """
+        Initialize EmbeddingService.
+
+        Args:
+            client: OpenAI-compatible client exposing embeddings.create
+            model: Embedding model name
+            cache: Optional persistent embedding cache
+            batch_size: Maximum number of inputs per API request
+            max_concurrency: Maximum number of requests in flight
+            max_retries: Retries of a request rejected with HTTP 429
+            backoff_base: Initial backoff delay in seconds
+            max_backoff: Upper bound of a single backoff delay in seconds
+        """
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.api_requests = 0
+        self._stats_lock = threading.Lock()
+
+    def _request(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, backing off exponentially on rate limits."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._stats_lock:
+                    self.api_requests += 1
+                response = self.client.embeddings.create(model=self.model, input=texts)
+                return [item.embedding for item in response.data]
+            except Exception as e:
+                if not _is_rate_limit(e) or attempt == self.max_retries:
+                    raise
+                delay = min(self.max_backoff, self.backoff_base * 2 ** attempt)
+                delay *= 0.5 + random.random() / 2
+                logger.warning(f"Embedding request rate limited, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed_many(self, texts: Sequence[str]) -> List[List[float]]:
+        """
+        Embed many texts, reusing cached vectors and batching the rest.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One embedding per input text, in input order
+        """
+        digests = [text_digest(text) for text in texts]
+        vectors = self.cache.get_many(self.model, list(set(digests))) if self.cache else {}
+
+        missing = {}
+        for digest, text in zip(digests, texts):
+            if digest not in vectors:
+                missing.setdefault(digest, text)
+
+        if missing:
+            missing_digests = list(missing)
+            batches = [
+                missing_digests[i:i + self.batch_size]
+                for i in range(0, len(missing_digests), self.batch_size)
+            ]
+            fetched = {}
+            if len(batches) == 1:
+                results = [self._request([missing[d] for d in batches[0]])]
+            else:
+                with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_concurrency
+                ) as executor:
+                    results = list(executor.map(
+                        lambda batch: self._request([missing[d] for d in batch]),
+                        batches
+                    ))
+            for batch, embeddings in zip(batches, results):
+                fetched.update(zip(batch, embeddings))
+            if self.cache:
+                self.cache.put_many(self.model, fetched)
+            vectors.update(fetched)
+
+        return [vectors[digest] for digest in digests]
+
+    def embed(self, text: str) -> List[float]:
+        """Embed a single text."""
+        return self.embed_many([text])[0]
@@ -0,0 +1,257 @@
+"""
+Configuration and process-wide factories shared by the Streamlit app, the
+query service, the batch runner and the ingest worker.
+
+Every resource is built once per process through the resource registry, so
+the entry points only pick what they need instead of each wiring the
+collection, clients and indexes their own way.
+"""
+import logging
+import os
+import shutil
+from typing import Optional
+
+try:
+    from .chunking import TranscriptChunker, DEFAULT_CHUNK_TOKENS, DEFAULT_CHUNK_STRIDE
+    from .context_packer import ContextPacker, DEFAULT_CONTEXT_BUDGET
+    from .embeddings import EmbeddingCache, EmbeddingService, DEFAULT_EMBEDDING_MODEL
+    from .ingest_manifest import IngestManifest
+    from .ingestion import TranscriptIngestor
+    from .lexical_index import LexicalIndex
+    from .query_classifier import (
+        MAX_SUB_QUERIES, ClassificationLog, LocalQueryClassifier, QueryTypeModel
+    )
+    from .query_processor import QueryProcessor
+    from .resources import create_chroma_client, create_openai_client, registry
+    from .sharding import SHARD_SEPARATOR, open_chroma_shards, open_numpy_shards
+    from .tracing import JsonLinesExporter, Tracer, start_metrics_server
+    from .transcript_store import TranscriptStore
+    from .vector_store import NumpyVectorStore
+except ImportError:  # imported from src/ by `streamlit run src/app.py`
+    from chunking import TranscriptChunker, DEFAULT_CHUNK_TOKENS, DEFAULT_CHUNK_STRIDE
+    from context_packer import ContextPacker, DEFAULT_CONTEXT_BUDGET
+    from embeddings import EmbeddingCache, EmbeddingService, DEFAULT_EMBEDDING_MODEL
+    from ingest_manifest import IngestManifest
+    from ingestion import TranscriptIngestor
+    from lexical_index import LexicalIndex
+    from query_classifier import (
+        MAX_SUB_QUERIES, ClassificationLog, LocalQueryClassifier, QueryTypeModel
+    )
+    from query_processor import QueryProcessor
+    from resources import create_chroma_client, create_openai_client, registry
+    from sharding import SHARD_SEPARATOR, open_chroma_shards, open_numpy_shards
+    from tracing import JsonLinesExporter, Tracer, start_metrics_server
+    from transcript_store import TranscriptStore
+    from vector_store import NumpyVectorStore
+
+logger = logging.getLogger(__name__)
+
+# Transcript directory, relative to the working directory
+TRANSCRIPTS_DIR = os.getenv('TRANSCRIPTS_DIR', os.path.join('data', 'youtube_transcripts'))
+# ChromaDB storage directory; the other index files are kept alongside it
+CHROMA_PATH = os.getenv('CHROMA_PATH', './chroma_db')
+COLLECTION_NAME = "youtube_transcripts"
+MANIFEST_FILENAME = "ingest_manifest.json"
+EMBEDDING_CACHE_FILENAME = "embedding_cache.sqlite3"
+CLASSIFICATION_LOG_FILENAME = "query_classifications.jsonl"
+QUERY_TYPE_MODEL_FILENAME = "query_type_model.pkl"
+LEXICAL_INDEX_FILENAME = "lexical_index.npz"
+# Vector index backend: 'chroma', or 'numpy' for the memory-mapped NumpyVectorStore
+# kept under CHROMA_PATH/NUMPY_STORE_DIRNAME with embeddings stored as VECTOR_DTYPE
+VECTOR_STORE = os.getenv('VECTOR_STORE', 'chroma')
+NUMPY_STORE_DIRNAME = "numpy_store"
+# Optional split of the index into one shard per 'channel' or per 'year', queried
+# in parallel; NumPy shards live under CHROMA_PATH/NUMPY_SHARDS_DIRNAME
+SHARD_BY = os.getenv('SHARD_BY', '')
+NUMPY_SHARDS_DIRNAME = "numpy_shards"
+VECTOR_DTYPE = os.getenv('VECTOR_DTYPE', 'float32')
+# Transcripts packed for memory-mapped reads, kept in step by ingestion
+TRANSCRIPT_STORE_DIRNAME = "transcripts"
+# Queue of background ingestion jobs and the lock held by the single process
+# writing the index (the app's worker thread or `python src/ingest_worker.py`)
+INGEST_QUEUE_FILENAME = "ingest_jobs.sqlite3"
+INGEST_LOCK_FILENAME = "ingest.lock"
+# Seconds between two health checks of a long-lived resource
+HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', 60))
+# Optional JSON lines file receiving every query trace
+TRACE_LOG = os.getenv('TRACE_LOG')
+
+
+def chroma_path(filename: str) -> str:
+    """Path of an index file kept under CHROMA_PATH."""
+    return os.path.join(CHROMA_PATH, filename)
+
+
+def _file_mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def get_chroma_client():
+    return registry.get(
+        'chroma_client',
+        lambda: create_chroma_client(CHROMA_PATH),
+        health_check=lambda client: client.heartbeat(),
+        health_interval=HEALTH_CHECK_INTERVAL
+    )
+
+
+def get_openai_client(max_connections: Optional[int] = None, timeout: Optional[float] = None):
+    """Pooled OpenAI client; the arguments only apply when it is first created."""
+    return registry.get('openai_client', lambda: create_openai_client(max_connections, timeout))
+
+
+def get_embedding_service() -> EmbeddingService:
+    return registry.get(
+        'embedding_service',
+        lambda: EmbeddingService(
+            get_openai_client(),
+            model=os.getenv('EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL),
+            cache=EmbeddingCache(chroma_path(EMBEDDING_CACHE_FILENAME))
+        ),
+        depends_on=('openai_client',)
+    )
+
+
+def get_lexical_index() -> LexicalIndex:
+    """
+    The lexical index, reloaded once the file saved by ingestion (in this or
+    another process) is newer than the loaded copy.
+    """
+    path = chroma_path(LEXICAL_INDEX_FILENAME)
+    loaded = {'mtime': 0.0}
+
+    def load() -> LexicalIndex:
+        loaded['mtime'] = _file_mtime(path)
+        return LexicalIndex.load(path)
+
+    return registry.get(
+        'lexical_index',
+        load,
+        health_check=lambda index: _file_mtime(path) <= loaded['mtime'],
+        health_interval=HEALTH_CHECK_INTERVAL
+    )
+
+
+def get_transcript_store() -> TranscriptStore:
+    return registry.get(
+        'transcript_store', lambda: TranscriptStore(chroma_path(TRANSCRIPT_STORE_DIRNAME))
+    )
+
+
+def get_tracer(metrics_port: Optional[str] = None) -> Tracer:
+    """Tracer exporting to TRACE_LOG when set; metrics are served on metrics_port when set."""
+    def create() -> Tracer:
+        if metrics_port:
+            registry.get('metrics_server', lambda: start_metrics_server(int(metrics_port)))
+        return Tracer(JsonLinesExporter(TRACE_LOG) if TRACE_LOG else None)
+
+    return registry.get('tracer', create)
+
+
+def open_collection():
+    """Open the vector index selected by VECTOR_STORE and SHARD_BY."""
+    if SHARD_BY and VECTOR_STORE == 'numpy':
+        return open_numpy_shards(
+            chroma_path(NUMPY_SHARDS_DIRNAME), SHARD_BY, dtype=VECTOR_DTYPE
+        )
+    if VECTOR_STORE == 'numpy':
+        return NumpyVectorStore(chroma_path(NUMPY_STORE_DIRNAME), dtype=VECTOR_DTYPE)
+    if SHARD_BY:
+        return open_chroma_shards(get_chroma_client(), COLLECTION_NAME, SHARD_BY)
+    return get_chroma_client().get_or_create_collection(COLLECTION_NAME)
+
+
+def _collection_is_usable(collection) -> bool:
+    # A NumPy store is remapped once ingestion in another process flushed a new snapshot
+    is_current = getattr(collection, 'is_current', None)
+    return collection.count() >= 0 and (is_current is None or is_current())
+
+
+def get_collection():
+    """The collection shared by queries and ingestion in this process."""
+    return registry.get(
+        'collection',
+        open_collection,
+        health_check=_collection_is_usable,
+        health_interval=HEALTH_CHECK_INTERVAL,
+        depends_on=('chroma_client',)
+    )
+
+
+def reset_collection():
+    """Drop the vector index of the current layout and open it again, empty."""
+    if VECTOR_STORE == 'numpy':
+        shutil.rmtree(
+            chroma_path(NUMPY_SHARDS_DIRNAME if SHARD_BY else NUMPY_STORE_DIRNAME),
+            ignore_errors=True
+        )
+    else:
+        client = get_chroma_client()
+        prefix = COLLECTION_NAME + SHARD_SEPARATOR
+        # Chroma returns collection objects (newer clients) or names (older ones)
+        for name in [getattr(c, 'name', c) for c in client.list_collections()]:
+            if name.startswith(prefix) if SHARD_BY else name == COLLECTION_NAME:
+                client.delete_collection(name)
+    logger.warning("Dropped the vector index for a full re-ingestion")
+    registry.invalidate('collection')
+    return get_collection()
+
+
+def create_ingestor() -> TranscriptIngestor:
+    """Ingestor syncing TRANSCRIPTS_DIR into the shared collection and indexes."""
+    base_path = os.path.join(os.getcwd(), TRANSCRIPTS_DIR)
+    if not os.path.exists(base_path):
+        raise FileNotFoundError(f"Directory {base_path} does not exist. Please check the path.")
+    chunker = TranscriptChunker(
+        chunk_tokens=int(os.getenv('CHUNK_TOKENS', DEFAULT_CHUNK_TOKENS)),
+        stride=int(os.getenv('CHUNK_STRIDE', DEFAULT_CHUNK_STRIDE))
+    )
+    return TranscriptIngestor(
+        get_collection(),
+        base_path,
+        IngestManifest(chroma_path(MANIFEST_FILENAME)),
+        chunker,
+        embedding_service=get_embedding_service(),
+        lexical_index=get_lexical_index(),
+        transcript_store=get_transcript_store(),
+        reset_collection=reset_collection,
+        layout={'vector_store': VECTOR_STORE, 'shard_by': SHARD_BY}
+    )
+
+
+def get_query_processor() -> QueryProcessor:
+    """The query processor, rebuilt whenever one of its resources is."""
+    collection = get_collection()
+    openai_client = get_openai_client()
+    embedding_service = get_embedding_service()
+    lexical_index = get_lexical_index()
+    tracer = get_tracer()
+    transcript_store = get_transcript_store()
+    return registry.get(
+        'query_processor',
+        lambda: QueryProcessor(
+            collection,
+            openai_client,
+            embedding_service,
+            classifier_mode=os.getenv('QUERY_CLASSIFIER_MODE', 'hybrid'),
+            local_classifier=LocalQueryClassifier(
+                QueryTypeModel.load(chroma_path(QUERY_TYPE_MODEL_FILENAME))
+            ),
+            classification_log=ClassificationLog(chroma_path(CLASSIFICATION_LOG_FILENAME)),
+            lexical_index=lexical_index,
+            context_packer=ContextPacker(
+                token_budget=int(os.getenv('CONTEXT_TOKEN_BUDGET', DEFAULT_CONTEXT_BUDGET))
+            ),
+            tracer=tracer,
+            transcript_store=transcript_store,
+            context_window=int(os.getenv('CONTEXT_WINDOW_CHUNKS', 0)),
+            max_sub_queries=int(os.getenv('MAX_SUB_QUERIES', MAX_SUB_QUERIES))
+        ),
+        depends_on=(
+            'collection', 'openai_client', 'embedding_service', 'lexical_index', 'tracer',
+            'transcript_store'
+        )
+    )
@@ -0,0 +1,80 @@
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Sequence, Union
+
+DateLike = Union[date, datetime, str]
+
+
+def date_to_int(value: Optional[DateLike]) -> Optional[int]:
+    """
+    Convert a date into a sortable YYYYMMDD integer.
+
+    Args:
+        value: date, datetime or string starting with YYYY-MM-DD
+
+    Returns:
+        Integer such as 20241111, or None if the value is not a date
+    """
+    if isinstance(value, (date, datetime)):
+        return value.year * 10000 + value.month * 100 + value.day
+    if isinstance(value, str) and len(value) >= 10:
+        try:
+            return int(datetime.strptime(value[:10], '%Y-%m-%d').strftime('%Y%m%d'))
+        except ValueError:
+            return None
+    return None
+
+
+def normalize_date_range(date_range: Any) -> Optional[tuple]:
+    """
+    Normalize a date_input value into a (start, end) pair.
+
+    Streamlit returns a single date (or a one-element tuple) while the user is
+    still picking the range; that is treated as an open-ended start.
+    """
+    if not date_range:
+        return None
+    if isinstance(date_range, (date, datetime, str)):
+        return date_range, None
+    values = list(date_range)
+    if not values:
+        return None
+    return values[0], values[1] if len(values) > 1 else None
+
+
+def build_where_filter(
+    channels: Optional[Dict[str, bool]] = None,
+    date_range: Optional[Sequence[DateLike]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Translate channel selection and date range into a Chroma `where` filter.
+
+    Channels mapped to False are excluded and channels missing from the
+    selection stay included, matching the previous in-Python filtering.
+    Dates are compared on the integer `published_at_int` metadata field.
+
+    Args:
+        channels: Mapping of channel name to whether it is selected
+        date_range: (start, end) dates, either bound may be None
+
+    Returns:
+        Chroma where clause, or None when nothing needs filtering
+    """
+    clauses = []
+
+    excluded = sorted(name for name, selected in (channels or {}).items() if not selected)
+    if excluded:
+        clauses.append({'channel': {'$nin': excluded}})
+
+    bounds = normalize_date_range(date_range)
+    if bounds:
+        start, end = (date_to_int(bound) for bound in bounds)
+        if start is not None:
+            clauses.append({'published_at_int': {'$gte': start}})
+        if end is not None:
+            clauses.append({'published_at_int': {'$lte': end}})
+
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {'$and': clauses}
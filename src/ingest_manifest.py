@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+class IngestManifest:
+    """
+    Persistent record of ingested transcript files and the chunks they produced.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize IngestManifest.
+
+        Args:
+            path: Location of the JSON manifest file
+        """
+        self.path = path
+        self.generation = 0
+        self.schema_version = 0
+        # Model and dimension of the embeddings stored in the collection
+        self.embedding: Optional[Dict[str, Any]] = None
+        # Vector store backend and sharding the files were ingested into
+        self.layout: Optional[Dict[str, Any]] = None
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def load(self):
+        """Load the manifest from disk, starting empty if it is missing or unreadable."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.generation = int(data.get('generation', 0))
+            self.schema_version = int(data.get('schema_version', 0))
+            self.embedding = data.get('embedding')
+            self.layout = data.get('layout')
+            self.files = data.get('files', {})
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable ingest manifest {self.path}: {e}")
+            self.generation = 0
+            self.schema_version = 0
+            self.embedding = None
+            self.layout = None
+            self.files = {}
+
+    def save(self):
+        """Atomically write the manifest to disk."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'version': MANIFEST_VERSION,
+                    'generation': self.generation,
+                    'schema_version': self.schema_version,
+                    'embedding': self.embedding,
+                    'layout': self.layout,
+                    'files': self.files
+                }, f)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the manifest entry for a file key, if any."""
+        return self.files.get(key)
+
+    def is_unchanged(self, key: str, stat: os.stat_result) -> bool:
+        """Check whether a file's mtime and size match its manifest entry."""
+        entry = self.files.get(key)
+        return bool(entry) and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size
+
+    def record(
+        self, key: str, path: str, stat: os.stat_result, content_hash: str, chunk_ids: List[str]
+    ):
+        """Record a successfully ingested file."""
+        self.files[key] = {
+            'path': path,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'hash': content_hash,
+            'chunk_ids': list(chunk_ids)
+        }
+
+    def touch(self, key: str, stat: os.stat_result):
+        """Refresh mtime and size of a file whose content did not change."""
+        self.files[key].update({'mtime': stat.st_mtime, 'size': stat.st_size})
+
+    def invalidate(self, key: str):
+        """Make the next sync re-ingest a file, keeping its chunk IDs for cleanup."""
+        entry = self.files.get(key)
+        if entry:
+            entry.update({'mtime': None, 'size': None, 'hash': None})
+
+    def remove(self, key: str) -> List[str]:
+        """Forget a file and return the chunk IDs it produced."""
+        entry = self.files.pop(key, None)
+        return entry['chunk_ids'] if entry else []
+
+    def bump_generation(self):
+        """Mark the indexed corpus as changed."""
+        self.generation += 1
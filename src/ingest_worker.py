@@ -0,0 +1,487 @@
+"""
+Background ingestion: a durable SQLite job queue, a single-writer file lock
+and a worker thread running TranscriptIngestor.sync for each queued job.
+
+The Streamlit app starts a worker in its process and keeps serving queries
+from the existing index while it runs; the worker can also run on its own:
+
+    python src/ingest_worker.py            # sync once and exit
+    python src/ingest_worker.py --watch    # keep processing queued jobs
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+SYNC_JOB = 'sync'
+# Seconds between two polls of the queue by an idle worker
+POLL_INTERVAL = 2.0
+# Seconds between two progress updates written to the queue
+PROGRESS_INTERVAL = 1.0
+# Runs of a job whose files keep failing, and delay before the first retry
+# (doubled on every further attempt)
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 30.0
+# Jobs kept in the queue database, the oldest finished ones being pruned
+MAX_FINISHED_JOBS = 200
+
+_COLUMNS = (
+    'id', 'kind', 'status', 'attempts', 'created', 'not_before', 'started', 'finished',
+    'worker', 'progress', 'result', 'error'
+)
+
+
+class JobQueue:
+    """
+    Ingestion jobs stored in SQLite, shared by every process using the index.
+
+    Queued jobs of the same kind are coalesced, so repeated reload requests
+    or concurrent sessions asking for a sync produce a single job.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize JobQueue.
+
+        Args:
+            path: SQLite database file, created if missing
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL, "
+            "not_before REAL NOT NULL DEFAULT 0, started REAL, finished REAL, worker TEXT, "
+            "progress TEXT, result TEXT, error TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+
+    @staticmethod
+    def _job(row) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        for key in ('progress', 'result'):
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+    def _fetch(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs {sql}", params
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def enqueue(self, kind: str = SYNC_JOB) -> int:
+        """
+        Queue a job, or return the ID of the job of that kind already waiting,
+        which is made due now if it was waiting for a retry.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE kind = ? AND status = 'queued' "
+                    "ORDER BY id LIMIT 1", (kind,)
+                ).fetchone()
+                if row:
+                    job_id = row[0]
+                    self._conn.execute(
+                        "UPDATE jobs SET not_before = 0 WHERE id = ?", (job_id,)
+                    )
+                else:
+                    job_id = self._conn.execute(
+                        "INSERT INTO jobs (kind, status, created) VALUES (?, 'queued', ?)",
+                        (kind, time.time())
+                    ).lastrowid
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Mark the oldest due job as running and return it, or None."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' AND not_before <= ? "
+                    "ORDER BY id LIMIT 1", (time.time(),)
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+                        "started = ?, worker = ?, error = NULL WHERE id = ?",
+                        (time.time(), worker, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row[0]) if row else None
+
+    def _update(self, job_id: int, **fields):
+        for key in ('progress', 'result'):
+            if key in fields and fields[key] is not None:
+                fields[key] = json.dumps(fields[key])
+        assignments = ', '.join(f"{key} = ?" for key in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?", list(fields.values()) + [job_id]
+            )
+
+    def report_progress(self, job_id: int, progress: Dict[str, Any]):
+        self._update(job_id, progress=progress)
+
+    def finish(self, job_id: int, result: Dict[str, Any], error: Optional[str] = None):
+        """Record the outcome of a job: 'done', or 'failed' when an error is given."""
+        self._update(
+            job_id, status='failed' if error else 'done', finished=time.time(),
+            result=result, error=error
+        )
+        self._prune()
+
+    def retry(self, job_id: int, delay: float, result: Optional[Dict[str, Any]] = None,
+              error: Optional[str] = None):
+        """Put a job back in the queue, due after delay seconds."""
+        self._update(
+            job_id, status='queued', not_before=time.time() + delay, result=result, error=error
+        )
+
+    def requeue_running(self) -> int:
+        """Queue again the jobs left running by a worker that died."""
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'queued', not_before = 0 WHERE status = 'running'"
+            ).rowcount
+
+    def _prune(self):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND id NOT IN ("
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') "
+                "ORDER BY id DESC LIMIT ?)", (MAX_FINISHED_JOBS,)
+            )
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        jobs = self._fetch("WHERE id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def latest(self, kind: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Most recent job, of the given kind when set."""
+        if kind:
+            jobs = self._fetch("WHERE kind = ? ORDER BY id DESC LIMIT 1", (kind,))
+        else:
+            jobs = self._fetch("ORDER BY id DESC LIMIT 1")
+        return jobs[0] if jobs else None
+
+    def wait(
+        self,
+        job_id: int,
+        attempts: Optional[int] = None,
+        timeout: Optional[float] = None,
+        poll_interval: float = 0.5
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Wait for a run of a job to end.
+
+        Args:
+            job_id: Job to wait for
+            attempts: Runs of the job already seen; by default the run in
+                progress, or the next one when the job is queued
+            timeout: Seconds after which the job is returned as it stands
+
+        Returns:
+            The job once it is done, failed or queued again for a retry
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        job = self.get(job_id)
+        if attempts is None and job is not None:
+            attempts = job['attempts'] - (job['status'] == 'running')
+        while job is not None:
+            if job['status'] in ('done', 'failed'):
+                return job
+            if job['status'] == 'queued' and job['attempts'] > attempts:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_interval)
+            job = self.get(job_id)
+        return job
+
+    def pending(self) -> int:
+        """Number of queued and running jobs."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class WriterLock:
+    """
+    Exclusive advisory lock on a file, held by the one process writing the index.
+
+    The lock is released by the operating system when its holder exits, so a
+    crashed writer never leaves the index locked.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize WriterLock.
+
+        Args:
+            path: Lock file, created if missing
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def acquire(self) -> bool:
+        """Take the lock without waiting; False when another writer holds it."""
+        if self._file is not None:
+            return True
+        handle = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            handle.close()
+            return False
+        handle.seek(0)
+        handle.truncate()
+        handle.write(f"{socket.gethostname()}:{os.getpid()}\n")
+        handle.flush()
+        self._file = handle
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "WriterLock":
+        if not self.acquire():
+            raise RuntimeError(f"Index is locked by another writer ({self.path})")
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class IngestWorker:
+    """
+    Runs queued ingestion jobs on a background thread.
+
+    The writer lock is taken for each job and released once it ends, so
+    workers of several processes can share one queue while only one of them
+    writes the index at a time. Progress and throughput are written to the
+    job while it runs, and files that fail are retried by running the job
+    again with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        ingestor_factory: Callable[[], Any],
+        queue: JobQueue,
+        lock: WriterLock,
+        poll_interval: float = POLL_INTERVAL,
+        progress_interval: float = PROGRESS_INTERVAL,
+        max_attempts: int = MAX_ATTEMPTS,
+        retry_delay: float = RETRY_DELAY
+    ):
+        """
+        Initialize IngestWorker.
+
+        Args:
+            ingestor_factory: Builds the TranscriptIngestor used for a job
+            queue: Job queue shared with the processes requesting syncs
+            lock: Single-writer lock of the index
+            poll_interval: Seconds between two polls of the queue when idle
+            progress_interval: Minimum seconds between two progress updates
+            max_attempts: Runs of a job before its failed files are given up
+            retry_delay: Seconds before the first retry, doubled on each attempt
+        """
+        self.ingestor_factory = ingestor_factory
+        self.queue = queue
+        self.lock = lock
+        self.poll_interval = poll_interval
+        self.progress_interval = progress_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "IngestWorker":
+        """Start the worker thread (a daemon, so it never blocks exit)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._loop, name='ingest-worker', daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop after the current job."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                worked = self.run_pending()
+            except Exception as e:
+                logger.error(f"Ingest worker error: {e}", exc_info=True)
+                worked = False
+            if not worked:
+                self._stop.wait(self.poll_interval)
+
+    def run_pending(self) -> bool:
+        """
+        Run the next due job unless another process holds the writer lock.
+
+        Returns:
+            True when a job was run
+        """
+        if not self.lock.acquire():
+            return False
+        try:
+            # Holding the lock means no other worker is running a job, so a
+            # job still marked running was left by a writer that died
+            requeued = self.queue.requeue_running()
+            if requeued:
+                logger.info(f"Requeued {requeued} ingestion jobs left by a previous writer")
+            job = self.queue.claim(self.name)
+            if job is None:
+                return False
+            self._run(job)
+            return True
+        finally:
+            self.lock.release()
+
+    def _run(self, job: Dict[str, Any]):
+        job_id, attempt = job['id'], job['attempts']
+        logger.info(f"Running ingestion job {job_id} (attempt {attempt})")
+        last_report = [0.0]
+
+        def progress(update: Dict[str, Any]):
+            now = time.monotonic()
+            final = update['files_done'] >= update['files_total']
+            if not final and now - last_report[0] < self.progress_interval:
+                return
+            last_report[0] = now
+            elapsed = max(update['elapsed_s'], 1e-9)
+            self.queue.report_progress(job_id, dict(
+                update,
+                files_per_s=update['files_done'] / elapsed,
+                chunks_per_s=update['chunks'] / elapsed
+            ))
+
+        delay = self.retry_delay * 2 ** (attempt - 1)
+        try:
+            ingestor = self.ingestor_factory()
+            stats = ingestor.sync(progress=progress)
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {e}", exc_info=True)
+            error = f"{type(e).__name__}: {e}"
+            if attempt < self.max_attempts:
+                self.queue.retry(job_id, delay, error=error)
+            else:
+                self.queue.finish(job_id, {}, error=error)
+            return
+
+        # Readers move their query cache to the manifest generation of the last sync
+        result = dict(
+            stats,
+            failed_files=list(ingestor.failed_files),
+            generation=ingestor.manifest.generation
+        )
+        if stats['failed'] and attempt < self.max_attempts:
+            logger.info(f"Retrying {stats['failed']} failed files of job {job_id} in {delay:.0f}s")
+            self.queue.retry(job_id, delay, result=result)
+        else:
+            self.queue.finish(job_id, result)
+        logger.info(f"Ingestion job {job_id} finished: {stats}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run transcript ingestion jobs.")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running queued jobs instead of exiting after one sync")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        from .factory import INGEST_LOCK_FILENAME, INGEST_QUEUE_FILENAME, chroma_path
+        from .factory import create_ingestor
+    except ImportError:
+        from factory import INGEST_LOCK_FILENAME, INGEST_QUEUE_FILENAME, chroma_path
+        from factory import create_ingestor
+
+    queue = JobQueue(chroma_path(INGEST_QUEUE_FILENAME))
+    worker = IngestWorker(create_ingestor, queue, WriterLock(chroma_path(INGEST_LOCK_FILENAME)))
+    job_id = queue.enqueue(SYNC_JOB)
+    if not args.watch:
+        attempts = queue.get(job_id)['attempts']
+        # Another process holding the lock runs the job instead
+        if not worker.run_pending():
+            logger.info("Another process is writing the index, waiting for it to run the job")
+        job = queue.wait(job_id, attempts)
+        print(json.dumps(job['result'] if job else None))
+        return
+    try:
+        while True:
+            if not worker.run_pending():
+                time.sleep(worker.poll_interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+import concurrent.futures
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .chunking import CHUNK_SCHEMA_VERSION, TranscriptChunker
+    from .embeddings import EmbeddingService
+    from .ingest_manifest import IngestManifest
+    from .lexical_index import LexicalIndex
+    from .transcript_reader import TranscriptReader
+except ImportError:  # imported from src/ by `streamlit run src/app.py`
+    from chunking import CHUNK_SCHEMA_VERSION, TranscriptChunker
+    from embeddings import EmbeddingService
+    from ingest_manifest import IngestManifest
+    from lexical_index import LexicalIndex
+    from transcript_reader import TranscriptReader
+
+logger = logging.getLogger(__name__)
+
+# Number of chunks sent to ChromaDB per upsert call
+BATCH_SIZE = 100
+# Number of changed files above which parsing moves to a process pool
+PROCESS_POOL_THRESHOLD = 200
+# Text embedded once to learn the dimension of the embedding model
+EMBEDDING_PROBE = "dimension probe"
+
+
+def hash_file(file_path: str) -> str:
+    """Return the MD5 hex digest of a file's content."""
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_file(
+    file_path: str,
+    channel: str,
+    filename: str,
+    chunk_tokens: int,
+    stride: int,
+    keep_segments: bool = False
+) -> Tuple[str, List[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+    """
+    Hash and chunk a transcript file in a single streaming pass.
+
+    Module-level so it can run in a process pool.
+
+    Args:
+        keep_segments: Also return the parsed segments, so the transcript
+            store can be written without reading the file again
+
+    Returns:
+        Tuple of (content hash, chunk records, segments or None)
+    """
+    reader = TranscriptReader(file_path)
+    chunker = TranscriptChunker(chunk_tokens, stride)
+    if not keep_segments:
+        chunks = list(chunker.chunk_reader(reader, channel, filename))
+        return reader.digest, chunks, None
+    segments = reader.read_segments()
+    chunks = list(chunker.chunk_transcript(
+        {'metadata': reader.metadata, 'transcript': segments}, channel, filename
+    ))
+    return reader.digest, chunks, segments
+
+
+def iter_transcript_files(base_path: str) -> Iterator[Tuple[str, str, str]]:
+    """
+    List transcript files below base_path.
+
+    Yields:
+        Tuples of (file_path, channel, filename)
+    """
+    for channel in sorted(os.listdir(base_path)):
+        channel_path = os.path.join(base_path, channel)
+        if not os.path.isdir(channel_path):
+            continue
+        for filename in sorted(os.listdir(channel_path)):
+            if filename.endswith('.json'):
+                yield os.path.join(channel_path, filename), channel, filename
+
+
+class TranscriptIngestor:
+    """
+    Incrementally synchronizes a transcript directory into a Chroma collection.
+    """
+
+    def __init__(
+        self,
+        collection,
+        base_path: str,
+        manifest: IngestManifest,
+        chunker: Optional[TranscriptChunker] = None,
+        max_workers: int = 10,
+        embedding_service: Optional[EmbeddingService] = None,
+        process_pool_threshold: int = PROCESS_POOL_THRESHOLD,
+        lexical_index: Optional[LexicalIndex] = None,
+        transcript_store=None,
+        reset_collection: Optional[Callable[[], Any]] = None,
+        layout: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initialize TranscriptIngestor.
+
+        Args:
+            collection: Chroma collection or other VectorStore
+            base_path: Directory holding one sub-directory of transcripts per channel
+            manifest: Ingest manifest tracking previously ingested files
+            chunker: Chunker used to split transcripts
+            max_workers: Number of threads used to parse changed files
+            embedding_service: Service computing chunk embeddings; when omitted
+                the collection's own embedding function is used
+            process_pool_threshold: Number of changed files from which parsing
+                runs in a process pool (one worker per core) instead of threads
+            lexical_index: Optional BM25 index kept in step with the collection
+            transcript_store: Optional TranscriptStore kept in step with the
+                collection; episodes it is missing are packed even when their
+                file is unchanged
+            reset_collection: Drops and recreates the collection, returning the
+                new one; called when the stored embeddings come from another
+                model than embedding_service, e.g. Chroma's default 384-dim
+                vectors in stores built before embeddings were precomputed
+            layout: Description of the vector store backend and sharding, kept
+                in the manifest; when it differs from the recorded one every
+                file is re-ingested into the (reset) collection
+        """
+        self.collection = collection
+        self.base_path = base_path
+        self.manifest = manifest
+        self.chunker = chunker or TranscriptChunker()
+        self.max_workers = max_workers
+        self.embedding_service = embedding_service
+        self.process_pool_threshold = process_pool_threshold
+        self.lexical_index = lexical_index
+        self.transcript_store = transcript_store
+        self.reset_collection = reset_collection
+        self.layout = layout
+        # Transcript files that could not be ingested by the last sync
+        self.failed_files: List[str] = []
+        self._reindex_lexical = False
+
+    def _file_key(self, file_path: str) -> str:
+        return os.path.relpath(file_path, self.base_path)
+
+    def _executor(self, pending_count: int) -> concurrent.futures.Executor:
+        if pending_count >= self.process_pool_threshold:
+            return concurrent.futures.ProcessPoolExecutor()
+        return concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def _write_chunks(self, chunks: List[Dict[str, Any]]):
+        embeddings = None
+        if self.embedding_service and chunks:
+            embeddings = self.embedding_service.embed_many([c['document'] for c in chunks])
+        for i in range(0, len(chunks), BATCH_SIZE):
+            batch = chunks[i:i + BATCH_SIZE]
+            kwargs = {}
+            if embeddings is not None:
+                kwargs['embeddings'] = embeddings[i:i + BATCH_SIZE]
+            self.collection.upsert(
+                documents=[c['document'] for c in batch],
+                metadatas=[c['metadata'] for c in batch],
+                ids=[c['id'] for c in batch],
+                **kwargs
+            )
+        if self.lexical_index is not None and not self._reindex_lexical:
+            self.lexical_index.add([c['id'] for c in chunks], [c['document'] for c in chunks])
+
+    def _delete_chunks(self, ids: List[str]):
+        self.collection.delete(ids=ids)
+        if self.lexical_index is not None and not self._reindex_lexical:
+            self.lexical_index.remove(ids)
+
+    def _pack_transcript(
+        self,
+        file_path: str,
+        channel: str,
+        filename: str,
+        segments: Optional[List[Dict[str, Any]]] = None,
+        digest: Optional[str] = None
+    ):
+        # The packed copy only speeds up reads, so failing to write it is not fatal
+        try:
+            if segments is None:
+                self.transcript_store.convert_file(file_path, channel, filename)
+                return
+            episode_id = f"{channel}_{filename}"
+            if self.transcript_store.digest(episode_id) != digest:
+                self.transcript_store.write(episode_id, segments, digest)
+        except Exception as e:
+            logger.warning(f"Could not pack transcript {file_path}: {e}")
+
+    def _ingest_file(
+        self,
+        future: concurrent.futures.Future,
+        file_path: str,
+        channel: str,
+        filename: str,
+        key: str,
+        stat: os.stat_result,
+        rebuild: bool,
+        stats: Dict[str, int]
+    ):
+        """Write the chunks of one parsed file and record it in the manifest."""
+        content_hash, chunks, segments = future.result()
+        entry = self.manifest.get(key)
+        if self.transcript_store is not None:
+            # Packed from the segments parsed in the pool; skipped when stored already
+            self._pack_transcript(file_path, channel, filename, segments, content_hash)
+        if entry and entry['hash'] == content_hash and not rebuild:
+            self.manifest.touch(key, stat)
+            stats['unchanged'] += 1
+            return
+
+        chunk_ids = [c['id'] for c in chunks]
+        self._write_chunks(chunks)
+        # Drop chunks the new version no longer produces, plus the
+        # whole-episode document written by pre-chunking versions
+        stale_ids = set(entry['chunk_ids']) - set(chunk_ids) if entry else set()
+        stale_ids.add(f"{channel}_{filename}")
+        self._delete_chunks(sorted(stale_ids))
+
+        self.manifest.record(key, file_path, stat, content_hash, chunk_ids)
+        stats['updated' if entry else 'added'] += 1
+        stats['chunks'] += len(chunks)
+
+    def _stored_dimensions(self) -> Optional[int]:
+        """Dimension of the embeddings already in the collection, None when it is empty."""
+        page = self.collection.get(include=['embeddings'], limit=1)
+        embeddings = page.get('embeddings')
+        if not page['ids'] or embeddings is None or not len(embeddings):
+            return None
+        return len(embeddings[0])
+
+    def _check_embeddings(self) -> bool:
+        """
+        Make sure the collection holds embeddings of the service's model,
+        recreating it when it does not.
+
+        Returns:
+            True when the collection was recreated and every file must be re-ingested
+        """
+        if self.embedding_service is None:
+            return False
+        model = self.embedding_service.model
+        recorded = self.manifest.embedding
+        if recorded and recorded.get('model') == model:
+            return False
+        stored = self._stored_dimensions()
+        if stored is None:
+            self.manifest.embedding = {'model': model, 'dimensions': None}
+            return False
+        dimensions = len(self.embedding_service.embed(EMBEDDING_PROBE))
+        if not recorded and stored == dimensions:
+            # Written by this model before the manifest recorded it
+            self.manifest.embedding = {'model': model, 'dimensions': dimensions}
+            return False
+
+        previous = recorded.get('model') if recorded else f"{stored}-dim default embeddings"
+        if self.reset_collection is None:
+            raise RuntimeError(
+                f"Collection holds {previous} but {model} produces {dimensions}-dim "
+                f"embeddings; delete the collection to re-ingest"
+            )
+        logger.warning(f"Collection holds {previous}; recreating it for {model}")
+        self.collection = self.reset_collection()
+        self.manifest.files = {}
+        self.manifest.embedding = {'model': model, 'dimensions': dimensions}
+        return True
+
+    def _check_layout(self) -> bool:
+        """
+        Make sure the manifest describes the collection's layout, resetting
+        the collection when it was built for another one.
+
+        Returns:
+            True when the layout changed and every file must be re-ingested
+        """
+        recorded = self.manifest.layout
+        if self.layout is None or recorded == self.layout:
+            return False
+        if recorded is None and (not self.manifest.files or self.collection.count()):
+            # Manifest written before layouts were recorded, for this collection
+            self.manifest.layout = dict(self.layout)
+            return False
+
+        logger.warning(
+            f"Manifest describes the {recorded or 'previous'} layout, not {self.layout}; "
+            f"re-ingesting every file"
+        )
+        if self.reset_collection is not None:
+            self.collection = self.reset_collection()
+        self.manifest.files = {}
+        self.manifest.layout = dict(self.layout)
+        return True
+
+    def rebuild_lexical_index(self, page_size: int = 1000):
+        """
+        Rebuild the lexical index from the documents stored in the collection.
+
+        The postings are built aside and swapped in once complete, so queries
+        keep searching the previous index meanwhile.
+        """
+        rebuilt = LexicalIndex(k1=self.lexical_index.k1, b=self.lexical_index.b)
+        offset = 0
+        while True:
+            page = self.collection.get(include=['documents'], limit=page_size, offset=offset)
+            if not page['ids']:
+                break
+            rebuilt.add(page['ids'], page['documents'])
+            offset += len(page['ids'])
+        self.lexical_index.replace(rebuilt)
+        logger.info(f"Rebuilt lexical index over {offset} chunks")
+
+    def sync(self, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, int]:
+        """
+        Bring the collection in line with the transcript directory.
+
+        New and changed files are re-chunked and upserted, chunks of removed
+        files are deleted and files with unchanged mtime and size are skipped
+        without being read. Files are hashed while they are parsed, so a file
+        that was touched but not modified costs a single read. Files that fail
+        are listed in failed_files and marked in the manifest, so the next
+        sync retries them.
+
+        Args:
+            progress: Optional callback receiving, after each changed file,
+                the files done and to do, written chunks, elapsed seconds
+                and the file just processed
+
+        Returns:
+            Counts of added, updated, removed, unchanged and failed files and written chunks
+        """
+        stats = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0, 'failed': 0, 'chunks': 0}
+        self.failed_files = []
+        started = time.monotonic()
+        seen = set()
+        pending = []
+        # Chunks written by an older chunk schema must be rebuilt even if unchanged
+        rebuild = self.manifest.schema_version != CHUNK_SCHEMA_VERSION
+        # A lexical index from another generation (or missing) is rebuilt from
+        # the collection instead of being updated incrementally
+        self._reindex_lexical = self.lexical_index is not None and (
+            self.lexical_index.generation != self.manifest.generation
+            or (rebuild and bool(self.manifest.files))
+        )
+        layout_changed = self._check_layout()
+        if self._check_embeddings() or layout_changed:
+            self._reindex_lexical = self.lexical_index is not None
+
+        for file_path, channel, filename in iter_transcript_files(self.base_path):
+            key = self._file_key(file_path)
+            seen.add(key)
+            stat = os.stat(file_path)
+            if not rebuild and self.manifest.is_unchanged(key, stat):
+                stats['unchanged'] += 1
+                if self.transcript_store is not None and \
+                        f"{channel}_{filename}" not in self.transcript_store:
+                    self._pack_transcript(file_path, channel, filename)
+                continue
+            pending.append((file_path, channel, filename, key, stat))
+
+        try:
+            with self._executor(len(pending)) as executor:
+                futures = {
+                    executor.submit(
+                        chunk_file, file_path, channel, filename,
+                        self.chunker.chunk_tokens, self.chunker.stride,
+                        self.transcript_store is not None
+                    ): (file_path, channel, filename, key, stat)
+                    for file_path, channel, filename, key, stat in pending
+                }
+                for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    file_path, channel, filename, key, stat = futures[future]
+                    try:
+                        self._ingest_file(
+                            future, file_path, channel, filename, key, stat, rebuild, stats
+                        )
+                    except Exception as e:
+                        logger.error(f"Error processing {file_path}: {e}")
+                        stats['failed'] += 1
+                        self.failed_files.append(file_path)
+                        self.manifest.invalidate(key)
+                    if progress is not None:
+                        progress({
+                            'files_done': done,
+                            'files_total': len(pending),
+                            'chunks': stats['chunks'],
+                            'failed': stats['failed'],
+                            'elapsed_s': time.monotonic() - started,
+                            'file': key
+                        })
+
+            for key in [k for k in self.manifest.files if k not in seen]:
+                chunk_ids = self.manifest.remove(key)
+                if chunk_ids:
+                    self._delete_chunks(chunk_ids)
+                if self.transcript_store is not None:
+                    channel, filename = os.path.split(key)
+                    self.transcript_store.delete(f"{channel}_{filename}")
+                stats['removed'] += 1
+            # Failed files are invalidated above, so they are retried
+            # without rebuilding every other file again
+            self.manifest.schema_version = CHUNK_SCHEMA_VERSION
+        finally:
+            # Stores buffering writes persist them before the manifest records them
+            flush = getattr(self.collection, 'flush', None)
+            if flush is not None:
+                flush()
+            if stats['added'] or stats['updated'] or stats['removed']:
+                self.manifest.bump_generation()
+            self.manifest.save()
+            if self.lexical_index is not None:
+                if self._reindex_lexical:
+                    self.rebuild_lexical_index()
+                self.lexical_index.generation = self.manifest.generation
+                self.lexical_index.save()
+
+        logger.info(f"Ingest sync finished: {stats}")
+        return stats
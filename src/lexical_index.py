@@ -0,0 +1,302 @@
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import Counter
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+# Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Pending postings merged into the index automatically beyond this count
+AUTO_COMMIT_POSTINGS = 2_000_000
+MAX_TERM_LENGTH = 40
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; digits are kept so acronyms and versions match."""
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) <= MAX_TERM_LENGTH]
+
+
+def _pack_strings(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode strings as one UTF-8 byte blob plus offsets."""
+    encoded = [v.encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(bounds) - 1)]
+
+
+class _Postings:
+    """
+    Immutable CSR snapshot: postings of term i are docs/tfs[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(
+        self,
+        vocab: List[str],
+        offsets: np.ndarray,
+        docs: np.ndarray,
+        tfs: np.ndarray,
+        doc_ids: List[str],
+        doc_lengths: np.ndarray
+    ):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.term_index = {term: i for i, term in enumerate(vocab)}
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def empty(cls) -> "_Postings":
+        return cls(
+            [], np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.uint16), [], np.zeros(0, dtype=np.int32)
+        )
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over transcript chunks, persisted as compact CSR postings.
+
+    Documents are added and removed in batches and merged into the postings by
+    commit(); searches read an immutable snapshot, so they never block on or
+    observe a half-applied update.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = BM25_K1, b: float = BM25_B):
+        """
+        Initialize LexicalIndex.
+
+        Args:
+            path: Location of the .npz index file; None keeps the index in memory
+            k1: BM25 term frequency saturation
+            b: BM25 document length normalization
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.generation = 0
+        self._postings = _Postings.empty()
+        self._lock = threading.Lock()
+        self._reset_pending()
+
+    def _reset_pending(self):
+        self._pending_ids: List[str] = []
+        self._pending_lengths: List[int] = []
+        self._pending_terms: List[str] = []
+        self._pending_docs: List[int] = []
+        self._pending_tfs: List[int] = []
+        self._removed: set = set()
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "LexicalIndex":
+        """Load an index from disk, starting empty if it is missing or unreadable."""
+        index = cls(path, **kwargs)
+        if not os.path.exists(path):
+            return index
+        try:
+            with np.load(path) as data:
+                if int(data['version']) != INDEX_VERSION:
+                    raise ValueError(f"unsupported index version {int(data['version'])}")
+                index.generation = int(data['generation'])
+                index._postings = _Postings(
+                    _unpack_strings(data['vocab_blob'], data['vocab_offsets']),
+                    data['offsets'],
+                    data['docs'],
+                    data['tfs'],
+                    _unpack_strings(data['doc_id_blob'], data['doc_id_offsets']),
+                    data['doc_lengths']
+                )
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable lexical index {path}: {e}")
+        return index
+
+    def save(self):
+        """Commit pending changes and atomically write the index to disk."""
+        self.commit()
+        if not self.path:
+            return
+        postings = self._postings
+        vocab_blob, vocab_offsets = _pack_strings(postings.vocab)
+        doc_id_blob, doc_id_offsets = _pack_strings(postings.doc_ids)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    version=np.int64(INDEX_VERSION),
+                    generation=np.int64(self.generation),
+                    vocab_blob=vocab_blob,
+                    vocab_offsets=vocab_offsets,
+                    offsets=postings.offsets,
+                    docs=postings.docs,
+                    tfs=postings.tfs,
+                    doc_id_blob=doc_id_blob,
+                    doc_id_offsets=doc_id_offsets,
+                    doc_lengths=postings.doc_lengths
+                )
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def __len__(self) -> int:
+        return len(self._postings.doc_ids)
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]):
+        """Queue documents for indexing; an existing document with the same ID is replaced."""
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                counts = Counter(tokenize(text))
+                local = len(self._pending_ids)
+                self._pending_ids.append(doc_id)
+                self._pending_lengths.append(sum(counts.values()))
+                self._pending_terms.extend(counts.keys())
+                self._pending_docs.extend([local] * len(counts))
+                self._pending_tfs.extend(counts.values())
+            full = len(self._pending_terms) >= AUTO_COMMIT_POSTINGS
+        if full:
+            self.commit()
+
+    def remove(self, ids: Iterable[str]):
+        """Queue documents for removal."""
+        with self._lock:
+            self._removed.update(ids)
+
+    def clear(self):
+        """Drop every document, including pending ones."""
+        with self._lock:
+            self._reset_pending()
+            self._postings = _Postings.empty()
+
+    def replace(self, other: "LexicalIndex"):
+        """
+        Take over the documents of another index in one step.
+
+        The other index is committed first, so searches see either the old
+        documents or the new ones, never a partly rebuilt index.
+        """
+        other.commit()
+        with self._lock:
+            self._reset_pending()
+            self._postings = other._postings
+
+    def commit(self):
+        """Merge pending additions and removals into the postings."""
+        with self._lock:
+            if not self._pending_ids and not self._removed:
+                return
+            self._postings = self._merge(self._postings)
+            self._reset_pending()
+
+    def _merge(self, old: _Postings) -> _Postings:
+        # Later additions of the same ID win over earlier ones
+        latest = {doc_id: i for i, doc_id in enumerate(self._pending_ids)}
+        dropped = self._removed | set(latest)
+        keep_doc = np.fromiter(
+            (doc_id not in dropped for doc_id in old.doc_ids), dtype=bool, count=len(old.doc_ids)
+        )
+        keep_new = np.array(
+            [latest[doc_id] == i for i, doc_id in enumerate(self._pending_ids)], dtype=bool
+        )
+        kept_count = int(keep_doc.sum())
+        old_doc_map = np.cumsum(keep_doc) - 1
+        new_doc_map = kept_count + np.cumsum(keep_new) - 1
+
+        vocab = sorted(set(old.vocab).union(self._pending_terms))
+        term_index = {term: i for i, term in enumerate(vocab)}
+        old_term_map = np.array([term_index[t] for t in old.vocab], dtype=np.int64)
+
+        old_terms = np.repeat(np.arange(len(old.vocab)), np.diff(old.offsets))
+        old_mask = keep_doc[old.docs] if len(old.docs) else np.zeros(0, dtype=bool)
+        new_docs = np.asarray(self._pending_docs, dtype=np.int64)
+        new_mask = keep_new[new_docs] if len(new_docs) else np.zeros(0, dtype=bool)
+
+        terms = np.concatenate([
+            old_term_map[old_terms[old_mask]] if len(old.vocab) else np.zeros(0, np.int64),
+            np.array([term_index[t] for t in self._pending_terms], dtype=np.int64)[new_mask]
+        ])
+        docs = np.concatenate([
+            old_doc_map[old.docs[old_mask]],
+            new_doc_map[new_docs[new_mask]]
+        ]).astype(np.int32)
+        tfs = np.concatenate([
+            old.tfs[old_mask],
+            np.minimum(np.asarray(self._pending_tfs, dtype=np.int64), 65535)[new_mask]
+        ]).astype(np.uint16)
+
+        # Sort postings by term then document and drop terms without postings
+        order = np.lexsort((docs, terms))
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+        counts = np.bincount(terms, minlength=len(vocab))
+        used = counts > 0
+        vocab = [term for term, keep in zip(vocab, used) if keep]
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(counts[used], out=offsets[1:])
+
+        doc_ids = [d for d, keep in zip(old.doc_ids, keep_doc) if keep]
+        doc_ids.extend(d for d, keep in zip(self._pending_ids, keep_new) if keep)
+        doc_lengths = np.concatenate([
+            old.doc_lengths[keep_doc],
+            np.asarray(self._pending_lengths, dtype=np.int32)[keep_new]
+        ]).astype(np.int32)
+        return _Postings(vocab, offsets, docs, tfs, doc_ids, doc_lengths)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Rank committed documents against a query with BM25.
+
+        Only the postings of the query terms are read.
+
+        Args:
+            query: Free-text query
+            k: Number of documents to return
+
+        Returns:
+            (document ID, BM25 score) pairs, best first
+        """
+        postings = self._postings
+        n_docs = len(postings.doc_ids)
+        term_ids = {postings.term_index[t] for t in tokenize(query) if t in postings.term_index}
+        if not n_docs or not term_ids or k <= 0:
+            return []
+
+        doc_parts, weight_parts = [], []
+        for term_id in term_ids:
+            start, end = postings.offsets[term_id], postings.offsets[term_id + 1]
+            docs = postings.docs[start:end]
+            tfs = postings.tfs[start:end].astype(np.float64)
+            df = end - start
+            idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = 1 - self.b + self.b * postings.doc_lengths[docs] / postings.avg_length
+            doc_parts.append(docs)
+            weight_parts.append(idf * tfs * (self.k1 + 1) / (tfs + self.k1 * norm))
+
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weight_parts))
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(postings.doc_ids[docs[i]], float(scores[i])) for i in top]
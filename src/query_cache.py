@@ -0,0 +1,183 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """Normalize query text so trivially different spellings share a cache key."""
+    return _WHITESPACE.sub(' ', query.lower()).strip().rstrip('?!. ')
+
+
+def controls_key(controls: Dict[str, Any]) -> str:
+    """Serialize the query controls that influence results into a stable key."""
+    return json.dumps(controls, sort_keys=True, default=str)
+
+
+class QueryCache:
+    """
+    Two-tier cache of answered queries.
+
+    The exact tier matches normalized query text plus controls; the semantic
+    tier reuses an entry with the same controls whose query embedding lies
+    within a cosine distance threshold. Entries expire after a TTL, the least
+    recently used entry is evicted when full, and everything is dropped when
+    the ingest generation of the collection changes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 3600.0,
+        semantic_distance: float = 0.03,
+        generation: int = 0
+    ):
+        """
+        Initialize QueryCache.
+
+        Args:
+            max_entries: Maximum number of cached queries
+            ttl_seconds: Lifetime of an entry in seconds
+            semantic_distance: Maximum cosine distance for a semantic hit;
+                0 disables the semantic tier
+            generation: Ingest generation the cached answers were computed on
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_distance = semantic_distance
+        self.generation = generation
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'exact_hits': 0, 'semantic_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0
+        }
+
+    @staticmethod
+    def _key(query: str, controls: Dict[str, Any]) -> str:
+        return f"{controls_key(controls)}|{normalize_query(query)}"
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry['created'] > self.ttl_seconds
+
+    def _purge_expired(self, now: float):
+        for key in [k for k, e in self._entries.items() if self._expired(e, now)]:
+            del self._entries[key]
+            self._stats['expirations'] += 1
+
+    def set_generation(self, generation: int):
+        """Invalidate every entry if the collection's ingest generation changed."""
+        with self._lock:
+            if generation != self.generation:
+                logger.info(f"Ingest generation changed to {generation}, clearing query cache")
+                self._entries.clear()
+                self.generation = generation
+
+    def get(
+        self,
+        query: str,
+        controls: Dict[str, Any],
+        embedding: Union[Sequence[float], Callable[[], Sequence[float]], None] = None
+    ) -> Optional[Any]:
+        """Look up a cached value; see lookup()."""
+        return self.lookup(query, controls, embedding)[0]
+
+    def lookup(
+        self,
+        query: str,
+        controls: Dict[str, Any],
+        embedding: Union[Sequence[float], Callable[[], Sequence[float]], None] = None
+    ) -> Tuple[Optional[Any], str]:
+        """
+        Look up a cached value, trying the exact tier then the semantic tier.
+
+        Args:
+            query: User's query string
+            controls: Query controls the value was computed with
+            embedding: Query embedding, or a callable computing it that is only
+                invoked when the exact tier misses; required for semantic lookups
+
+        Returns:
+            Tuple of (cached value or None, tier: 'exact', 'semantic' or 'miss')
+        """
+        key = self._key(query, controls)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not self._expired(entry, time.monotonic()):
+                self._entries.move_to_end(key)
+                self._stats['exact_hits'] += 1
+                return entry['value'], 'exact'
+
+        if embedding is not None and self.semantic_distance > 0:
+            vector = self._unit(embedding() if callable(embedding) else embedding)
+            group = controls_key(controls)
+            with self._lock:
+                self._purge_expired(time.monotonic())
+                candidates = [
+                    (k, e) for k, e in self._entries.items()
+                    if e['controls'] == group and e['embedding'] is not None
+                ]
+                if candidates:
+                    distances = 1.0 - np.stack([e['embedding'] for _, e in candidates]) @ vector
+                    best = int(np.argmin(distances))
+                    if distances[best] <= self.semantic_distance:
+                        best_key, best_entry = candidates[best]
+                        self._entries.move_to_end(best_key)
+                        self._stats['semantic_hits'] += 1
+                        return best_entry['value'], 'semantic'
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None, 'miss'
+
+    def put(
+        self,
+        query: str,
+        controls: Dict[str, Any],
+        value: Any,
+        embedding: Optional[Sequence[float]] = None
+    ):
+        """Store a value, evicting the least recently used entries when full."""
+        key = self._key(query, controls)
+        with self._lock:
+            self._entries[key] = {
+                'value': value,
+                'controls': controls_key(controls),
+                'embedding': self._unit(embedding) if embedding is not None else None,
+                'created': time.monotonic()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit, miss and eviction counters plus the current size."""
+        with self._lock:
+            hits = self._stats['exact_hits'] + self._stats['semantic_hits']
+            lookups = hits + self._stats['misses']
+            return dict(
+                self._stats,
+                size=len(self._entries),
+                generation=self.generation,
+                hit_rate=hits / lookups if lookups else 0.0
+            )
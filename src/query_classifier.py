@@ -0,0 +1,363 @@
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLASSIFIER_MODES = ('llm', 'local', 'hybrid')
+QUERY_TYPES = ('factual', 'opinion', 'comparison', 'procedural', 'conceptual')
+
+# Ordered by precedence: the first matching type wins ties
+_TYPE_RULES = [
+    ('comparison', re.compile(
+        r"\b(compare[sd]?|comparison|versus|vs\.?|differ(s|ence|ences|ent)?|contrast|"
+        r"similarit(y|ies)|better than|worse than|agree|disagree)\b"
+    )),
+    ('procedural', re.compile(
+        r"^(how (do|can|should|would) (i|you|we|one)|how to)\b|"
+        r"\b(steps?|routine|protocol|guide|tips|ways to|best way|recommend(ed|ations?)?)\b"
+    )),
+    ('opinion', re.compile(
+        r"\b(think|thinks|opinions?|believes?|views?|feel about|feels about|stance|"
+        r"take on|thoughts on|perspective|position on|argue[sd]?)\b"
+    )),
+    ('conceptual', re.compile(
+        r"^(why|explain)\b|\b(concept|theory|meaning of|idea of|principles?|"
+        r"understand(ing)?|framework|nature of)\b"
+    )),
+    ('factual', re.compile(
+        r"^(what|who|when|where|which|how (many|much|long|old|often)|did|does|is|are|was|were)\b"
+    )),
+]
+
+_TIME_RULES = [
+    ('recent_only', re.compile(
+        r"\b(recent(ly)?|latest|lately|this (year|month|week)|newest|now)\b"
+    )),
+    ('historical', re.compile(r"\b(history|historical|ancient|origins?|in the past)\b")),
+]
+
+_SOURCE_ALIASES = {
+    'Lex Fridman': re.compile(r"\blex( fridman)?\b"),
+    'Andrew Huberman': re.compile(r"\b(huberman|andrew huberman)\b"),
+    'The Diary Of A CEO': re.compile(r"\b(diary of a ceo|doac|steven bartlett)\b"),
+}
+
+# Separators between the subjects of a multi-topic question
+_SUBJECT_SEPARATOR = re.compile(r",|;|\b(?:and|or|versus|vs\.?|compared (?:to|with))\b")
+# Upper bound on the sub-queries searched for one question
+MAX_SUB_QUERIES = 4
+
+_PROPER_NOUN = re.compile(r"\b([A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)*)")
+_WORD = re.compile(r"[a-z0-9][a-z0-9'-]*")
+
+_STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers him his how i if in into is it its itself just me more
+most my no nor not now of off on once only or other our ours out over own same she should so
+some such than that the their theirs them then there these they this those through to too
+under until up very was we were what when where which while who whom why will with would you
+your yours say says said think thinks tell talk talks discuss discusses explain compare
+difference differences between versus vs opinion opinions view views podcast podcasts episode
+episodes guest guests
+""".split())
+
+
+def _proper_nouns(query: str) -> List[str]:
+    """Capitalized names in a query, lowercased ("Bernie Sanders" -> "bernie sanders")."""
+    proper_nouns = []
+    for match in _PROPER_NOUN.finditer(query):
+        phrase = match.group(1)
+        words = phrase.split()
+        # Drop a sentence-initial interrogative or auxiliary ("What", "How does")
+        while words and words[0].lower() in _STOPWORDS:
+            words = words[1:]
+        if words:
+            proper_nouns.append(' '.join(words).lower())
+    return proper_nouns
+
+
+def _extract_terms(query: str) -> Tuple[List[str], List[str]]:
+    """Return (topics, key_terms) extracted from a query without any model."""
+    key_terms = []
+    for word in _WORD.findall(query.lower()):
+        if word not in _STOPWORDS and len(word) > 2 and word not in key_terms:
+            key_terms.append(word)
+
+    topics = list(dict.fromkeys(_proper_nouns(query) + key_terms))
+    return topics, key_terms
+
+
+def _content_words(text: str) -> List[str]:
+    """Words of text that carry its subject (no stopwords or comparison wording)."""
+    comparison = _TYPE_RULES[0][1]
+    return [
+        word for word in _WORD.findall(text)
+        if word not in _STOPWORDS and not comparison.fullmatch(word)
+    ]
+
+
+def decompose_query(
+    query: str,
+    analysis: Dict[str, Any],
+    max_sub_queries: int = MAX_SUB_QUERIES
+) -> List[str]:
+    """
+    Split a comparison or multi-topic question into focused sub-queries.
+
+    A comparison naming several podcasts gives one sub-query per podcast on
+    the shared subject ("How do Huberman and Lex differ on sleep?" gives
+    "Andrew Huberman sleep" and "Lex Fridman sleep"). Otherwise the items
+    joined by conjunctions and commas each get a sub-query that keeps the
+    subject they share and the names in the question ("What did Bernie
+    Sanders say about healthcare and education?" gives "bernie sanders
+    healthcare" and "bernie sanders education"). A question is only split
+    when it is a comparison or at least two of its items are key terms.
+
+    Args:
+        query: User's query string
+        analysis: Query analysis of the query
+        max_sub_queries: Maximum number of sub-queries returned
+
+    Returns:
+        Sub-queries, empty when the question has a single subject
+    """
+    text = ' '.join(query.lower().split())
+    is_comparison = analysis.get('query_type') == 'comparison'
+    sources = [name for name, pattern in _SOURCE_ALIASES.items() if pattern.search(text)]
+    if is_comparison and len(sources) >= 2:
+        subject = text
+        for name in sources:
+            subject = _SOURCE_ALIASES[name].sub(' ', subject)
+        words = _content_words(subject)
+        if not words:
+            return []
+        return [f"{name} {' '.join(words)}" for name in sources][:max_sub_queries]
+
+    parts = [words for words in map(_content_words, _SUBJECT_SEPARATOR.split(text)) if words]
+    if len(parts) < 2:
+        return []
+    # The first part ends with its own item, as long as the last one ("sleep"
+    # in "how does caffeine affect sleep and focus"); what precedes it is shared
+    size = min(len(parts[-1]), len(parts[0]))
+    shared = parts[0][:len(parts[0]) - size]
+    items = [parts[0][len(parts[0]) - size:]] + parts[1:]
+    key_terms = set(analysis.get('key_terms') or [])
+    if not is_comparison and sum(bool(key_terms.intersection(item)) for item in items) < 2:
+        return []
+
+    # Names outside every item ("Bernie Sanders" in "what did Bernie Sanders
+    # say about healthcare and education") are part of each sub-query
+    item_words = {word for item in items for word in item}
+    names = [name for name in _proper_nouns(query) if not item_words.intersection(name.split())]
+    sub_queries, seen = [], set()
+    for item in items:
+        words = shared + [word for word in item if word not in shared]
+        missing = [name for name in names if not set(name.split()) <= set(words)]
+        sub_query = ' '.join(missing + words)
+        # Parts that only reorder the same words are one subject
+        if frozenset(sub_query.split()) not in seen:
+            seen.add(frozenset(sub_query.split()))
+            sub_queries.append(sub_query)
+    return sub_queries[:max_sub_queries] if len(sub_queries) >= 2 else []
+
+
+class RuleBasedQueryClassifier:
+    """
+    Keyword and regex rules producing the same analysis schema as the LLM.
+    """
+
+    def classify(self, query: str) -> Tuple[Dict[str, Any], float]:
+        """
+        Classify a query.
+
+        Args:
+            query: User's query string
+
+        Returns:
+            Tuple of (query analysis, confidence between 0 and 1)
+        """
+        text = ' '.join(query.lower().split())
+        matched = [query_type for query_type, pattern in _TYPE_RULES if pattern.search(text)]
+        query_type = matched[0] if matched else 'factual'
+
+        # One clear rule is confident; competing rules or no rule at all are not
+        if len(matched) == 1:
+            confidence = 0.9
+        elif len(matched) == 2 and 'factual' in matched:
+            # "What does X think..." is opinion, the interrogative only adds factual
+            confidence = 0.8
+        elif matched:
+            confidence = 0.5
+        else:
+            confidence = 0.3
+
+        time_relevance = next(
+            (label for label, pattern in _TIME_RULES if pattern.search(text)), 'any_time'
+        )
+        sources = [name for name, pattern in _SOURCE_ALIASES.items() if pattern.search(text)]
+        topics, key_terms = _extract_terms(query)
+        word_count = len(text.split())
+        if word_count <= 5:
+            complexity = "basic"
+        elif word_count > 20:
+            complexity = "advanced"
+        else:
+            complexity = "intermediate"
+
+        return {
+            "query_type": query_type,
+            "topics": topics or [text],
+            "context_needs": ["general information"],
+            "expected_sources": sources or ["any"],
+            "time_relevance": time_relevance,
+            "summary_format": "comparison table" if query_type == 'comparison' else "general",
+            "complexity_level": complexity,
+            "key_terms": key_terms or text.split()
+        }, confidence
+
+
+class QueryTypeModel:
+    """
+    Optional scikit-learn query type model trained from logged LLM classifications.
+    """
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    @classmethod
+    def train(cls, examples: List[Dict[str, Any]]) -> Optional["QueryTypeModel"]:
+        """
+        Fit a TF-IDF + logistic regression model.
+
+        Args:
+            examples: Dictionaries with 'query' and 'query_type' keys
+
+        Returns:
+            Trained model, or None if scikit-learn is missing or data is insufficient
+        """
+        try:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            from sklearn.linear_model import LogisticRegression
+            from sklearn.pipeline import make_pipeline
+        except ImportError:
+            logger.warning("scikit-learn is not installed; query type model is unavailable")
+            return None
+
+        examples = [e for e in examples if e.get('query_type') in QUERY_TYPES]
+        if len({e['query_type'] for e in examples}) < 2:
+            logger.warning("Not enough labelled query types to train a model")
+            return None
+
+        pipeline = make_pipeline(
+            TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True),
+            LogisticRegression(max_iter=1000)
+        )
+        pipeline.fit([e['query'] for e in examples], [e['query_type'] for e in examples])
+        return cls(pipeline)
+
+    def predict(self, query: str) -> Tuple[str, float]:
+        """Return the predicted query type and its probability."""
+        probabilities = self.pipeline.predict_proba([query])[0]
+        best = probabilities.argmax()
+        return self.pipeline.classes_[best], float(probabilities[best])
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            pickle.dump(self.pipeline, f)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["QueryTypeModel"]:
+        """Load a saved model, returning None if it is missing or unusable."""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return cls(pickle.load(f))
+        except Exception as e:
+            logger.warning(f"Could not load query type model {path}: {e}")
+            return None
+
+
+class LocalQueryClassifier:
+    """
+    Rule-based classifier, optionally backed by a trained query type model.
+    """
+
+    def __init__(self, model: Optional[QueryTypeModel] = None):
+        """
+        Initialize LocalQueryClassifier.
+
+        Args:
+            model: Optional trained model consulted when the rules are unsure
+        """
+        self.rules = RuleBasedQueryClassifier()
+        self.model = model
+
+    def classify(self, query: str) -> Tuple[Dict[str, Any], float]:
+        """Classify a query, returning (query analysis, confidence)."""
+        analysis, confidence = self.rules.classify(query)
+        if self.model is not None and confidence < 0.8:
+            try:
+                query_type, probability = self.model.predict(query)
+                if probability > confidence:
+                    analysis['query_type'] = query_type
+                    confidence = probability
+            except Exception as e:
+                logger.warning(f"Query type model failed: {e}")
+        return analysis, confidence
+
+
+class ClassificationLog:
+    """
+    Append-only JSON lines log of LLM query classifications, used as training data.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, query: str, analysis: Dict[str, Any]):
+        """Record one LLM classification."""
+        record = {
+            'query': query,
+            'query_type': analysis.get('query_type'),
+            'topics': analysis.get('topics'),
+            'key_terms': analysis.get('key_terms')
+        }
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + '\n')
+        except OSError as e:
+            logger.warning(f"Could not log query classification: {e}")
+
+    def read(self) -> List[Dict[str, Any]]:
+        """Return every logged classification."""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Train the local query type model from logged LLM classifications."
+    )
+    parser.add_argument('--log', default=os.path.join('chroma_db', 'query_classifications.jsonl'))
+    parser.add_argument('--output', default=os.path.join('chroma_db', 'query_type_model.pkl'))
+    args = parser.parse_args()
+
+    trained = QueryTypeModel.train(ClassificationLog(args.log).read())
+    if trained:
+        trained.save(args.output)
+        logger.info(f"Saved query type model to {args.output}")
@@ -1,40 +1,152 @@
+import concurrent.futures
 import json
 import logging
+import time
 from datetime import datetime
-from typing import List, Dict, Any, Tuple, Optional
-import pandas as pd
-from openai import OpenAI
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Sequence, Tuple, Optional
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+try:
+    from .embeddings import EmbeddingService
+    from .query_classifier import (
+        CLASSIFIER_MODES, ClassificationLog, LocalQueryClassifier, decompose_query
+    )
+    from .filters import build_where_filter
+    from .chunking import make_chunk_id
+    from .context_packer import ContextPacker, count_tokens, stitch_passages
+    from .lexical_index import LexicalIndex
+    from .tracing import Span, Trace, Tracer
+    from .results import SearchResult
+    from .scoring import (
+        QUERY_TYPE_WEIGHTS, BatchRelevanceScorer, embedding_distances, reciprocal_rank_fusion
+    )
+except ImportError:  # imported from src/ by `streamlit run src/app.py`
+    from embeddings import EmbeddingService
+    from query_classifier import (
+        CLASSIFIER_MODES, ClassificationLog, LocalQueryClassifier, decompose_query
+    )
+    from filters import build_where_filter
+    from chunking import make_chunk_id
+    from context_packer import ContextPacker, count_tokens, stitch_passages
+    from lexical_index import LexicalIndex
+    from tracing import Span, Trace, Tracer
+    from results import SearchResult
+    from scoring import (
+        QUERY_TYPE_WEIGHTS, BatchRelevanceScorer, embedding_distances, reciprocal_rank_fusion
+    )
 
 logger = logging.getLogger(__name__)
 
+# The lexical index does not know chunk channels and dates: with a `where`
+# filter, this many times more BM25 hits are fetched before filtering
+LEXICAL_FILTER_OVERFETCH = 5
+
+
 class QueryProcessor:
     """
     Handles query processing, analysis, and response generation for transcripts.
     """
     
-    def __init__(self, collection, openai_client: OpenAI):
+    def __init__(
+        self,
+        collection,
+        openai_client: "OpenAI",
+        embedding_service: Optional[EmbeddingService] = None,
+        classifier_mode: str = 'llm',
+        local_classifier: Optional[LocalQueryClassifier] = None,
+        classifier_threshold: float = 0.75,
+        classification_log: Optional[ClassificationLog] = None,
+        semantic_from_distance: bool = True,
+        lexical_index: Optional[LexicalIndex] = None,
+        context_packer: Optional[ContextPacker] = None,
+        tracer: Optional[Tracer] = None,
+        transcript_store=None,
+        context_window: int = 0,
+        max_sub_queries: int = 0
+    ):
         """
         Initialize QueryProcessor.
         
         Args:
-            collection: Chroma collection instance
+            collection: Chroma collection or other VectorStore
             openai_client: OpenAI client instance
+            embedding_service: Embedding service shared with ingestion; defaults
+                to an uncached service over openai_client
+            classifier_mode: 'llm' always asks the LLM, 'local' only uses the
+                local classifier and 'hybrid' escalates to the LLM when the
+                local classifier's confidence is below classifier_threshold
+            local_classifier: Local query classifier used by 'local' and 'hybrid'
+            classifier_threshold: Minimum local confidence accepted in 'hybrid' mode
+            classification_log: Optional log of LLM classifications for training
+            semantic_from_distance: Use the vector search distance as the
+                semantic relevance component instead of a constant 0.5
+            lexical_index: Optional BM25 index searched alongside the vector
+                index; both rankings are merged with reciprocal rank fusion
+            context_packer: Packs result passages into the answer prompt under
+                a token budget; defaults to ContextPacker()
+            tracer: Tracer receiving one trace per query; defaults to a tracer
+                feeding the process-wide metrics without exporting
+            transcript_store: Optional TranscriptStore from which the full text
+                of results is sliced instead of fetched from the collection
+            context_window: Number of adjacent chunks added on each side of
+                every result when building the answer prompt (0 disables it)
+            max_sub_queries: Maximum number of sub-queries a comparison or
+                multi-topic question is split into, all searched in one
+                batch with the question itself (0 disables decomposition)
         """
+        if classifier_mode not in CLASSIFIER_MODES:
+            raise ValueError(f"classifier_mode must be one of {CLASSIFIER_MODES}")
         self.collection = collection
         self.openai_client = openai_client
+        self.embedding_service = embedding_service or EmbeddingService(openai_client)
+        self.classifier_mode = classifier_mode
+        self.local_classifier = local_classifier or LocalQueryClassifier()
+        self.classifier_threshold = classifier_threshold
+        self.classification_log = classification_log
+        self.semantic_from_distance = semantic_from_distance
+        self.lexical_index = lexical_index
+        self.context_packer = context_packer or ContextPacker()
+        self.tracer = tracer or Tracer()
+        self.transcript_store = transcript_store
+        self.context_window = context_window
+        self.max_sub_queries = max_sub_queries
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
 
     def detect_query_type(self, query: str) -> Dict[str, Any]:
         """
         Analyze query to determine type and requirements.
         
+        Depending on classifier_mode the analysis comes from the local
+        classifier, the LLM, or the local classifier with LLM escalation.
+        
         Args:
             query: User's query string
             
         Returns:
             Dictionary containing query analysis
         """
+        local_analysis = None
+        if self.classifier_mode != 'llm':
+            local_analysis, confidence = self.local_classifier.classify(query)
+            local_analysis['classifier'] = 'local'
+            local_analysis['classifier_confidence'] = confidence
+            if self.classifier_mode == 'local' or confidence >= self.classifier_threshold:
+                return local_analysis
+        return self._detect_query_type_llm(query, fallback=local_analysis)
+
+    def _detect_query_type_llm(
+        self,
+        query: str,
+        fallback: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze query with the LLM, returning fallback (or a default) on error.
+        """
         try:
-            analysis_prompt = f"""Analyze this transcript-related query and provide a structured classification:
+            analysis_prompt = f"""Analyze this transcript-related query and provide a \
+structured classification:
             Query: {query}
             
             Generate a JSON response with:
@@ -50,15 +162,23 @@ class QueryProcessor:
             response = self.openai_client.chat.completions.create(
                 model="gpt-4-turbo-preview",
                 messages=[
-                    {"role": "system", "content": "You are an expert at analyzing queries about content."},
+                    {
+                        "role": "system",
+                        "content": "You are an expert at analyzing queries about content."
+                    },
                     {"role": "user", "content": analysis_prompt}
                 ]
             )
             
-            return json.loads(response.choices[0].message.content)
+            analysis = json.loads(response.choices[0].message.content)
+            if self.classification_log:
+                self.classification_log.append(query, analysis)
+            return analysis
             
         except Exception as e:
             logger.error(f"Error in query analysis: {e}")
+            if fallback is not None:
+                return fallback
             # Return default analysis if error occurs
             return {
                 "query_type": "factual",
@@ -71,7 +191,9 @@ class QueryProcessor:
                 "key_terms": query.lower().split()
             }
 
-    def calculate_temporal_relevance(self, metadata: Dict[str, Any], max_age_days: int = 365) -> float:
+    def calculate_temporal_relevance(
+        self, metadata: Dict[str, Any], max_age_days: int = 365
+    ) -> float:
         """
         Calculate temporal relevance score based on content age.
         
@@ -86,6 +208,9 @@ class QueryProcessor:
             if not metadata.get('published_at'):
                 return 0.5
 
+            # Imported lazily: batch scoring uses numpy, pandas is only needed here
+            import pandas as pd
+
             published_date = pd.to_datetime(metadata['published_at'])
             age_days = (pd.Timestamp.now() - published_date).days
             
@@ -137,16 +262,8 @@ class QueryProcessor:
             temporal_score = self.calculate_temporal_relevance(metadata)
 
             # Calculate weighted score based on query type
-            weights = {
-                'factual': (0.3, 0.2, 0.3, 0.1, 0.1),
-                'opinion': (0.2, 0.2, 0.2, 0.3, 0.1),
-                'comparison': (0.3, 0.2, 0.2, 0.2, 0.1),
-                'procedural': (0.2, 0.3, 0.3, 0.1, 0.1),
-                'conceptual': (0.3, 0.2, 0.2, 0.2, 0.1)
-            }
-
             query_type = query_analysis.get('query_type', 'factual')
-            w = weights.get(query_type, weights['factual'])
+            w = QUERY_TYPE_WEIGHTS.get(query_type, QUERY_TYPE_WEIGHTS['factual'])
 
             final_score = (
                 semantic_score * w[0] +
@@ -162,60 +279,503 @@ class QueryProcessor:
             logger.error(f"Error calculating content relevance: {e}")
             return 0.0
 
+    def plan_queries(self, query: str) -> List[str]:
+        """
+        Sub-queries searched alongside a comparison or multi-topic question.
+
+        Uses the local classifier so planning does not wait for the (possibly
+        LLM) query analysis.
+        """
+        if self.max_sub_queries <= 0:
+            return []
+        analysis, _ = self.local_classifier.classify(query)
+        return decompose_query(query, analysis, self.max_sub_queries)
+
+    def retrieve_candidates(
+        self,
+        query: str,
+        n_results: int,
+        timings: Optional[Dict[str, float]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        sub_queries: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Embed the query and fetch nearest chunks from the collection.
+
+        Independent of the query analysis, so it can run concurrently with it.
+        With a lexical index, BM25 hits are fetched as well and both rankings
+        are fused with reciprocal rank fusion. A question with sub-queries is
+        searched together with them in one batch and the rankings are fused.
+
+        Args:
+            query: User's query string
+            n_results: Number of candidates to fetch
+            timings: Optional dictionary receiving per-stage durations in ms
+            where: Optional Chroma metadata filter applied inside the index
+            sub_queries: Sub-queries of the question; planned with
+                plan_queries when omitted
+
+        Returns:
+            Raw Chroma query results
+        """
+        if sub_queries is None:
+            sub_queries = self.plan_queries(query)
+        if sub_queries:
+            rankings = self.retrieve_candidates_many(
+                [query] + list(sub_queries), n_results, timings, where
+            )
+            return self.fuse_rankings(rankings, n_results)
+
+        timings = timings if timings is not None else {}
+        start = time.perf_counter()
+        embedding = self.embedding_service.embed(query)
+        embedded = time.perf_counter()
+        query_kwargs = {'where': where} if where else {}
+        results = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+            **query_kwargs
+        )
+        timings['embedding_ms'] = (embedded - start) * 1000
+        timings['search_ms'] = (time.perf_counter() - embedded) * 1000
+
+        if self.lexical_index is not None:
+            lexical_start = time.perf_counter()
+            results = self.fuse_lexical(query, embedding, results, n_results, where)
+            timings['lexical_ms'] = (time.perf_counter() - lexical_start) * 1000
+        return results
+
+    def retrieve_candidates_many(
+        self,
+        queries: List[str],
+        n_results: int,
+        timings: Optional[Dict[str, float]] = None,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieve candidates for several queries sharing the same filter.
+
+        The queries are embedded in one batch and searched with a single
+        multi-embedding collection.query; lexical fusion is then applied per
+        query as in retrieve_candidates.
+
+        Returns:
+            Chroma-shaped results of each query, in input order
+        """
+        if not queries:
+            return []
+        timings = timings if timings is not None else {}
+        start = time.perf_counter()
+        embeddings = self.embedding_service.embed_many(queries)
+        embedded = time.perf_counter()
+        query_kwargs = {'where': where} if where else {}
+        batch = self.collection.query(
+            query_embeddings=embeddings,
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+            **query_kwargs
+        )
+        timings['embedding_ms'] = (embedded - start) * 1000
+        timings['search_ms'] = (time.perf_counter() - embedded) * 1000
+
+        per_query = [
+            {key: [batch[key][i]] for key in ('ids', 'documents', 'metadatas', 'distances')}
+            for i in range(len(queries))
+        ]
+        if self.lexical_index is not None:
+            lexical_start = time.perf_counter()
+            per_query = [
+                self.fuse_lexical(query, embedding, results, n_results, where)
+                for query, embedding, results in zip(queries, embeddings, per_query)
+            ]
+            timings['lexical_ms'] = (time.perf_counter() - lexical_start) * 1000
+        return per_query
+
+    @staticmethod
+    def fuse_rankings(rankings: Sequence[Dict[str, Any]], n_results: int) -> Dict[str, Any]:
+        """
+        Fuse the results of several queries with reciprocal rank fusion.
+
+        A chunk found by several queries appears once, with the smallest of
+        its distances. Chunks are identified by ID, or by their document
+        when the results carry no IDs.
+
+        Returns:
+            Chroma-shaped results holding the n_results best fused candidates
+        """
+        candidates: Dict[str, Tuple[Optional[str], str, Dict[str, Any], float]] = {}
+        keyed_rankings = []
+        for results in rankings:
+            documents = results['documents'][0]
+            ids = results.get('ids', [[]])[0]
+            if len(ids) != len(documents):
+                ids = [None] * len(documents)
+            keys = []
+            for item_id, doc, meta, dist in zip(
+                ids, documents, results['metadatas'][0], results['distances'][0]
+            ):
+                key = item_id if item_id is not None else doc
+                known = candidates.get(key)
+                if known is None or dist < known[3]:
+                    candidates[key] = (item_id, doc, meta, dist)
+                keys.append(key)
+            keyed_rankings.append(keys)
+
+        fused_keys = list(reciprocal_rank_fusion(keyed_rankings))[:n_results]
+        fused = [candidates[key] for key in fused_keys]
+        merged = {
+            'documents': [[c[1] for c in fused]],
+            'metadatas': [[c[2] for c in fused]],
+            'distances': [[c[3] for c in fused]]
+        }
+        if all(c[0] is not None for c in fused):
+            merged['ids'] = [[c[0] for c in fused]]
+        return merged
+
+    def fuse_lexical(
+        self,
+        query: str,
+        embedding: List[float],
+        results: Dict[str, Any],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Merge BM25 hits into vector search results with reciprocal rank fusion.
+
+        Lexical-only hits are fetched with one collection.get, which also
+        applies the where filter, and get a distance computed from their
+        stored embedding so they are scored like vector hits. With a filter,
+        BM25 hits are over-fetched so the ones it drops leave room for others.
+
+        Returns:
+            Chroma-shaped results holding the n_results best fused candidates
+        """
+        vector_ids = results.get('ids', [[]])[0]
+        hits = self.lexical_index.search(
+            query, n_results * LEXICAL_FILTER_OVERFETCH if where else n_results
+        )
+        candidates = {
+            item_id: (doc, meta, dist)
+            for item_id, doc, meta, dist in zip(
+                vector_ids, results['documents'][0], results['metadatas'][0],
+                results['distances'][0]
+            )
+        }
+        missing = [item_id for item_id, _ in hits if item_id not in candidates]
+        if missing:
+            get_kwargs = {'where': where} if where else {}
+            fetched = self.collection.get(
+                ids=missing, include=["documents", "metadatas", "embeddings"], **get_kwargs
+            )
+            embeddings = fetched.get('embeddings')
+            if embeddings is not None and len(embeddings):
+                distances = embedding_distances(embedding, embeddings, self._distance_metric())
+            else:
+                distances = [float('nan')] * len(fetched['ids'])
+            for item_id, doc, meta, dist in zip(
+                fetched['ids'], fetched['documents'], fetched['metadatas'], distances
+            ):
+                candidates[item_id] = (doc, meta, float(dist))
+
+        # Lexical hits filtered out by `where` are absent from candidates
+        lexical_ids = [item_id for item_id, _ in hits if item_id in candidates][:n_results]
+        fused = list(reciprocal_rank_fusion([vector_ids, lexical_ids]))[:n_results]
+        return {
+            'ids': [fused],
+            'documents': [[candidates[i][0] for i in fused]],
+            'metadatas': [[candidates[i][1] for i in fused]],
+            'distances': [[candidates[i][2] for i in fused]]
+        }
+
+    def score_candidates(
+        self,
+        results: Dict[str, Any],
+        query_analysis: Dict[str, Any]
+    ) -> List[SearchResult]:
+        """
+        Score raw Chroma results against the query analysis in one batch.
+
+        Results keep a short excerpt of their document; when the id is known,
+        longer documents are dropped and fetched again only to build the
+        answer prompt.
+        """
+        ids = results.get('ids', [[]])[0]
+        documents = results['documents'][0]
+        distances = results['distances'][0]
+        metadatas = []
+        for meta in results['metadatas'][0]:
+            # Ensure consistent metadata
+            safe_meta = meta if meta else {}
+            safe_meta['title'] = safe_meta.get('title', 'Unknown Title')
+            safe_meta['published_at'] = safe_meta.get('published_at', 'Unknown Date')
+            safe_meta['channel'] = safe_meta.get('channel', 'Unknown Channel')
+            metadatas.append(safe_meta)
+
+        try:
+            scorer = BatchRelevanceScorer(
+                query_analysis,
+                distance_metric=self._distance_metric(),
+                use_distance=self.semantic_from_distance
+            )
+            scores = scorer.score(documents, metadatas, distances)
+        except Exception as e:
+            logger.error(f"Error in batch relevance scoring: {e}")
+            scores = [0.0] * len(documents)
+
+        if len(ids) != len(documents):
+            ids = [None] * len(documents)
+        return [
+            SearchResult.from_document(
+                item_id, doc, meta, dist, score, loader=self.load_documents
+            )
+            for item_id, doc, meta, dist, score in zip(ids, documents, metadatas, distances, scores)
+        ]
+
+    def _distance_metric(self) -> str:
+        """Distance function of the collection (Chroma defaults to squared L2)."""
+        metadata = getattr(self.collection, 'metadata', None)
+        if isinstance(metadata, dict):
+            return metadata.get('hnsw:space', 'l2')
+        return 'l2'
+
     def get_initial_results(
-            self,
-            query: str,
-            max_results: int,
-            query_analysis: Dict[str, Any]
-        ) -> List[Dict[str, Any]]:
-            """
-            Retrieve and process initial search results.
-            """
-            try:
-                # Generate query embedding
-                embedding = self.openai_client.embeddings.create(
-                    model="text-embedding-ada-002",
-                    input=query
-                ).data[0].embedding
-
-                # Query collection with more results for filtering
-                results = self.collection.query(
-                    query_embeddings=[embedding],
-                    n_results=max_results * 2,
-                    include=["documents", "metadatas", "distances"]
-                )
+        self,
+        query: str,
+        max_results: int,
+        query_analysis: Dict[str, Any]
+    ) -> List[SearchResult]:
+        """
+        Retrieve and process initial search results.
+
+        Candidates come from retrieve_candidates, so with a lexical index they
+        are the reciprocal rank fusion of the vector and BM25 rankings.
+        """
+        try:
+            # Query collection with more results for filtering
+            results = self.retrieve_candidates(query, max_results * 2)
+            return self.score_candidates(results, query_analysis)
+
+        except Exception as e:
+            logger.error(f"Error retrieving initial results: {e}")
+            raise
+
+    def load_documents(self, ids: Sequence[str]) -> List[str]:
+        """Fetch the full documents of result ids with one collection.get, in input order."""
+        if not ids:
+            return []
+        fetched = self.collection.get(ids=list(ids), include=["documents"])
+        documents = dict(zip(fetched['ids'], fetched['documents']))
+        return [documents.get(item_id) or '' for item_id in ids]
+
+    def _stored_text(self, result: SearchResult) -> Optional[str]:
+        """Text of a result sliced from the transcript store, or None."""
+        metadata = result.metadata or {}
+        if 'seg_start' not in metadata or 'seg_end' not in metadata:
+            return None
+        episode = self.transcript_store.open(metadata.get('episode_id', ''))
+        if episode is None:
+            return None
+        text = episode.text(int(metadata['seg_start']), int(metadata['seg_end']))
+        # A store packed from another version of the file is not trusted
+        return text if text.startswith(result.excerpt) else None
+
+    def with_full_text(self, results: Sequence[Any]) -> List[Dict[str, Any]]:
+        """
+        Results as dictionaries holding their full text. Documents missing
+        from SearchResult objects are sliced from the transcript store when
+        there is one, and the rest are fetched in a single batch.
+        """
+        documents = {}
+        missing = []
+        for r in results:
+            if not isinstance(r, SearchResult) or r.has_content:
+                continue
+            text = self._stored_text(r) if self.transcript_store is not None else None
+            if text is None:
+                missing.append(r.id)
+            else:
+                documents[r.id] = text
+        if missing:
+            documents.update(zip(missing, self.load_documents(missing)))
+        return [
+            r.to_dict(documents.get(r.id)) if isinstance(r, SearchResult) else r
+            for r in results
+        ]
+
+    def expand_context(
+        self,
+        results: Sequence[Dict[str, Any]],
+        window: Optional[int] = None,
+        stats: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Widen results to the chunks around them in the same episode.
 
-                processed_results = []
-                for doc, meta, dist in zip(
-                    results['documents'][0],
-                    results['metadatas'][0],
-                    results['distances'][0]
-                ):
-                    # Ensure consistent metadata
-                    safe_meta = meta if meta else {}
-                    safe_meta['title'] = safe_meta.get('title', 'Unknown Title')
-                    safe_meta['published_at'] = safe_meta.get('published_at', 'Unknown Date')
-                    safe_meta['channel'] = safe_meta.get('channel', 'Unknown Channel')
-
-                    # Calculate relevance score
-                    relevance_score = self.calculate_content_relevance(
-                        doc,
-                        safe_meta,
-                        query_analysis
-                    )
-
-                    processed_results.append({
-                        'content': doc,
-                        'metadata': safe_meta,
-                        'distance': dist,
-                        'relevance_score': relevance_score
+        Each result covers its chunk and `window` chunks on either side;
+        overlapping or touching ranges of an episode are merged into one
+        passage placed at its best-ranked result. Missing neighbours are
+        fetched with a single collection.get; their text is sliced from the
+        transcript store when the episode is packed there, otherwise the
+        chunk documents are stitched together.
+
+        Args:
+            results: Results holding their full text, best first
+            window: Chunks added on each side; defaults to self.context_window
+            stats: Optional dictionary receiving the number of fetched neighbours
+
+        Returns:
+            Result dictionaries whose content and segment range cover the window
+        """
+        window = self.context_window if window is None else window
+        if window <= 0:
+            return list(results)
+
+        # Per episode, [first chunk, last chunk, position of the best result]
+        ranges: Dict[str, List[List[int]]] = {}
+        for position, result in enumerate(results):
+            metadata = result.get('metadata') or {}
+            if metadata.get('episode_id') and metadata.get('chunk_index') is not None:
+                index = int(metadata['chunk_index'])
+                ranges.setdefault(metadata['episode_id'], []).append(
+                    [max(index - window, 0), index + window, position]
+                )
+        if not ranges:
+            return list(results)
+        for episode_id, spans in ranges.items():
+            spans.sort()
+            merged = [spans[0]]
+            for first, last, position in spans[1:]:
+                if first <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], last)
+                    merged[-1][2] = min(merged[-1][2], position)
+                else:
+                    merged.append([first, last, position])
+            ranges[episode_id] = merged
+
+        chunks: Dict[str, Tuple[Optional[str], Dict[str, Any]]] = {
+            r['id']: (r.get('content'), r.get('metadata') or {}) for r in results if r.get('id')
+        }
+        stored = {
+            episode_id: self.transcript_store.open(episode_id)
+            for episode_id in ranges
+        } if self.transcript_store is not None else {}
+        missing = [
+            make_chunk_id(episode_id, index)
+            for episode_id, spans in ranges.items()
+            for first, last, _ in spans
+            for index in range(first, last + 1)
+            if make_chunk_id(episode_id, index) not in chunks
+        ]
+        if missing:
+            include = ["metadatas"]
+            if not all(stored.get(episode_id) for episode_id in ranges):
+                include.append("documents")
+            fetched = self.collection.get(ids=missing, include=include)
+            documents = fetched.get('documents') or [None] * len(fetched['ids'])
+            for item_id, document, metadata in zip(
+                fetched['ids'], documents, fetched['metadatas']
+            ):
+                chunks[item_id] = (document, metadata or {})
+        if stats is not None:
+            stats['neighbour_chunks'] = len(missing)
+
+        passages: Dict[int, Dict[str, Any]] = {}
+        for episode_id, spans in ranges.items():
+            episode = stored.get(episode_id)
+            for first, last, position in spans:
+                parts = [
+                    chunks[item_id] for item_id in (
+                        make_chunk_id(episode_id, index) for index in range(first, last + 1)
+                    ) if item_id in chunks
+                ]
+                metadata = dict(results[position].get('metadata') or {})
+                spans_meta = [meta for _, meta in parts if 'seg_start' in meta]
+                if spans_meta:
+                    metadata.update({
+                        'seg_start': min(meta['seg_start'] for meta in spans_meta),
+                        'seg_end': max(meta['seg_end'] for meta in spans_meta),
+                        'start': min(meta.get('start', 0.0) for meta in spans_meta),
+                        'end': max(meta.get('end', 0.0) for meta in spans_meta),
                     })
+                content = None
+                if episode is not None and spans_meta:
+                    content = episode.text(int(metadata['seg_start']), int(metadata['seg_end']))
+                    # A store packed from another version of the file is not trusted
+                    if (results[position].get('content') or '') not in content:
+                        content = None
+                if content is None:
+                    content = stitch_passages([text or '' for text, _ in parts])
+                passage = dict(results[position])
+                passage.update({'content': content, 'metadata': metadata})
+                passages[position] = passage
+
+        expanded = []
+        for position, result in enumerate(results):
+            metadata = result.get('metadata') or {}
+            if metadata.get('episode_id') in ranges and metadata.get('chunk_index') is not None:
+                if position in passages:
+                    expanded.append(passages[position])
+            else:
+                expanded.append(result)
+        return expanded
+
+    def build_response_messages(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        stats: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Build the chat messages used to answer a query from its results.
 
-                return processed_results
+        With a context window, results are first widened to their
+        neighbouring chunks. Passages are then selected, deduplicated and
+        trimmed by the context packer to fit its token budget.
 
-            except Exception as e:
-                logger.error(f"Error retrieving initial results: {e}")
-                raise
+        Args:
+            query: User's query string
+            results: Scored results, best first
+            stats: Optional dictionary receiving the packed passage count and
+                the context and prompt token counts
+        """
+        passages = self.with_full_text(results)
+        if self.context_window:
+            passages = self.expand_context(passages, stats=stats)
+        packed = self.context_packer.pack(query, passages)
+
+        # Build the final analysis prompt
+        prompt = f"""You are analyzing transcript results to answer a query.
+
+### Question:
+{query}
+
+### Sources:
+{packed['context']}
+
+Provide:
+1. A direct, concise answer to the query.
+2. Supporting evidence from the sources, cited as [n].
+3. Relevant context or caveats for the user.
+"""
+
+        messages = [
+            {
+                "role": "system",
+                "content": "You are an expert in summarizing and analyzing content."
+            },
+            {"role": "user", "content": prompt}
+        ]
+        if stats is not None:
+            stats.update({
+                'passages': len(packed['passages']),
+                'dropped_results': packed['dropped'],
+                'context_tokens': packed['context_tokens'],
+                'prompt_tokens': sum(count_tokens(m['content']) for m in messages),
+                'token_budget': self.context_packer.token_budget
+            })
+        return messages
 
     def generate_response(
         self,
@@ -225,73 +785,125 @@ class QueryProcessor:
     ) -> str:
         """
         Generate a detailed response based on query and results.
+
+        Prompt packing statistics are recorded in query_analysis['context']
+        and a generation span is added to query_analysis['trace'].
         """
-        try:
-            if not results:
-                return "No relevant results found."
-
-            # Build detailed results
-            detailed_results = []
-            for idx, result in enumerate(results, 1):
-                content = result['content']
-                if isinstance(content, dict):
-                    content = str(content.get('text', ''))
-                elif not isinstance(content, str):
-                    content = str(content)
-
-                # Metadata display
-                title = result['metadata'].get('title', 'Unknown Title')
-                channel = result['metadata'].get('channel', 'Unknown Channel')
-                published_at = result['metadata'].get('published_at', 'Unknown Date')
-                relevance_score = result.get('relevance_score', 0.0)
-
-                # Add detailed formatting
-                detailed_results.append(f"""
-    **Source {idx}:**  
-    **Title:** {title}  
-    **Channel:** {channel}  
-    **Date:** {published_at}  
-    **Relevance:** {relevance_score:.2f}  
-
-    **Content Preview:**  
-    {content[:500]}... *(truncated)*  
-
-    ---
-    """)
-
-            # Combine detailed results
-            all_details = "\n".join(detailed_results)
-
-            # Build the final analysis prompt
-            prompt = f"""You are analyzing transcript results to answer a query.  
-
-    ### Question:  
-    {query}  
-
-    ### Detailed Results:  
-    {all_details}  
-
-    Provide:  
-    1. A direct, concise answer to the query.  
-    2. Supporting evidence from the results.  
-    3. Relevant context or caveats for the user.  
-    """
+        if not results:
+            return "No relevant results found."
 
+        span = Span('generation', stream=False)
+        start = time.perf_counter()
+        completion_tokens = None
+        try:
             # Generate response from OpenAI
             response = self.openai_client.chat.completions.create(
                 model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": "You are an expert in summarizing and analyzing content."},
-                    {"role": "user", "content": prompt}
-                ]
+                messages=self.build_response_messages(
+                    query, results, query_analysis.setdefault('context', {})
+                )
             )
+            usage = getattr(response, 'usage', None)
+            if isinstance(getattr(usage, 'prompt_tokens', None), int):
+                query_analysis['context']['api_prompt_tokens'] = usage.prompt_tokens
+            content = response.choices[0].message.content
+            if isinstance(getattr(usage, 'completion_tokens', None), int):
+                completion_tokens = usage.completion_tokens
+            elif isinstance(content, str):
+                completion_tokens = count_tokens(content)
 
             # Return the final response
-            return response.choices[0].message.content
+            return content
 
         except Exception as e:
             logger.error(f"Error generating response: {e}")
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - start) * 1000
+            self._finish_generation(span, query_analysis, completion_tokens)
+
+    def generate_response_stream(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        query_analysis: Dict[str, Any]
+    ) -> Iterator[str]:
+        """
+        Stream a response token by token as the completion arrives.
+
+        Time to first token and total generation time are recorded in
+        query_analysis['timings'] once the stream is exhausted, and prompt
+        packing statistics in query_analysis['context'].
+
+        Yields:
+            Text fragments of the answer
+        """
+        if not results:
+            yield "No relevant results found."
+            return
+
+        timings = query_analysis.setdefault('timings', {})
+        span = Span('generation', stream=True)
+        fragments = []
+        start = time.perf_counter()
+        try:
+            stream = self.openai_client.chat.completions.create(
+                model="gpt-4-turbo-preview",
+                messages=self.build_response_messages(
+                    query, results, query_analysis.setdefault('context', {})
+                ),
+                stream=True
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if 'first_token_ms' not in timings:
+                        timings['first_token_ms'] = (time.perf_counter() - start) * 1000
+                    fragments.append(delta)
+                    yield delta
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+            span.error = f"{type(e).__name__}: {e}"
             raise
+        finally:
+            timings['generation_ms'] = (time.perf_counter() - start) * 1000
+            span.duration_ms = timings['generation_ms']
+            span.set(first_token_ms=timings.get('first_token_ms'))
+            self._finish_generation(span, query_analysis, count_tokens(''.join(fragments)))
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=4, thread_name_prefix="query-processor"
+            )
+        return self._executor
+
+    @staticmethod
+    def _timed(trace: Trace, timings: Dict[str, float], stage: str, func, *args):
+        start = time.perf_counter()
+        try:
+            with trace.span(stage):
+                return func(*args)
+        finally:
+            timings[f'{stage}_ms'] = (time.perf_counter() - start) * 1000
+
+    def _finish_generation(
+        self,
+        span: Span,
+        query_analysis: Dict[str, Any],
+        completion_tokens: Optional[int]
+    ):
+        """Close the generation span and append it to the query trace."""
+        context = query_analysis.get('context', {})
+        span.set(
+            prompt_tokens=context.get('api_prompt_tokens', context.get('prompt_tokens')),
+            completion_tokens=completion_tokens,
+            passages=context.get('passages')
+        )
+        self.tracer.add_span(query_analysis.get('trace'), span)
 
     def process_query(
         self,
@@ -299,32 +911,92 @@ class QueryProcessor:
         max_results: int = 5,
         min_relevance: float = 0.0,
         channels: Optional[Dict[str, bool]] = None,
-        response_style: Optional[str] = None
+        response_style: Optional[str] = None,
+        parallel: bool = True,
+        date_range: Optional[Tuple[Any, Any]] = None,
+        candidates: Optional[Dict[str, Any]] = None
     ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
         """
         Process user query and return relevant results.
+
+        Channel and date constraints are pushed down into the vector search
+        as a Chroma `where` filter. With parallel enabled, the query analysis
+        LLM call and the embedding + vector search run concurrently and are
+        joined for scoring. Per-stage durations are reported in
+        query_analysis['timings'] and the spans of the query in
+        query_analysis['trace']. Comparison and multi-topic questions are
+        searched together with their sub-queries, listed in
+        query_analysis['sub_queries']. Candidates already retrieved, e.g. by
+        retrieve_candidates_many, skip retrieval.
         """
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+        n_results = max_results * 2
+        where = build_where_filter(channels, date_range)
+        trace = self.tracer.start(
+            'process_query', max_results=max_results, filtered=where is not None
+        )
         try:
-            query_analysis = self.detect_query_type(query)
-            results = self.get_initial_results(query, max_results, query_analysis)
+            sub_queries = self.plan_queries(query) if candidates is None else []
+            if candidates is not None:
+                query_analysis = self._timed(
+                    trace, timings, 'analysis', self.detect_query_type, query
+                )
+            elif parallel:
+                executor = self._get_executor()
+                analysis_future = executor.submit(
+                    self._timed, trace, timings, 'analysis', self.detect_query_type, query
+                )
+                retrieval_future = executor.submit(
+                    self._timed, trace, timings, 'retrieval',
+                    self.retrieve_candidates, query, n_results, timings, where, sub_queries
+                )
+                query_analysis = analysis_future.result()
+                candidates = retrieval_future.result()
+            else:
+                query_analysis = self._timed(
+                    trace, timings, 'analysis', self.detect_query_type, query
+                )
+                candidates = self._timed(
+                    trace, timings, 'retrieval',
+                    self.retrieve_candidates, query, n_results, timings, where, sub_queries
+                )
+            for stage in ('embedding', 'search', 'lexical'):
+                if f'{stage}_ms' in timings:
+                    trace.record(stage, timings[f'{stage}_ms'], parent='retrieval')
 
-            filtered_results = [
-                r for r in results
-                if r['relevance_score'] >= min_relevance
-                and (not channels or channels.get(r['metadata'].get('channel', ''), True))
-            ]
+            results = self._timed(
+                trace, timings, 'scoring', self.score_candidates, candidates, query_analysis
+            )
+
+            filtered_results = [r for r in results if r['relevance_score'] >= min_relevance]
 
             filtered_results.sort(key=lambda x: x['relevance_score'], reverse=True)
             final_results = filtered_results[:max_results]
+            timings['total_ms'] = (time.perf_counter() - start) * 1000
+            trace.set(
+                query_type=query_analysis.get('query_type'),
+                classifier=query_analysis.get('classifier', 'llm'),
+                candidates=len(results),
+                results_found=len(final_results),
+                sub_queries=len(sub_queries)
+            )
 
             query_analysis.update({
                 'results_found': len(final_results),
-                'avg_relevance': sum(r['relevance_score'] for r in final_results) / len(final_results) if final_results else 0,
-                'response_style': response_style
+                'avg_relevance': (
+                    sum(r['relevance_score'] for r in final_results) / len(final_results)
+                    if final_results else 0
+                ),
+                'response_style': response_style,
+                'sub_queries': sub_queries,
+                'timings': timings,
+                'trace': self.tracer.finish(trace)
             })
 
             return final_results, query_analysis
 
         except Exception as e:
             logger.error(f"Error processing query: {e}")
-            raise
\ No newline at end of file
+            self.tracer.finish(trace, e)
+            raise
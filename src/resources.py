@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceRegistry:
+    """
+    Process-wide registry of long-lived resources (clients, collections, processors).
+
+    Streamlit re-executes the app script on every interaction, but imported
+    modules stay loaded, so resources held here survive reruns. Each resource
+    is built at most once per process by its factory, optionally re-validated
+    by a health check, and can be invalidated together with its dependents.
+    """
+
+    def __init__(self):
+        self._resources: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+
+    def _lock_for(self, name: str) -> threading.Lock:
+        with self._registry_lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def get(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        health_check: Optional[Callable[[Any], Any]] = None,
+        health_interval: float = 60.0,
+        depends_on: Iterable[str] = ()
+    ) -> Any:
+        """
+        Return a resource, building it on first use.
+
+        Args:
+            name: Resource name
+            factory: Zero-argument callable building the resource
+            health_check: Callable raising or returning False when the
+                resource is no longer usable, which triggers a rebuild
+            health_interval: Minimum seconds between two health checks
+            depends_on: Names of resources this one is built from; invalidating
+                any of them also invalidates this resource
+
+        Returns:
+            The cached resource
+        """
+        entry = self._resources.get(name)
+        if entry and not self._needs_check(entry):
+            return entry['value']
+
+        with self._lock_for(name):
+            entry = self._resources.get(name)
+            if entry and self._needs_check(entry):
+                if self._is_healthy(name, entry):
+                    entry['checked'] = time.monotonic()
+                else:
+                    self.invalidate(name)
+                    entry = None
+            if entry:
+                return entry['value']
+
+            start = time.perf_counter()
+            value = factory()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            logger.info(f"Created resource '{name}' in {elapsed_ms:.0f} ms")
+            self._resources[name] = {
+                'value': value,
+                'health_check': health_check,
+                'health_interval': health_interval,
+                'depends_on': tuple(depends_on),
+                'created': time.time(),
+                'checked': time.monotonic()
+            }
+            return value
+
+    @staticmethod
+    def _needs_check(entry: Dict[str, Any]) -> bool:
+        return (
+            entry['health_check'] is not None
+            and time.monotonic() - entry['checked'] >= entry['health_interval']
+        )
+
+    @staticmethod
+    def _is_healthy(name: str, entry: Dict[str, Any]) -> bool:
+        try:
+            return entry['health_check'](entry['value']) is not False
+        except Exception as e:
+            logger.warning(f"Health check of resource '{name}' failed: {e}")
+            return False
+
+    def invalidate(self, name: str):
+        """Drop a resource and every resource depending on it."""
+        entry = self._resources.pop(name, None)
+        if entry is None:
+            return
+        logger.info(f"Invalidated resource '{name}'")
+        for other, other_entry in list(self._resources.items()):
+            if name in other_entry['depends_on']:
+                self.invalidate(other)
+
+    def clear(self):
+        """Drop every resource."""
+        self._resources.clear()
+
+    def health(self) -> Dict[str, bool]:
+        """Run every health check now and report the result per resource."""
+        report = {}
+        for name, entry in list(self._resources.items()):
+            healthy = entry['health_check'] is None or self._is_healthy(name, entry)
+            if healthy:
+                entry['checked'] = time.monotonic()
+            report[name] = healthy
+        return report
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._resources
+
+
+# Shared by every session and rerun of the process
+registry = ResourceRegistry()
+
+
+def create_chroma_client(path: str):
+    """Open the ChromaDB store; chromadb is imported on first use only."""
+    from chromadb import PersistentClient
+    return PersistentClient(path=path)
+
+
+def create_openai_client(max_connections: Optional[int] = None, timeout: Optional[float] = None):
+    """
+    Create the OpenAI client; openai is imported on first use only.
+
+    Args:
+        max_connections: Size of the keep-alive HTTP connection pool shared by
+            every request; the openai default is used when omitted
+        timeout: Request timeout in seconds
+    """
+    from openai import OpenAI
+    kwargs: Dict[str, Any] = {}
+    if max_connections:
+        import httpx
+        kwargs['http_client'] = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            ),
+            timeout=timeout or 60.0
+        )
+    elif timeout:
+        kwargs['timeout'] = timeout
+    return OpenAI(api_key=os.getenv('OPENAI_API_KEY'), **kwargs)
@@ -0,0 +1,116 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+# Characters of a document kept on a result; the UI shows at most this much
+EXCERPT_CHARS = 500
+
+DocumentLoader = Callable[[Sequence[str]], List[str]]
+
+
+class SearchResult:
+    """
+    Scored search hit carrying a short excerpt instead of the whole document.
+
+    It keeps the dictionary access of the result dicts it replaces
+    (result['metadata'], result.get('relevance_score', 0.0)). Documents
+    longer than the excerpt are not held: reading 'content' fetches the full
+    text through the loader on every access, so results can be cached and
+    passed around without their documents. Prefer fetching the documents of
+    many results in one loader call, as QueryProcessor.with_full_text does.
+    """
+
+    __slots__ = ('id', 'relevance_score', 'distance', 'metadata', 'excerpt', '_content', '_loader')
+    KEYS = ('id', 'content', 'metadata', 'distance', 'relevance_score', 'excerpt')
+
+    def __init__(
+        self,
+        id: Optional[str],
+        relevance_score: float,
+        distance: Optional[float],
+        metadata: Dict[str, Any],
+        excerpt: str,
+        content: Optional[str] = None,
+        loader: Optional[DocumentLoader] = None
+    ):
+        self.id = id
+        self.relevance_score = relevance_score
+        self.distance = distance
+        self.metadata = metadata
+        self.excerpt = excerpt
+        self._content = content
+        self._loader = loader
+
+    @classmethod
+    def from_document(
+        cls,
+        id: Optional[str],
+        document: str,
+        metadata: Dict[str, Any],
+        distance: Optional[float],
+        relevance_score: float,
+        loader: Optional[DocumentLoader] = None,
+        excerpt_chars: int = EXCERPT_CHARS
+    ) -> "SearchResult":
+        """
+        Build a result from a retrieved document, keeping the document itself
+        only when it fits in the excerpt or cannot be fetched again.
+        """
+        document = document or ''
+        if id is None or loader is None or len(document) <= excerpt_chars:
+            return cls(id, relevance_score, distance, metadata, document[:excerpt_chars], document)
+        return cls(id, relevance_score, distance, metadata, document[:excerpt_chars], None, loader)
+
+    @property
+    def has_content(self) -> bool:
+        """Whether the full text is held without a fetch."""
+        return self._content is not None
+
+    @property
+    def content(self) -> str:
+        if self._content is not None:
+            return self._content
+        if self._loader is None:
+            return self.excerpt
+        return self._loader([self.id])[0]
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.KEYS else default
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.KEYS
+
+    def keys(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def to_dict(self, content: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Plain dictionary form; 'content' is included when given or already held.
+        """
+        result = {
+            'id': self.id,
+            'metadata': self.metadata,
+            'distance': self.distance,
+            'relevance_score': self.relevance_score,
+            'excerpt': self.excerpt
+        }
+        if content is not None or self._content is not None:
+            result['content'] = content if content is not None else self._content
+        return result
+
+    def __getstate__(self):
+        # The loader is bound to a live collection and is not kept across pickling
+        return {slot: getattr(self, slot) for slot in self.__slots__ if slot != '_loader'}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        for slot in self.__slots__:
+            setattr(self, slot, state.get(slot))
+
+    def __repr__(self) -> str:
+        return (
+            f"SearchResult(id={self.id!r}, relevance_score={self.relevance_score:.3f}, "
+            f"title={self.metadata.get('title')!r})"
+        )
@@ -0,0 +1,210 @@
+import logging
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Weights of (semantic, title, key terms, source, temporal) per query type
+QUERY_TYPE_WEIGHTS = {
+    'factual': (0.3, 0.2, 0.3, 0.1, 0.1),
+    'opinion': (0.2, 0.2, 0.2, 0.3, 0.1),
+    'comparison': (0.3, 0.2, 0.2, 0.2, 0.1),
+    'procedural': (0.2, 0.3, 0.3, 0.1, 0.1),
+    'conceptual': (0.3, 0.2, 0.2, 0.2, 0.1)
+}
+
+DEFAULT_SEMANTIC_SCORE = 0.5
+# Rank offset of reciprocal rank fusion; 60 is the value from the original paper
+RRF_K = 60
+
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+
+def semantic_from_distance(distances: Sequence[float], metric: str = 'l2') -> np.ndarray:
+    """
+    Convert Chroma distances into similarities in [0, 1].
+
+    Args:
+        distances: Distances returned by the collection
+        metric: Collection distance function ('l2', 'cosine' or 'ip'); l2 assumes
+            unit-normalized embeddings, for which squared L2 equals 2 - 2 * cosine
+
+    Returns:
+        Array of similarity scores
+    """
+    values = np.asarray(distances, dtype=np.float64)
+    similarity = 1.0 - values / 2.0 if metric == 'l2' else 1.0 - values
+    # Candidates without a distance (e.g. lexical-only hits) get the neutral score
+    return np.where(np.isnan(similarity), DEFAULT_SEMANTIC_SCORE, np.clip(similarity, 0.0, 1.0))
+
+
+def embedding_distances(
+    query_embedding: Sequence[float],
+    embeddings: Sequence[Sequence[float]],
+    metric: str = 'l2'
+) -> np.ndarray:
+    """Compute Chroma-compatible distances between a query and stored embeddings."""
+    query = np.asarray(query_embedding, dtype=np.float64)
+    matrix = np.asarray(embeddings, dtype=np.float64).reshape(-1, len(query))
+    if metric == 'cosine':
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        return 1.0 - (matrix @ query) / np.where(norms == 0, 1.0, norms)
+    if metric == 'ip':
+        return 1.0 - matrix @ query
+    # Chroma's l2 space reports the squared euclidean distance
+    return ((matrix - query) ** 2).sum(axis=1)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> Dict[str, float]:
+    """
+    Fuse several rankings of IDs with reciprocal rank fusion.
+
+    Args:
+        rankings: ID lists, each ordered best first
+        k: Rank offset damping the weight of the top ranks
+
+    Returns:
+        Fused score per ID, in order of decreasing score
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return dict(sorted(scores.items(), key=lambda kv: kv[1], reverse=True))
+
+
+def parse_dates(values: Sequence[Any]) -> np.ndarray:
+    """Parse YYYY-MM-DD prefixed values into datetime64[D], using NaT for anything else."""
+    days = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[D]')
+    valid = [
+        i for i, value in enumerate(values) if isinstance(value, str) and _ISO_DATE.match(value)
+    ]
+    if valid:
+        prefixes = [values[i][:10] for i in valid]
+        try:
+            days[valid] = np.array(prefixes, dtype='datetime64[D]')
+        except ValueError:
+            # Out-of-range values such as 2024-13-45: parse one by one
+            for i, prefix in zip(valid, prefixes):
+                try:
+                    days[i] = np.datetime64(prefix, 'D')
+                except ValueError:
+                    pass
+    return days
+
+
+class BatchRelevanceScorer:
+    """
+    Scores a whole candidate set against one query analysis at once.
+
+    Terms are lowercased and compiled into a single regex once per query, and
+    temporal relevance uses vectorised datetime64 arithmetic. With
+    use_distance disabled the scores equal QueryProcessor.calculate_content_relevance.
+    """
+
+    def __init__(
+        self,
+        query_analysis: Dict[str, Any],
+        distance_metric: str = 'l2',
+        use_distance: bool = True,
+        max_age_days: int = 365,
+        now: Optional[datetime] = None
+    ):
+        """
+        Initialize BatchRelevanceScorer.
+
+        Args:
+            query_analysis: Output of QueryProcessor.detect_query_type
+            distance_metric: Distance function of the collection
+            use_distance: Derive the semantic component from the candidate
+                distance instead of the constant DEFAULT_SEMANTIC_SCORE
+            max_age_days: Maximum age considered by temporal relevance
+            now: Reference time for temporal relevance, defaults to now
+        """
+        self.distance_metric = distance_metric
+        self.use_distance = use_distance
+        self.max_age_days = max_age_days
+        self.today = np.datetime64(now or datetime.now(), 'D')
+
+        self.topics = [str(t).lower() for t in query_analysis.get('topics', [])]
+        self.key_terms = [str(t).lower() for t in query_analysis.get('key_terms', [])]
+        self.sources = [str(s).lower() for s in query_analysis.get('expected_sources', ['any'])]
+        query_type = query_analysis.get('query_type', 'factual')
+        self.weights = np.array(QUERY_TYPE_WEIGHTS.get(query_type, QUERY_TYPE_WEIGHTS['factual']))
+
+        # One lookahead alternation finds every position where a term starts;
+        # longest-first ordering reports the longest term at each position,
+        # and terms that are prefixes of a reported term are implied by it
+        unique_terms = sorted({t for t in self.key_terms if t}, key=len, reverse=True)
+        self._term_pattern = re.compile(
+            '(?=(' + '|'.join(re.escape(t) for t in unique_terms) + '))'
+        ) if unique_terms else None
+        self._implied_by = {
+            term: [other for other in unique_terms if other != term and other.startswith(term)]
+            for term in unique_terms
+        }
+
+    def _term_matches(self, text_lower: str) -> int:
+        if self._term_pattern is None:
+            return sum(1 for t in self.key_terms if not t)
+        found = set(self._term_pattern.findall(text_lower))
+        return sum(
+            1 for term in self.key_terms
+            if not term or term in found or any(o in found for o in self._implied_by[term])
+        )
+
+    def temporal_scores(self, metadatas: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Vectorised equivalent of QueryProcessor.calculate_temporal_relevance."""
+        dates = parse_dates([m.get('published_at') for m in metadatas])
+        age_days = (self.today - dates).astype(np.float64)
+        scores = 1 - np.minimum(age_days, self.max_age_days) / (self.max_age_days * 2)
+        scores = np.maximum(0.5, scores)
+        return np.where(np.isnat(dates), 0.5, scores)
+
+    def score(
+        self,
+        documents: Sequence[Any],
+        metadatas: Sequence[Dict[str, Any]],
+        distances: Optional[Sequence[float]] = None
+    ) -> List[float]:
+        """
+        Score candidates.
+
+        Args:
+            documents: Candidate texts
+            metadatas: Candidate metadata dictionaries
+            distances: Candidate distances from the vector search
+
+        Returns:
+            One relevance score in [0, 1] per candidate
+        """
+        count = len(documents)
+        if count == 0:
+            return []
+
+        if self.use_distance and distances is not None:
+            semantic = semantic_from_distance(distances, self.distance_metric)
+        else:
+            semantic = np.full(count, DEFAULT_SEMANTIC_SCORE)
+
+        title_match = np.empty(count)
+        term_score = np.empty(count)
+        source_score = np.empty(count)
+        for i, (text, metadata) in enumerate(zip(documents, metadatas)):
+            if isinstance(text, dict):
+                text = str(text.get('text', ''))
+            elif not isinstance(text, str):
+                text = str(text)
+            title = metadata.get('title', '').lower()
+            title_match[i] = sum(t in title for t in self.topics) / max(len(self.topics), 1)
+            term_score[i] = min(self._term_matches(text.lower()) * 0.1, 0.8)
+            channel = metadata.get('channel', '').lower()
+            source_score[i] = 0.2 if any(s in channel for s in self.sources) else 0
+
+        components = np.stack([
+            semantic, title_match, term_score, source_score, self.temporal_scores(metadatas)
+        ])
+        return np.clip(self.weights @ components, 0, 1).tolist()
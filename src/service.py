@@ -0,0 +1,391 @@
+"""
+Headless HTTP query service exposing the QueryProcessor as an ASGI application.
+
+Run it with:
+
+    uvicorn --factory src.service:create_app --port 8000
+
+One warm process holds the ChromaDB handle, the pooled OpenAI client and the
+lexical index, so Streamlit and other tools can query it instead of each
+opening their own. The service only reads the collection; ingestion stays
+with the Streamlit app or the ingestion tools.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from starlette.applications import Starlette
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+try:
+    from .factory import get_openai_client, get_query_processor
+    from .query_processor import QueryProcessor
+    from .resources import registry
+    from .tracing import metrics
+except ImportError:  # imported from src/ by `python src/service.py`
+    from factory import get_openai_client, get_query_processor
+    from query_processor import QueryProcessor
+    from resources import registry
+    from tracing import metrics
+
+logger = logging.getLogger(__name__)
+
+# Requests processed at once; further requests wait up to SERVICE_QUEUE_TIMEOUT
+# seconds for a slot before being rejected with 503
+SERVICE_MAX_CONCURRENCY = int(os.getenv('SERVICE_MAX_CONCURRENCY', 8))
+SERVICE_QUEUE_TIMEOUT = float(os.getenv('SERVICE_QUEUE_TIMEOUT', 5))
+# Seconds a request may run before being answered with 504
+SERVICE_REQUEST_TIMEOUT = float(os.getenv('SERVICE_REQUEST_TIMEOUT', 60))
+# Keep-alive connections to the OpenAI API, shared by every request
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', 20))
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 30))
+MAX_RESULTS_LIMIT = 50
+
+
+class ServiceError(Exception):
+    """
+    Request error answered with the given HTTP status code.
+    """
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def build_query_processor() -> QueryProcessor:
+    """Build the query processor from process-wide resources."""
+    # The first call creates the shared OpenAI client with the service's pool settings
+    get_openai_client(OPENAI_MAX_CONNECTIONS, OPENAI_TIMEOUT)
+    return get_query_processor()
+
+
+def _dumps(value: Any) -> str:
+    # Results are SearchResult objects carrying numpy floats and dates in their metadata
+    return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+class ServiceJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return _dumps(content).encode('utf-8')
+
+
+def parse_query_request(payload: Any) -> Dict[str, Any]:
+    """
+    Validate a search or answer request body into process_query arguments.
+
+    Raises:
+        ServiceError: With status 400 when the body is invalid
+    """
+    if not isinstance(payload, dict):
+        raise ServiceError(400, "Request body must be a JSON object")
+    query = payload.get('query')
+    if not isinstance(query, str) or not query.strip():
+        raise ServiceError(400, "'query' must be a non-empty string")
+
+    try:
+        max_results = int(payload.get('max_results', 5))
+        min_relevance = float(payload.get('min_relevance', 0.0))
+    except (TypeError, ValueError):
+        raise ServiceError(400, "'max_results' and 'min_relevance' must be numbers")
+    if not 1 <= max_results <= MAX_RESULTS_LIMIT:
+        raise ServiceError(400, f"'max_results' must be between 1 and {MAX_RESULTS_LIMIT}")
+
+    channels = payload.get('channels')
+    if channels is not None and not isinstance(channels, dict):
+        raise ServiceError(400, "'channels' must map channel names to booleans")
+    date_range = payload.get('date_range')
+    if date_range is not None and not isinstance(date_range, (list, str)):
+        raise ServiceError(400, "'date_range' must be a date or a [start, end] pair")
+
+    return {
+        'query': query.strip(),
+        'max_results': max_results,
+        'min_relevance': min_relevance,
+        'channels': channels,
+        'response_style': payload.get('response_style'),
+        'date_range': date_range
+    }
+
+
+class _Slot:
+    """
+    Concurrency slot held by one request.
+
+    A call cut off by the request deadline keeps running in its thread, so
+    the slot is only returned to the semaphore once the request has ended
+    and every call it started has finished. Callbacks run on the event loop,
+    so no lock is needed.
+    """
+
+    def __init__(self, semaphore: asyncio.Semaphore):
+        self._semaphore = semaphore
+        self._running = 0
+        self._closed = False
+        self._released = False
+
+    def track(self, task: asyncio.Future):
+        self._running += 1
+        task.add_done_callback(self._call_done)
+
+    def _call_done(self, task: asyncio.Future):
+        self._running -= 1
+        if not task.cancelled():
+            # Retrieved so an abandoned call's error is not reported as never retrieved
+            task.exception()
+        self._release_if_idle()
+
+    def close(self):
+        """End the request; the slot is freed now or when its last call finishes."""
+        self._closed = True
+        self._release_if_idle()
+
+    def _release_if_idle(self):
+        if self._closed and not self._running and not self._released:
+            self._released = True
+            self._semaphore.release()
+
+
+class QueryService:
+    """
+    Async endpoints running the blocking query processor in the thread pool.
+
+    A semaphore bounds the work in flight so a burst queues briefly and is
+    then shed with 503 instead of piling threads onto the OpenAI connection
+    pool. Each request is answered with 504 after its deadline, but keeps its
+    slot until the call it was waiting for has actually finished.
+    """
+
+    def __init__(
+        self,
+        processor_factory: Callable[[], QueryProcessor] = build_query_processor,
+        max_concurrency: int = SERVICE_MAX_CONCURRENCY,
+        request_timeout: float = SERVICE_REQUEST_TIMEOUT,
+        queue_timeout: float = SERVICE_QUEUE_TIMEOUT
+    ):
+        """
+        Initialize QueryService.
+
+        Args:
+            processor_factory: Callable returning the (cached) query processor
+            max_concurrency: Maximum number of requests processed at once
+            request_timeout: Seconds a request may run before failing with 504
+            queue_timeout: Seconds a request may wait for a slot before failing with 503
+        """
+        self.processor_factory = processor_factory
+        self.max_concurrency = max_concurrency
+        self.request_timeout = request_timeout
+        self.queue_timeout = queue_timeout
+        # Created on first use so it binds to the server's event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _acquire(self) -> _Slot:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            metrics.increment('service_rejected_total', reason='busy')
+            raise ServiceError(503, "Service is busy, retry later")
+        return _Slot(self._semaphore)
+
+    async def _run(self, slot: _Slot, deadline: float, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call in the thread pool, failing with 504 past the deadline."""
+        remaining = deadline - time.monotonic()
+        try:
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            task = asyncio.ensure_future(run_in_threadpool(func, *args, **kwargs))
+            slot.track(task)
+            # Shielded: the thread cannot be stopped, so the task is left to finish
+            return await asyncio.wait_for(asyncio.shield(task), remaining)
+        except asyncio.TimeoutError:
+            metrics.increment('service_rejected_total', reason='timeout')
+            raise ServiceError(504, "Request timed out")
+
+    async def _search(self, slot: _Slot, arguments: Dict[str, Any], deadline: float):
+        processor = await self._run(slot, deadline, self.processor_factory)
+        results, analysis = await self._run(
+            slot, deadline, processor.process_query, **arguments
+        )
+        return processor, results, analysis
+
+    @staticmethod
+    async def _payload(request: Request) -> Dict[str, Any]:
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise ServiceError(400, "Request body must be valid JSON")
+        return payload
+
+    async def search(self, request: Request) -> Response:
+        """POST /search: retrieve and score results without generating an answer."""
+        arguments = parse_query_request(await self._payload(request))
+        slot = await self._acquire()
+        try:
+            deadline = time.monotonic() + self.request_timeout
+            _, results, analysis = await self._search(slot, arguments, deadline)
+        finally:
+            slot.close()
+        return ServiceJSONResponse({'results': results, 'analysis': analysis})
+
+    async def answer(self, request: Request) -> Response:
+        """
+        POST /answer: retrieve results and generate an answer.
+
+        With "stream": true the response is newline-delimited JSON: a
+        "sources" event, one "token" event per fragment and a final "done"
+        event carrying the query analysis.
+        """
+        payload = await self._payload(request)
+        arguments = parse_query_request(payload)
+        stream = bool(payload.get('stream', False))
+        slot = await self._acquire()
+        try:
+            deadline = time.monotonic() + self.request_timeout
+            processor, results, analysis = await self._search(slot, arguments, deadline)
+            if stream:
+                # The slot is released by the stream once it ends
+                return StreamingResponse(
+                    self._stream_answer(
+                        slot, processor, arguments['query'], results, analysis, deadline
+                    ),
+                    media_type='application/x-ndjson'
+                )
+            answer = ''
+            if results:
+                answer = await self._run(
+                    slot, deadline, processor.generate_response,
+                    arguments['query'], results, analysis
+                )
+        except BaseException:
+            slot.close()
+            raise
+        slot.close()
+        return ServiceJSONResponse({'answer': answer, 'results': results, 'analysis': analysis})
+
+    async def _stream_answer(
+        self,
+        slot: _Slot,
+        processor: QueryProcessor,
+        query: str,
+        results: list,
+        analysis: Dict[str, Any],
+        deadline: float
+    ) -> AsyncIterator[str]:
+        try:
+            yield _dumps({'type': 'sources', 'results': results}) + '\n'
+            if results:
+                fragments = processor.generate_response_stream(query, results, analysis)
+                async for fragment in iterate_in_threadpool(fragments):
+                    if time.monotonic() > deadline:
+                        metrics.increment('service_rejected_total', reason='timeout')
+                        yield _dumps({'type': 'error', 'error': "Request timed out"}) + '\n'
+                        return
+                    yield _dumps({'type': 'token', 'text': fragment}) + '\n'
+            yield _dumps({'type': 'done', 'analysis': analysis}) + '\n'
+        except Exception as e:
+            logger.error(f"Answer stream error: {e}")
+            yield _dumps({'type': 'error', 'error': str(e)}) + '\n'
+        finally:
+            slot.close()
+
+    async def health(self, request: Request) -> Response:
+        """GET /health: resource health checks and the number of indexed chunks."""
+        try:
+            processor = await run_in_threadpool(self.processor_factory)
+            documents = await run_in_threadpool(processor.collection.count)
+        except Exception as e:
+            logger.error(f"Health check failed: {e}")
+            return ServiceJSONResponse({'status': 'unavailable', 'error': str(e)}, status_code=503)
+        resources = await run_in_threadpool(registry.health)
+        status = 'ok' if all(resources.values()) else 'degraded'
+        return ServiceJSONResponse(
+            {'status': status, 'documents': documents, 'resources': resources}
+        )
+
+    async def metrics(self, request: Request) -> Response:
+        """GET /metrics: Prometheus text exposition of the process metrics."""
+        return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
+
+async def _service_error(request: Request, exc: ServiceError) -> Response:
+    return ServiceJSONResponse({'error': str(exc)}, status_code=exc.status_code)
+
+
+async def _unexpected_error(request: Request, exc: Exception) -> Response:
+    logger.error(f"Request error on {request.url.path}: {exc}", exc_info=True)
+    return ServiceJSONResponse({'error': str(exc)}, status_code=500)
+
+
+def create_app(
+    processor_factory: Optional[Callable[[], QueryProcessor]] = None,
+    max_concurrency: int = SERVICE_MAX_CONCURRENCY,
+    request_timeout: float = SERVICE_REQUEST_TIMEOUT,
+    queue_timeout: float = SERVICE_QUEUE_TIMEOUT
+) -> Starlette:
+    """
+    Create the ASGI application.
+
+    Args:
+        processor_factory: Callable returning the query processor; defaults to
+            one built from process-wide resources
+        max_concurrency: Maximum number of requests processed at once
+        request_timeout: Seconds a request may run before failing with 504
+        queue_timeout: Seconds a request may wait for a slot before failing with 503
+
+    Returns:
+        Starlette application
+    """
+    service = QueryService(
+        processor_factory or build_query_processor, max_concurrency, request_timeout, queue_timeout
+    )
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        # Warm up clients, collection and index before accepting traffic
+        try:
+            await run_in_threadpool(service.processor_factory)
+        except Exception as e:
+            logger.error(f"Could not initialize the query processor: {e}")
+        yield
+
+    app = Starlette(
+        routes=[
+            Route('/search', service.search, methods=['POST']),
+            Route('/answer', service.answer, methods=['POST']),
+            Route('/health', service.health, methods=['GET']),
+            Route('/metrics', service.metrics, methods=['GET'])
+        ],
+        exception_handlers={ServiceError: _service_error, Exception: _unexpected_error},
+        lifespan=lifespan
+    )
+    app.state.service = service
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(
+        create_app(),
+        host=os.getenv('SERVICE_HOST', '0.0.0.0'),
+        port=int(os.getenv('SERVICE_PORT', 8000))
+    )
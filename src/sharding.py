@@ -0,0 +1,340 @@
+import concurrent.futures
+import logging
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+try:
+    from .vector_store import (
+        DEFAULT_INCLUDE_GET, DEFAULT_INCLUDE_QUERY, NumpyVectorStore, VectorStore
+    )
+except ImportError:  # imported from src/ by `streamlit run src/app.py`
+    from vector_store import (
+        DEFAULT_INCLUDE_GET, DEFAULT_INCLUDE_QUERY, NumpyVectorStore, VectorStore
+    )
+
+logger = logging.getLogger(__name__)
+
+SHARD_KEYS = ('channel', 'year')
+# Shard of chunks without a channel or publication date
+UNKEYED_SHARD = 'unknown'
+# Separates the collection name from the shard name in Chroma collection names
+SHARD_SEPARATOR = '__'
+MAX_SHARD_WORKERS = 8
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def shard_slug(value: Any) -> str:
+    """Shard name of a channel: lowercase ASCII letters and digits joined by '_'."""
+    return _NON_ALNUM.sub('_', str(value).lower()).strip('_') or UNKEYED_SHARD
+
+
+def shard_name(metadata: Dict[str, Any], shard_by: str) -> str:
+    """Name of the shard holding a chunk, from its metadata."""
+    if shard_by == 'channel':
+        return shard_slug(metadata['channel']) if metadata.get('channel') else UNKEYED_SHARD
+    published = metadata.get('published_at_int') or 0
+    return str(published // 10000) if published > 0 else UNKEYED_SHARD
+
+
+def _may_match(where: Optional[Dict[str, Any]], name: str, shard_by: str) -> bool:
+    """
+    Whether chunks of a shard can satisfy a where clause, judging only the
+    clauses on the shard key; anything else is left to the shard.
+    """
+    if not where or name == UNKEYED_SHARD:
+        return True
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(_may_match(c, name, shard_by) for c in condition):
+                return False
+        elif key == '$or':
+            if not any(_may_match(c, name, shard_by) for c in condition):
+                return False
+        else:
+            conditions = condition if isinstance(condition, dict) else {'$eq': condition}
+            if shard_by == 'channel' and key == 'channel':
+                matches = _channel_may_match(conditions, name)
+            elif shard_by == 'year' and key == 'published_at_int':
+                matches = _year_may_match(conditions, int(name))
+            else:
+                matches = True
+            if not matches:
+                return False
+    return True
+
+
+def _channel_may_match(conditions: Dict[str, Any], name: str) -> bool:
+    for op, operand in conditions.items():
+        if op == '$eq' and shard_slug(operand) != name:
+            return False
+        if op == '$in' and name not in {shard_slug(v) for v in operand}:
+            return False
+        if op == '$ne' and shard_slug(operand) == name:
+            return False
+        if op == '$nin' and name in {shard_slug(v) for v in operand}:
+            return False
+    return True
+
+
+def _year_may_match(conditions: Dict[str, Any], year: int) -> bool:
+    low, high = year * 10000 + 101, year * 10000 + 1231
+    for op, operand in conditions.items():
+        if op in ('$gte', '$gt') and high < operand + (op == '$gt'):
+            return False
+        if op in ('$lte', '$lt') and low > operand - (op == '$lt'):
+            return False
+        if op == '$eq' and not low <= operand <= high:
+            return False
+        if op == '$in' and not any(low <= v <= high for v in operand):
+            return False
+    return True
+
+
+class ShardedCollection(VectorStore):
+    """
+    Corpus split into one collection per channel or per publication year.
+
+    Writes go to the shard of each chunk and remove it from the others, so
+    a chunk whose channel or year changed does not linger. Queries are sent
+    in parallel to the shards a `where` filter can match and their nearest
+    neighbours are merged into one top-k list.
+    Lookups by ID are broadcast, since chunk IDs do not name their shard.
+    Shards are opened through a factory, so they can be Chroma collections,
+    NumPy stores or collections of a remote Chroma server.
+    """
+
+    def __init__(
+        self,
+        open_shard: Callable[[str], Any],
+        shard_by: str = 'channel',
+        discover: Optional[Callable[[], Iterable[str]]] = None,
+        max_workers: int = MAX_SHARD_WORKERS
+    ):
+        """
+        Initialize ShardedCollection.
+
+        Args:
+            open_shard: Returns the collection of a shard name, creating it if needed
+            shard_by: 'channel' or 'year'
+            discover: Returns the names of existing shards; checked again by
+                is_current so shards created by another process are noticed
+            max_workers: Number of shards queried at once
+        """
+        if shard_by not in SHARD_KEYS:
+            raise ValueError(f"shard_by must be one of {SHARD_KEYS}")
+        self.open_shard = open_shard
+        self.shard_by = shard_by
+        self.discover = discover
+        self.max_workers = max_workers
+        self._shards: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        for name in sorted(discover()) if discover else []:
+            self._shards[name] = open_shard(name)
+
+    @property
+    def shards(self) -> Dict[str, Any]:
+        """Opened shards by name."""
+        with self._lock:
+            return dict(sorted(self._shards.items()))
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        # Every shard is created with the same distance function
+        for shard in self.shards.values():
+            metadata = getattr(shard, 'metadata', None)
+            if isinstance(metadata, dict):
+                return metadata
+        return {}
+
+    def _shard(self, name: str):
+        with self._lock:
+            shard = self._shards.get(name)
+            if shard is None:
+                shard = self._shards[name] = self.open_shard(name)
+                logger.info(f"Opened shard {name}")
+            return shard
+
+    def _map(self, func: Callable, items: Sequence[Any]) -> List[Any]:
+        """Apply func to every item, in parallel when there is more than one."""
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='shard'
+                )
+        return list(self._executor.map(func, items))
+
+    def select(self, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Shards whose chunks can match a where filter."""
+        return {
+            name: shard for name, shard in self.shards.items()
+            if _may_match(where, name, self.shard_by)
+        }
+
+    def is_current(self) -> bool:
+        """False once another process created a shard or flushed a NumPy shard."""
+        shards = self.shards
+        if self.discover is not None and not set(self.discover()) <= set(shards):
+            return False
+        return all(
+            getattr(shard, 'is_current', lambda: True)() for shard in shards.values()
+        )
+
+    def count(self) -> int:
+        return sum(self._map(lambda shard: shard.count(), list(self.shards.values())))
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+        embeddings: Optional[Sequence[Sequence[float]]] = None
+    ):
+        groups: Dict[str, List[int]] = {}
+        for position, metadata in enumerate(metadatas):
+            groups.setdefault(shard_name(metadata or {}, self.shard_by), []).append(position)
+        for name, positions in groups.items():
+            kwargs = {}
+            if embeddings is not None:
+                kwargs['embeddings'] = [embeddings[i] for i in positions]
+            group_ids = [ids[i] for i in positions]
+            self._shard(name).upsert(
+                ids=group_ids,
+                documents=[documents[i] for i in positions],
+                metadatas=[metadatas[i] for i in positions],
+                **kwargs
+            )
+            # A chunk whose channel or publication year changed moves shard;
+            # drop the copy left in the shard it was in
+            others = [shard for other, shard in self.shards.items() if other != name]
+            self._map(lambda shard: shard.delete(ids=group_ids), others)
+
+    def delete(self, ids: Sequence[str]):
+        ids = list(ids)
+        self._map(lambda shard: shard.delete(ids=ids), list(self.shards.values()))
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = DEFAULT_INCLUDE_GET,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        include = list(include)
+        merged: Dict[str, Any] = {'ids': []}
+        merged.update({key: [] for key in include})
+        kwargs = {'include': include}
+        if where:
+            kwargs['where'] = where
+        shards = list(self.select(where).values())
+
+        if ids is not None:
+            kwargs['ids'] = list(ids)
+            pages = self._map(lambda shard: shard.get(**kwargs), shards)
+        else:
+            # Pages run across shards in name order
+            pages = []
+            skip, remaining = offset, limit
+            for shard in shards:
+                if remaining is not None and remaining <= 0:
+                    break
+                if skip:
+                    size = shard.count() if not where else len(
+                        shard.get(where=where, include=[])['ids']
+                    )
+                    if skip >= size:
+                        skip -= size
+                        continue
+                page = shard.get(limit=remaining, offset=skip, **kwargs)
+                skip = 0
+                if remaining is not None:
+                    remaining -= len(page['ids'])
+                pages.append(page)
+
+        for page in pages:
+            merged['ids'].extend(page['ids'])
+            for key in include:
+                values = page.get(key)
+                merged[key].extend(values if values is not None else [None] * len(page['ids']))
+        if limit is not None:
+            merged = {key: values[:limit] for key, values in merged.items()}
+        return merged
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = DEFAULT_INCLUDE_QUERY
+    ) -> Dict[str, Any]:
+        include = list(include)
+        fields = [key for key in include if key != 'distances']
+        kwargs = {
+            'query_embeddings': query_embeddings,
+            'n_results': n_results,
+            'include': list(dict.fromkeys(include + ['distances']))
+        }
+        if where:
+            kwargs['where'] = where
+        shards = list(self.select(where).values())
+        answers = self._map(lambda shard: shard.query(**kwargs), shards)
+
+        merged: Dict[str, Any] = {'ids': []}
+        merged.update({key: [] for key in include})
+        for i in range(len(query_embeddings)):
+            hits = []
+            for answer in answers:
+                for rank, (item_id, distance) in enumerate(
+                    zip(answer['ids'][i], answer['distances'][i])
+                ):
+                    hits.append((distance, item_id, answer, rank))
+            hits.sort(key=lambda hit: hit[0])
+            top = hits[:n_results]
+            merged['ids'].append([item_id for _, item_id, _, _ in top])
+            if 'distances' in include:
+                merged['distances'].append([distance for distance, _, _, _ in top])
+            for key in fields:
+                merged[key].append([answer[key][i][rank] for _, _, answer, rank in top])
+        return merged
+
+    def flush(self):
+        for shard in self.shards.values():
+            flush = getattr(shard, 'flush', None)
+            if flush is not None:
+                flush()
+
+
+def open_chroma_shards(client, collection_name: str, shard_by: str) -> ShardedCollection:
+    """Sharded collection over Chroma collections named <collection_name>__<shard>."""
+    prefix = collection_name + SHARD_SEPARATOR
+
+    def discover() -> List[str]:
+        # Chroma returns collection objects (newer clients) or names (older ones)
+        names = [getattr(c, 'name', c) for c in client.list_collections()]
+        return [name[len(prefix):] for name in names if name.startswith(prefix)]
+
+    return ShardedCollection(
+        lambda name: client.get_or_create_collection(prefix + name), shard_by, discover
+    )
+
+
+def open_numpy_shards(path: str, shard_by: str, **store_kwargs) -> ShardedCollection:
+    """Sharded collection over NumPy stores kept in sub-directories of path."""
+    os.makedirs(path, exist_ok=True)
+
+    def discover() -> List[str]:
+        return [
+            name for name in os.listdir(path)
+            if not name.startswith('.') and os.path.isdir(os.path.join(path, name))
+        ]
+
+    return ShardedCollection(
+        lambda name: NumpyVectorStore(os.path.join(path, name), **store_kwargs),
+        shard_by, discover
+    )
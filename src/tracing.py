@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "podcast_insights"
+# Upper bounds in milliseconds of the stage duration histogram buckets
+DURATION_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Span:
+    """
+    One timed stage of a trace.
+    """
+
+    def __init__(self, name: str, parent: Optional[str] = None, **attributes):
+        self.name = name
+        self.parent = parent
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.start = time.time()
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        """Attach attributes such as counts to the span."""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        span = {
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': self.duration_ms,
+            'attributes': self.attributes
+        }
+        if self.parent:
+            span['parent'] = self.parent
+        if self.error:
+            span['error'] = self.error
+        return span
+
+
+class Trace:
+    """
+    Spans of one request; stages running in other threads may add spans concurrently.
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.start = time.time()
+        self._perf_start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def _add(self, span: Span) -> Span:
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[str] = None, **attributes) -> Iterator[Span]:
+        """Time a block as a span, recording the exception type and message on failure."""
+        span = Span(name, parent, **attributes)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - start) * 1000
+            self._add(span)
+
+    def record(
+        self,
+        name: str,
+        duration_ms: float,
+        parent: Optional[str] = None,
+        **attributes
+    ) -> Span:
+        """Add a span for a stage that was timed elsewhere."""
+        span = Span(name, parent, **attributes)
+        span.start -= duration_ms / 1000
+        span.duration_ms = duration_ms
+        return self._add(span)
+
+    def set(self, **attributes):
+        """Attach attributes to the trace itself."""
+        self.attributes.update(attributes)
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.duration_ms = (time.perf_counter() - self._perf_start) * 1000
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        trace = {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': self.duration_ms,
+            'attributes': self.attributes,
+            'spans': [s.to_dict() for s in spans]
+        }
+        if self.error:
+            trace['error'] = self.error
+        return trace
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + '}'
+
+
+class MetricsRegistry:
+    """
+    Counters and stage duration histograms rendered in the Prometheus text format.
+    """
+
+    def __init__(
+        self,
+        prefix: str = METRIC_PREFIX,
+        buckets: Tuple[float, ...] = DURATION_BUCKETS_MS
+    ):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Add value to a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, stage: str, duration_ms: float):
+        """Record a stage duration in the histogram."""
+        with self._lock:
+            histogram = self._histograms.setdefault(
+                stage, {'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0}
+            )
+            for i, bound in enumerate(self.buckets):
+                if duration_ms <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['count'] += 1
+            histogram['sum'] += duration_ms
+
+    def observe_trace(self, trace: Dict[str, Any]):
+        """Record the spans, errors and token counts of an exported trace."""
+        for span in trace.get('spans', []):
+            self.observe_span(span)
+        if trace.get('duration_ms') is not None:
+            self.observe(trace['name'], trace['duration_ms'])
+        status = 'error' if trace.get('error') else 'ok'
+        self.increment('requests_total', operation=trace['name'], status=status)
+
+    def observe_span(self, span: Dict[str, Any]):
+        if span.get('duration_ms') is not None:
+            self.observe(span['name'], span['duration_ms'])
+        if span.get('error'):
+            self.increment('stage_errors_total', stage=span['name'])
+        attributes = span.get('attributes', {})
+        for token_kind in ('prompt_tokens', 'completion_tokens'):
+            if isinstance(attributes.get(token_kind), (int, float)):
+                self.increment(f'{token_kind}_total', attributes[token_kind])
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = {
+                k: dict(v, buckets=list(v['buckets'])) for k, v in self._histograms.items()
+            }
+
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{self.prefix}_{name}"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{_labels(dict(labels))} {value:g}")
+
+        if histograms:
+            metric = f"{self.prefix}_stage_duration_ms"
+            lines.append(f"# TYPE {metric} histogram")
+            for stage, histogram in sorted(histograms.items()):
+                bounds = [f'{bound:g}' for bound in self.buckets] + ['+Inf']
+                counts = histogram['buckets'] + [histogram['count']]
+                for bound, count in zip(bounds, counts):
+                    lines.append(f"{metric}_bucket{_labels({'stage': stage, 'le': bound})} {count}")
+                stage_labels = _labels({'stage': stage})
+                lines.append(f"{metric}_sum{stage_labels} {histogram['sum']:.3f}")
+                lines.append(f"{metric}_count{stage_labels} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+class JsonLinesExporter:
+    """
+    Appends finished traces to a JSON lines file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, record: Dict[str, Any]):
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, default=str) + '\n')
+        except OSError as e:
+            logger.warning(f"Could not export trace: {e}")
+
+
+# Process-wide metrics, shared by every tracer unless one is given
+metrics = MetricsRegistry()
+
+
+class Tracer:
+    """
+    Creates traces and sends finished ones to the metrics and the optional exporter.
+    """
+
+    def __init__(
+        self,
+        exporter: Optional[JsonLinesExporter] = None,
+        metrics_registry: Optional[MetricsRegistry] = None
+    ):
+        """
+        Initialize Tracer.
+
+        Args:
+            exporter: Optional JSON lines exporter receiving every finished trace
+            metrics_registry: Metrics updated from finished traces; defaults to
+                the process-wide registry
+        """
+        self.exporter = exporter
+        self.metrics = metrics_registry or metrics
+
+    def start(self, name: str, **attributes) -> Trace:
+        return Trace(name, **attributes)
+
+    def finish(self, trace: Trace, error: Optional[BaseException] = None) -> Dict[str, Any]:
+        """Close a trace, export it and return its dictionary form."""
+        trace.finish(error)
+        record = trace.to_dict()
+        self.metrics.observe_trace(record)
+        if self.exporter:
+            self.exporter.export(record)
+        return record
+
+    def add_span(self, trace: Optional[Dict[str, Any]], span: Span):
+        """
+        Append a span to an already finished trace, such as the answer
+        generation that follows retrieval, and export it on its own.
+        """
+        record = span.to_dict()
+        self.metrics.observe_span(record)
+        if trace is None:
+            return
+        trace.setdefault('spans', []).append(record)
+        if self.exporter:
+            self.exporter.export({'trace_id': trace.get('trace_id'), 'span': record})
+
+
+def start_metrics_server(
+    port: int,
+    registry: Optional[MetricsRegistry] = None,
+    host: str = '0.0.0.0'
+) -> ThreadingHTTPServer:
+    """
+    Serve the metrics on http://host:port/metrics from a daemon thread.
+
+    Returns:
+        The running HTTP server
+    """
+    registry = registry or metrics
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,166 @@
+import codecs
+import hashlib
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+class TranscriptReader:
+    """
+    Single-pass streaming reader for transcript JSON files.
+
+    The file is hashed while it is parsed, segments of the `transcript` array
+    are yielded one at a time and large string values such as `full_text` are
+    skipped without being decoded into memory once segments have been seen.
+    """
+
+    def __init__(self, path: str, block_size: int = 1 << 16):
+        """
+        Initialize TranscriptReader.
+
+        Args:
+            path: Transcript JSON file
+            block_size: Number of bytes read per block
+        """
+        self.path = path
+        self.block_size = block_size
+        self.metadata: Dict[str, Any] = {}
+        self.legacy_text: Optional[str] = None
+        self.full_text: Optional[str] = None
+        self.digest: Optional[str] = None
+        self._decoder = json.JSONDecoder()
+
+    @property
+    def untimed_text(self) -> Optional[str]:
+        """Text of a transcript without segments: `full_text`, else legacy `text`."""
+        return self.full_text or self.legacy_text
+
+    def read_segments(self) -> List[Dict[str, Any]]:
+        """
+        Read every segment; a transcript without segments gives one untimed
+        segment holding its `untimed_text`, as chunking does.
+        """
+        segments = list(self.iter_segments())
+        if not segments and self.untimed_text:
+            segments = [{'text': self.untimed_text, 'start': 0.0, 'duration': 0.0}]
+        return segments
+
+    def _fill(self) -> bool:
+        """Append the next block to the buffer, returning False at end of file."""
+        if self._eof:
+            return False
+        block = self._file.read(self.block_size)
+        self._hasher.update(block)
+        if not block:
+            self._eof = True
+            self._buffer += self._text_decoder.decode(b'', final=True)
+            return False
+        # Drop the consumed prefix so memory stays bounded by the largest value
+        self._buffer = self._buffer[self._pos:] + self._text_decoder.decode(block)
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of file)."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"Malformed transcript {self.path}: expected {char!r}")
+        self._pos += 1
+
+    def _decode_value(self) -> Any:
+        """Decode the next JSON value, reading more blocks while it is incomplete."""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # A number ending exactly at the buffer end may continue in the next block
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def _skip_string(self):
+        """Skip over a JSON string without decoding it."""
+        self._pos += 1
+        while True:
+            match = _STRING_SPECIAL.search(self._buffer, self._pos)
+            if match is None or (match.group() == '\\' and match.end() >= len(self._buffer)):
+                self._pos = match.start() if match else len(self._buffer)
+                if not self._fill():
+                    raise ValueError(f"Malformed transcript {self.path}: unterminated string")
+                continue
+            if match.group() == '\\':
+                self._pos = match.end() + 1
+                continue
+            self._pos = match.end()
+            return
+
+    def iter_segments(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield transcript segments in file order.
+
+        Once the iterator is exhausted the whole file has been read, and
+        `metadata` and `digest` (MD5 of the raw bytes) are populated; so is
+        `untimed_text` when the file holds no segments.
+        """
+        self._hasher = hashlib.md5()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer, self._pos, self._eof = '', 0, False
+        with open(self.path, 'rb') as self._file:
+            self._fill()
+            if self._buffer.startswith('\ufeff'):
+                self._pos = 1
+            self._expect('{')
+            seen = False
+            if self._peek() == '}':
+                self._pos += 1
+            else:
+                while True:
+                    key = self._decode_value()
+                    self._expect(':')
+                    if key == 'transcript' and self._peek() == '[':
+                        self._pos += 1
+                        if self._peek() == ']':
+                            self._pos += 1
+                        else:
+                            # full_text is only kept for transcripts without segments
+                            seen, self.full_text = True, None
+                            while True:
+                                yield self._decode_value()
+                                separator = self._peek()
+                                self._expect(separator if separator in (',', ']') else ',')
+                                if separator == ']':
+                                    break
+                    elif key in ('metadata', 'text') or (key == 'full_text' and not seen):
+                        value = self._decode_value()
+                        if key == 'metadata':
+                            self.metadata = value or {}
+                        elif key == 'text':
+                            self.legacy_text = value
+                        else:
+                            self.full_text = value
+                    elif self._peek() == '"':
+                        self._skip_string()
+                    else:
+                        self._decode_value()
+
+                    separator = self._peek()
+                    self._expect(separator if separator in (',', '}') else ',')
+                    if separator == '}':
+                        break
+            while self._fill():
+                pass
+        self.digest = self._hasher.hexdigest()
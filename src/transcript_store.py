@@ -0,0 +1,346 @@
+import argparse
+import collections
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .chunking import episode_metadata
+    from .ingestion import iter_transcript_files
+    from .transcript_reader import TranscriptReader
+except ImportError:  # imported from src/ by `streamlit run src/app.py`
+    from chunking import episode_metadata
+    from ingestion import iter_transcript_files
+    from transcript_reader import TranscriptReader
+
+logger = logging.getLogger(__name__)
+
+TEXT_FILENAME = "text.bin"
+META_FILENAME = "meta.json"
+# Number of opened episodes kept mapped by a TranscriptStore
+MAX_OPEN_EPISODES = 256
+# Longest UTF-8 encoding of a character, used to bound excerpt reads
+MAX_CHAR_BYTES = 4
+
+
+def normalize_segments(
+    segments: Iterable[Dict[str, Any]]
+) -> Tuple[List[str], List[float], List[float]]:
+    """
+    Collapse whitespace and drop empty segments the way TranscriptChunker does,
+    so segment indices match the seg_start/seg_end metadata of chunks.
+
+    Returns:
+        Tuple of (texts, starts, durations)
+    """
+    texts, starts, durations = [], [], []
+    for segment in segments:
+        text = ' '.join(str(segment.get('text', '')).split())
+        if not text:
+            continue
+        texts.append(text)
+        starts.append(float(segment.get('start', 0.0)))
+        durations.append(float(segment.get('duration', 0.0)))
+    return texts, starts, durations
+
+
+class EpisodeTranscript:
+    """
+    Memory-mapped columnar transcript of one episode.
+
+    Segment texts are stored back to back in a UTF-8 blob, separated by a
+    single space, with `offsets[i]` the byte offset of segment i
+    (`offsets[-1]` is one past the blob end). Slicing a segment range reads
+    only its bytes, and the text of segments [first, last) is exactly the
+    document of a chunk with that seg_start/seg_end. Segment starts are
+    expected in non-decreasing order, as in YouTube transcripts.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize EpisodeTranscript.
+
+        Args:
+            path: Episode directory written by TranscriptStore.write
+        """
+        self.path = path
+        with open(os.path.join(path, META_FILENAME), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.episode_id = self.meta['episode_id']
+        self.starts = np.load(os.path.join(path, 'start.npy'), mmap_mode='r')
+        self.durations = np.load(os.path.join(path, 'duration.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        text_path = os.path.join(path, TEXT_FILENAME)
+        if os.path.getsize(text_path):
+            self._text = memoryview(np.memmap(text_path, dtype=np.uint8, mode='r'))
+        else:
+            # Zero-length files cannot be mapped
+            self._text = memoryview(b'')
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _range(self, first: int, last: Optional[int]) -> Tuple[int, int]:
+        count = len(self)
+        last = count if last is None else min(max(last, 0), count)
+        return min(max(first, 0), last), last
+
+    def text_bytes(self, first: int = 0, last: Optional[int] = None) -> memoryview:
+        """UTF-8 bytes of segments [first, last), as a view on the mapped file."""
+        first, last = self._range(first, last)
+        if first == last:
+            return self._text[0:0]
+        return self._text[int(self.offsets[first]):int(self.offsets[last]) - 1]
+
+    def text(self, first: int = 0, last: Optional[int] = None) -> str:
+        """Text of segments [first, last)."""
+        return str(self.text_bytes(first, last), 'utf-8')
+
+    def excerpt(self, first: int, last: Optional[int] = None, max_chars: int = 300) -> str:
+        """Leading characters of segments [first, last), reading at most the bytes they need."""
+        view = self.text_bytes(first, last)
+        head = str(view[:max_chars * MAX_CHAR_BYTES], 'utf-8', errors='ignore')
+        return head[:max_chars]
+
+    def segment(self, index: int) -> Dict[str, Any]:
+        """Segment at index as {text, start, duration}."""
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return {
+            'text': self.text(index, index + 1),
+            'start': float(self.starts[index]),
+            'duration': float(self.durations[index]),
+        }
+
+    def segment_at(self, seconds: float) -> int:
+        """Index of the segment being spoken at `seconds` (binary search over starts)."""
+        if not len(self):
+            raise IndexError("empty transcript")
+        return max(int(np.searchsorted(self.starts, seconds, side='right')) - 1, 0)
+
+    def segments_between(self, start: float, end: float) -> Tuple[int, int]:
+        """Segment range [first, last) covering the time range [start, end)."""
+        first = self.segment_at(start)
+        last = int(np.searchsorted(self.starts, end, side='left'))
+        return first, max(last, first + 1)
+
+    def passage(self, first: int, last: int, before: int = 0, after: int = 0) -> Dict[str, Any]:
+        """
+        Text and time range of segments [first, last) widened by `before` and
+        `after` neighbouring segments.
+        """
+        first, last = self._range(first - before, last + after)
+        if first == last:
+            return {'text': '', 'start': 0.0, 'end': 0.0, 'seg_start': first, 'seg_end': last}
+        ends = self.starts[first:last] + self.durations[first:last]
+        return {
+            'text': self.text(first, last),
+            'start': float(self.starts[first]),
+            'end': float(ends.max()),
+            'seg_start': first,
+            'seg_end': last,
+        }
+
+    def passage_at(self, seconds: float, before: int = 1, after: int = 1) -> Dict[str, Any]:
+        """Passage around the segment spoken at `seconds`."""
+        index = self.segment_at(seconds)
+        return self.passage(index, index + 1, before, after)
+
+
+class TranscriptStore:
+    """
+    Directory of episodes packed for memory-mapped reads.
+
+    Each episode lives in its own sub-directory (named after a hash of its
+    episode_id) holding the text blob, `start`/`duration`/`offsets` arrays
+    and a small JSON header. Rewrites are staged and swapped in, so readers
+    see either the old or the new version of an episode.
+    """
+
+    def __init__(self, path: str, max_open: int = MAX_OPEN_EPISODES):
+        """
+        Initialize TranscriptStore.
+
+        Args:
+            path: Store directory, created when missing
+            max_open: Number of opened episodes kept mapped
+        """
+        self.path = path
+        self.max_open = max_open
+        self._open: "collections.OrderedDict[str, Tuple[Any, EpisodeTranscript]]" = \
+            collections.OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _episode_path(self, episode_id: str) -> str:
+        name = hashlib.sha1(episode_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, name)
+
+    def __contains__(self, episode_id: str) -> bool:
+        return os.path.exists(os.path.join(self._episode_path(episode_id), META_FILENAME))
+
+    def digest(self, episode_id: str) -> Optional[str]:
+        """Digest of the source file an episode was packed from, or None."""
+        episode = self.open(episode_id)
+        return episode.meta.get('digest') if episode else None
+
+    def episode_ids(self) -> List[str]:
+        """IDs of every stored episode."""
+        ids = []
+        for name in sorted(os.listdir(self.path)):
+            meta_path = os.path.join(self.path, name, META_FILENAME)
+            if name.startswith('.') or not os.path.exists(meta_path):
+                continue
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                ids.append(json.load(f)['episode_id'])
+        return ids
+
+    def open(self, episode_id: str) -> Optional[EpisodeTranscript]:
+        """Mapped transcript of an episode, or None when it is not stored."""
+        path = self._episode_path(episode_id)
+        try:
+            st = os.stat(os.path.join(path, META_FILENAME))
+        except FileNotFoundError:
+            return None
+        version = (st.st_ino, st.st_mtime_ns)
+        with self._lock:
+            cached = self._open.get(episode_id)
+            if cached and cached[0] == version:
+                self._open.move_to_end(episode_id)
+                return cached[1]
+        try:
+            episode = EpisodeTranscript(path)
+        except FileNotFoundError:
+            # Replaced while it was being opened
+            return None
+        with self._lock:
+            self._open[episode_id] = (version, episode)
+            self._open.move_to_end(episode_id)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return episode
+
+    def write(
+        self,
+        episode_id: str,
+        segments: Iterable[Dict[str, Any]],
+        digest: Optional[str] = None
+    ) -> int:
+        """
+        Pack the segments of an episode, replacing any previous version.
+
+        Args:
+            episode_id: Episode ID shared with the chunks of the episode
+            segments: Segments of the form {text, start, duration}
+            digest: Digest of the source file, used to skip unchanged files
+
+        Returns:
+            Number of stored segments
+        """
+        texts, starts, durations = normalize_segments(segments)
+        encoded = [text.encode('utf-8') for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        # Each segment is followed by a one-byte separator, the last one virtual
+        np.cumsum([len(text) + 1 for text in encoded], out=offsets[1:])
+
+        staging = tempfile.mkdtemp(dir=self.path, prefix='.tmp-')
+        try:
+            with open(os.path.join(staging, TEXT_FILENAME), 'wb') as f:
+                f.write(b' '.join(encoded))
+            np.save(os.path.join(staging, 'start.npy'), np.asarray(starts, dtype=np.float64))
+            np.save(os.path.join(staging, 'duration.npy'), np.asarray(durations, dtype=np.float32))
+            np.save(os.path.join(staging, 'offsets.npy'), offsets)
+            with open(os.path.join(staging, META_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'episode_id': episode_id,
+                    'digest': digest,
+                    'segments': len(texts),
+                    'bytes': int(offsets[-1]),
+                }, f)
+
+            target = self._episode_path(episode_id)
+            previous = None
+            if os.path.exists(target):
+                previous = tempfile.mkdtemp(dir=self.path, prefix='.old-')
+                os.replace(target, os.path.join(previous, 'episode'))
+            os.replace(staging, target)
+            if previous:
+                shutil.rmtree(previous, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return len(texts)
+
+    def delete(self, episode_id: str):
+        with self._lock:
+            self._open.pop(episode_id, None)
+        shutil.rmtree(self._episode_path(episode_id), ignore_errors=True)
+
+    def convert_file(
+        self, file_path: str, channel: str, filename: str, force: bool = False
+    ) -> bool:
+        """
+        Pack a transcript JSON file in a single streaming pass.
+
+        Returns:
+            True when the episode was written, False when it was already
+            stored from the same file content
+        """
+        reader = TranscriptReader(file_path)
+        segments = reader.read_segments()
+        metadata = episode_metadata({'metadata': reader.metadata}, channel, filename)
+        episode_id = metadata['episode_id']
+        if not force and self.digest(episode_id) == reader.digest:
+            return False
+        self.write(episode_id, segments, reader.digest)
+        return True
+
+    def convert_directory(self, base_path: str, force: bool = False) -> Dict[str, int]:
+        """
+        Pack every transcript below base_path and drop episodes whose file is gone.
+
+        Returns:
+            Counts of converted, unchanged, removed and failed episodes
+        """
+        stats = {'converted': 0, 'unchanged': 0, 'removed': 0, 'failed': 0}
+        seen = set()
+        for file_path, channel, filename in iter_transcript_files(base_path):
+            seen.add(f"{channel}_{filename}")
+            try:
+                written = self.convert_file(file_path, channel, filename, force)
+            except Exception as e:
+                logger.error(f"Error packing {file_path}: {e}")
+                stats['failed'] += 1
+                continue
+            stats['converted' if written else 'unchanged'] += 1
+        for episode_id in self.episode_ids():
+            if episode_id not in seen:
+                self.delete(episode_id)
+                stats['removed'] += 1
+        logger.info(f"Transcript store sync finished: {stats}")
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack transcripts for memory-mapped reads.")
+    parser.add_argument(
+        'transcripts', nargs='?', default=os.path.join('data', 'youtube_transcripts')
+    )
+    parser.add_argument('store', nargs='?', default=os.path.join('chroma_db', 'transcripts'))
+    parser.add_argument('--force', action='store_true', help="repack unchanged files")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    stats = TranscriptStore(args.store).convert_directory(args.transcripts, args.force)
+    if stats['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,34 @@
 import streamlit as st
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from datetime import date, datetime
+from typing import Dict, Any, Iterable, Optional
+
+try:
+    from .chunking import channel_name
+except ImportError:  # imported from src/ by `streamlit run src/app.py`
+    from chunking import channel_name
+
+# Podcast checkboxes: label shown in the UI -> channel name stored at ingest
+PODCAST_CHANNELS = {
+    "Lex Fridman": channel_name("Lex_Fridman"),
+    "Andrew Huberman": channel_name("Andrew_Huberman"),
+    "DOAC": channel_name("The_Diary_Of_A_CEO"),
+}
+# Default start of the date range filter, early enough to cover the whole library
+DEFAULT_START_DATE = date(2015, 1, 1)
+
 
 class UIComponents:
     """Manages UI components and styling"""
+
+    def __init__(self, transcript_store=None):
+        """
+        Initialize UIComponents.
+
+        Args:
+            transcript_store: Optional TranscriptStore from which result
+                excerpts are read
+        """
+        self.transcript_store = transcript_store
     
     def setup_page(self):
         """Configure page settings and styling"""
@@ -124,12 +149,9 @@ class UIComponents:
         podcast_cols = st.columns(3)
         podcast_sources = {}
         
-        with podcast_cols[0]:
-            podcast_sources["Lex Fridman"] = st.checkbox("Lex Fridman", value=True)
-        with podcast_cols[1]:
-            podcast_sources["Huberman Lab"] = st.checkbox("Andrew Huberman", value=True)
-        with podcast_cols[2]:
-            podcast_sources["Diary of a CEO"] = st.checkbox("DOAC", value=True)
+        for col, (label, channel) in zip(podcast_cols, PODCAST_CHANNELS.items()):
+            with col:
+                podcast_sources[channel] = st.checkbox(label, value=True)
         
         # Advanced settings in an expander
         with st.expander("Advanced Settings", expanded=False):
@@ -139,7 +161,7 @@ class UIComponents:
                 date_range = st.date_input(
                     "Date Range",
                     value=(
-                        datetime.now().date() - timedelta(days=365),
+                        DEFAULT_START_DATE,
                         datetime.now().date()
                     )
                 )
@@ -196,11 +218,82 @@ class UIComponents:
 
                 # Content section
                 st.markdown("#### Excerpt")
-                content = result.get('content', '')
+                # Slim results carry an excerpt, so the full text is not fetched
+                content = self._stored_excerpt(result['metadata']) or \
+                    result.get('excerpt') or result.get('content', '')
                 if isinstance(content, dict):
                     content = content.get('text', str(content))
                 st.markdown(self._format_content(str(content)))
     
+    def display_sources(self, results: list):
+        """Display a compact list of sources before the answer is ready"""
+        st.markdown("### Sources")
+        lines = []
+        for idx, result in enumerate(results, 1):
+            metadata = result['metadata']
+            lines.append(
+                f"{idx}. **{metadata.get('title', 'Unknown Title')}** "
+                f"({metadata.get('channel', 'Unknown')}, {metadata.get('published_at', 'Unknown')})"
+            )
+        st.markdown("\n".join(lines))
+
+    def render_stream(self, fragments: Iterable[str]) -> str:
+        """Render streamed answer fragments progressively and return the full text"""
+        placeholder = st.empty()
+        text = ""
+        for fragment in fragments:
+            text += fragment
+            placeholder.markdown(text + "▌")
+        placeholder.markdown(text)
+        return text
+    
+    def render_ingest_status(self, job: Optional[Dict[str, Any]]):
+        """Show the state and progress of the latest ingestion job in the sidebar"""
+        if not job:
+            return
+        progress = job.get('progress') or {}
+        result = job.get('result') or {}
+        if job['status'] == 'queued' and job.get('attempts'):
+            st.sidebar.caption(
+                f"Transcript sync will be retried (attempt {job['attempts'] + 1}); "
+                f"{result.get('failed', 0)} files failed"
+            )
+        elif job['status'] == 'running' and progress.get('files_total'):
+            done, total = progress['files_done'], progress['files_total']
+            st.sidebar.progress(
+                min(done / total, 1.0),
+                text=f"Indexing transcripts: {done}/{total} files"
+            )
+            st.sidebar.caption(
+                f"{progress.get('files_per_s', 0.0):.1f} files/s, "
+                f"{progress.get('chunks_per_s', 0.0):.0f} chunks/s, "
+                f"{progress['failed']} failed"
+            )
+        elif job['status'] in ('queued', 'running'):
+            st.sidebar.caption("Transcript sync in progress...")
+        elif job['status'] == 'failed':
+            st.sidebar.warning(f"Transcript sync failed: {job.get('error')}")
+        elif result.get('failed'):
+            st.sidebar.warning(f"{result['failed']} transcript files could not be processed.")
+        else:
+            st.sidebar.caption(
+                f"Transcripts up to date ({result.get('added', 0)} added, "
+                f"{result.get('updated', 0)} updated, {result.get('removed', 0)} removed)"
+            )
+
+    def _stored_excerpt(self, metadata: Dict[str, Any], max_length: int = 300) -> Optional[str]:
+        """Excerpt of a chunk read from the transcript store, or None."""
+        if self.transcript_store is None or 'seg_start' not in metadata:
+            return None
+        episode = self.transcript_store.open(metadata.get('episode_id', ''))
+        if episode is None:
+            return None
+        # One character past max_length so _format_content still marks the cut
+        return episode.excerpt(
+            int(metadata['seg_start']), int(metadata.get('seg_end', metadata['seg_start'] + 1)),
+            max_chars=max_length + 1
+        )
+
     def _format_content(self, content: str, max_length: int = 300) -> str:
         """Format content excerpt"""
         excerpt = content[:max_length]
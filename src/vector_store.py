@@ -0,0 +1,783 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+VECTOR_DTYPES = ('float32', 'float16', 'int8')
+DISTANCE_METRICS = ('l2', 'cosine', 'ip')
+INDEX_TYPES = ('auto', 'flat', 'ivf')
+# Rows scored per NumPy operation, bounding temporary memory during search
+SEARCH_BLOCK_ROWS = 65536
+# Pending upserts written out automatically beyond this count
+AUTO_FLUSH_ROWS = 20000
+# With index='auto', an IVF index is built from this many rows
+IVF_MIN_ROWS = 50000
+IVF_TRAINING_SAMPLE = 20000
+IVF_ITERATIONS = 10
+# Sentinel of a missing published_at_int
+MISSING_DATE = np.iinfo(np.int64).min
+DEFAULT_INCLUDE_GET = ('metadatas', 'documents')
+DEFAULT_INCLUDE_QUERY = ('metadatas', 'documents', 'distances')
+
+
+class VectorStore(ABC):
+    """
+    Vector index behind QueryProcessor and TranscriptIngestor.
+
+    The interface is the subset of the Chroma collection API the app uses,
+    so a Chroma collection can be passed wherever a VectorStore is expected.
+    """
+
+    # Collection settings such as 'hnsw:space', set by each store instance
+    metadata: Dict[str, Any]
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored items."""
+
+    @abstractmethod
+    def upsert(
+        self,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+        embeddings: Sequence[Sequence[float]]
+    ):
+        """Insert or replace items."""
+
+    @abstractmethod
+    def delete(self, ids: Sequence[str]):
+        """Remove items; unknown ids are ignored."""
+
+    @abstractmethod
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = DEFAULT_INCLUDE_GET,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """Fetch items by id and/or metadata filter, Chroma-shaped."""
+
+    @abstractmethod
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = DEFAULT_INCLUDE_QUERY
+    ) -> Dict[str, Any]:
+        """Nearest items of each query embedding, Chroma-shaped (one list per query)."""
+
+    def flush(self):
+        """Persist pending writes; stores writing through need not override it."""
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    if op == '$eq':
+        return value == operand
+    if op == '$ne':
+        return value != operand
+    if op == '$in':
+        return value in operand
+    if op == '$nin':
+        return value not in operand
+    if value is None:
+        return False
+    try:
+        if op == '$gt':
+            return value > operand
+        if op == '$gte':
+            return value >= operand
+        if op == '$lt':
+            return value < operand
+        if op == '$lte':
+            return value <= operand
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported where operator {op}")
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma `where` clause against one metadata dictionary."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(matches_where(metadata, c) for c in condition):
+                return False
+        elif key == '$or':
+            if not any(matches_where(metadata, c) for c in condition):
+                return False
+        else:
+            if key not in metadata:
+                return False
+            conditions = condition if isinstance(condition, dict) else {'$eq': condition}
+            if not all(_compare(metadata[key], op, v) for op, v in conditions.items()):
+                return False
+    return True
+
+
+class _StringColumn:
+    """
+    Strings stored as one UTF-8 blob plus offsets; rows are decoded on access.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def pack(cls, values: Sequence[bytes]) -> "_StringColumn":
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        if values:
+            np.cumsum([len(v) for v in values], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(values), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def raw(self, row: int) -> bytes:
+        return self.blob[self.offsets[row]:self.offsets[row + 1]].tobytes()
+
+    def __getitem__(self, row: int) -> str:
+        return self.raw(row).decode('utf-8')
+
+
+def _quantize(block: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Convert float32 rows to the storage dtype, with per-row scales for int8."""
+    if dtype == 'int8':
+        scales = np.abs(block).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.round(block / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    return block.astype(dtype), None
+
+
+class _Segment:
+    """
+    Immutable on-disk snapshot of the store, memory-mapped on load.
+    """
+
+    def __init__(self, directory: Optional[str] = None, dimensions: Optional[int] = None):
+        self.directory = directory
+        self.dimensions = dimensions
+        self.vectors = np.zeros((0, dimensions or 0), dtype=np.float32)
+        self.scales: Optional[np.ndarray] = None
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.ids = _StringColumn.pack([])
+        self.documents = _StringColumn.pack([])
+        self.metadatas = _StringColumn.pack([])
+        self.channels = np.zeros(0, dtype=np.int32)
+        self.channel_vocab: List[str] = []
+        self.published = np.zeros(0, dtype=np.int64)
+        self.ivf_centroids: Optional[np.ndarray] = None
+        self.ivf_order: Optional[np.ndarray] = None
+        self.ivf_offsets: Optional[np.ndarray] = None
+        self._id_index: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def load(cls, directory: str) -> "_Segment":
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['version'] != STORE_VERSION:
+            raise ValueError(f"unsupported vector store version {meta['version']}")
+
+        def array(name):
+            return np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+
+        segment = cls(directory, meta['dimensions'])
+        segment.vectors = array('vectors')
+        segment.scales = array('scales') if meta['dtype'] == 'int8' else None
+        segment.norms = array('norms')
+        segment.ids = _StringColumn(array('ids_blob'), array('ids_offsets'))
+        segment.documents = _StringColumn(array('documents_blob'), array('documents_offsets'))
+        segment.metadatas = _StringColumn(array('metadatas_blob'), array('metadatas_offsets'))
+        segment.channels = array('channels')
+        segment.channel_vocab = meta['channel_vocab']
+        segment.published = array('published')
+        if meta.get('ivf'):
+            segment.ivf_centroids = array('ivf_centroids')
+            segment.ivf_order = array('ivf_order')
+            segment.ivf_offsets = array('ivf_offsets')
+        return segment
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def id_index(self) -> Dict[str, int]:
+        """Row of each id, built on first use so that loading stays zero-copy."""
+        if self._id_index is None:
+            self._id_index = {self.ids[row]: row for row in range(len(self))}
+        return self._id_index
+
+    def dequantize(self, rows) -> np.ndarray:
+        block = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            block = block * np.asarray(self.scales[rows])[:, None]
+        return block
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        return json.loads(self.metadatas.raw(row))
+
+    def where_mask(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Rows matching a where clause, evaluated on columns where possible."""
+        if not where:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        for key, condition in where.items():
+            if key == '$and':
+                for clause in condition:
+                    mask &= self.where_mask(clause)
+            elif key == '$or':
+                either = np.zeros(len(self), dtype=bool)
+                for clause in condition:
+                    either |= self.where_mask(clause)
+                mask &= either
+            else:
+                conditions = condition if isinstance(condition, dict) else {'$eq': condition}
+                for op, operand in conditions.items():
+                    mask &= self._field_mask(key, op, operand)
+        return mask
+
+    def _field_mask(self, key: str, op: str, operand: Any) -> np.ndarray:
+        if key == 'channel' and op in ('$eq', '$ne', '$in', '$nin'):
+            values = [operand] if op in ('$eq', '$ne') else list(operand)
+            vocab = {name: code for code, name in enumerate(self.channel_vocab)}
+            codes = [vocab[v] for v in values if v in vocab]
+            hit = np.isin(self.channels, codes)
+            return hit if op in ('$eq', '$in') else ~hit & (self.channels >= 0)
+        if key == 'published_at_int' and op in ('$gt', '$gte', '$lt', '$lte', '$eq', '$ne'):
+            column = np.asarray(self.published)
+            present = column != MISSING_DATE
+            compare = {
+                '$gt': np.greater, '$gte': np.greater_equal, '$lt': np.less,
+                '$lte': np.less_equal, '$eq': np.equal, '$ne': np.not_equal
+            }[op]
+            return present & compare(column, operand)
+        # Fields without a column are evaluated on the decoded metadata
+        return np.fromiter(
+            (matches_where(self.metadata(row), {key: {op: operand}}) for row in range(len(self))),
+            dtype=bool,
+            count=len(self)
+        )
+
+
+def _distances(
+    vectors: np.ndarray,
+    norms: np.ndarray,
+    query: np.ndarray,
+    query_norm: float,
+    metric: str
+) -> np.ndarray:
+    dots = vectors @ query
+    if metric == 'l2':
+        return np.maximum(norms + query_norm - 2 * dots, 0.0)
+    if metric == 'cosine':
+        return 1.0 - dots / (np.sqrt(norms * query_norm) + 1e-12)
+    return 1.0 - dots
+
+
+def _merge_top_k(
+    best: Tuple[np.ndarray, np.ndarray],
+    rows: np.ndarray,
+    distances: np.ndarray,
+    k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    rows = np.concatenate([best[0], rows])
+    distances = np.concatenate([best[1], distances])
+    if len(distances) > k:
+        keep = np.argpartition(distances, k - 1)[:k]
+        rows, distances = rows[keep], distances[keep]
+    return rows, distances
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Vector store over memory-mapped NumPy arrays.
+
+    Embeddings are kept in one float32, float16 or int8 (per-row scaled)
+    matrix with ids, documents and metadata packed alongside, and channel and
+    date columns used to pre-filter searches with vectorised masks. Search is
+    exact brute force, or probes the nearest lists of an IVF index once the
+    store is large. Loading maps the files without reading them.
+
+    Writes are buffered and written by flush() into a new snapshot directory
+    that replaces the previous one atomically, so readers in other processes
+    always see a complete snapshot.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dtype: str = 'float32',
+        metric: str = 'l2',
+        index: str = 'auto',
+        nprobe: int = 8,
+        ivf_min_rows: int = IVF_MIN_ROWS
+    ):
+        """
+        Initialize NumpyVectorStore, loading the current snapshot under path if any.
+
+        Args:
+            path: Store directory
+            dtype: Storage type of the embeddings: 'float32', 'float16' or 'int8'
+            metric: Distance reported by query: 'l2' (squared, like Chroma's
+                default), 'cosine' or 'ip'
+            index: 'flat' always searches every row, 'ivf' always builds an
+                IVF index and 'auto' builds one from ivf_min_rows rows
+            nprobe: IVF lists searched per query
+            ivf_min_rows: Row count from which index='auto' builds an IVF index
+        """
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"dtype must be one of {VECTOR_DTYPES}")
+        if metric not in DISTANCE_METRICS:
+            raise ValueError(f"metric must be one of {DISTANCE_METRICS}")
+        if index not in INDEX_TYPES:
+            raise ValueError(f"index must be one of {INDEX_TYPES}")
+        self.path = path
+        self.dtype = dtype
+        self.metric = metric
+        self.index = index
+        self.nprobe = nprobe
+        self.ivf_min_rows = ivf_min_rows
+        self.metadata = {'hnsw:space': metric}
+        self._lock = threading.RLock()
+        self._segment = _Segment()
+        self._version: Optional[str] = None
+        self._reset_pending()
+        self._load_current()
+
+    def _reset_pending(self):
+        self._pending: Dict[str, Tuple[str, Dict[str, Any], np.ndarray]] = {}
+        self._pending_matrix: Optional[Tuple[List[str], np.ndarray, np.ndarray]] = None
+        self._alive: Optional[np.ndarray] = None
+
+    def _current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.path, 'CURRENT'), 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _load_current(self):
+        version = self._current_version()
+        if version is None:
+            return
+        try:
+            segment = _Segment.load(os.path.join(self.path, version))
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable vector store snapshot {version}: {e}")
+            return
+        self._segment = segment
+        self._version = version
+        logger.info(f"Loaded vector store {self.path} with {len(segment)} items")
+
+    def is_current(self) -> bool:
+        """False once another process has flushed a newer snapshot."""
+        return self._current_version() == self._version
+
+    def reload(self):
+        """Map the latest snapshot, dropping unflushed writes."""
+        with self._lock:
+            self._reset_pending()
+            self._load_current()
+
+    def _alive_mask(self) -> np.ndarray:
+        if self._alive is None:
+            self._alive = np.ones(len(self._segment), dtype=bool)
+        return self._alive
+
+    def count(self) -> int:
+        with self._lock:
+            base = len(self._segment) if self._alive is None else int(self._alive.sum())
+            return base + len(self._pending)
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+        embeddings: Optional[Sequence[Sequence[float]]] = None
+    ):
+        if embeddings is None:
+            raise ValueError("NumpyVectorStore needs precomputed embeddings")
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("Expected one embedding per id")
+        with self._lock:
+            dimensions = self._segment.dimensions or next(
+                (len(vector) for _, _, vector in self._pending.values()), None
+            )
+            if dimensions is not None and vectors.shape[1] != dimensions:
+                raise ValueError(f"Expected {dimensions}-dimensional embeddings")
+            index = self._segment.id_index
+            for item_id, document, metadata, vector in zip(ids, documents, metadatas, vectors):
+                self._pending[item_id] = (document, dict(metadata or {}), vector)
+                row = index.get(item_id)
+                if row is not None:
+                    self._alive_mask()[row] = False
+            self._pending_matrix = None
+            if len(self._pending) >= AUTO_FLUSH_ROWS:
+                self.flush()
+
+    def delete(self, ids: Sequence[str]):
+        with self._lock:
+            index = self._segment.id_index
+            for item_id in ids:
+                if self._pending.pop(item_id, None) is not None:
+                    self._pending_matrix = None
+                row = index.get(item_id)
+                if row is not None:
+                    self._alive_mask()[row] = False
+
+    def _pending_arrays(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Ids, vectors and squared norms of the buffered upserts."""
+        if self._pending_matrix is None:
+            ids = list(self._pending)
+            dimensions = self._segment.dimensions or 0
+            vectors = (
+                np.stack([self._pending[i][2] for i in ids]) if ids
+                else np.zeros((0, dimensions), dtype=np.float32)
+            )
+            self._pending_matrix = (ids, vectors, np.einsum('ij,ij->i', vectors, vectors))
+        return self._pending_matrix
+
+    def _rows(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Selected base rows, or None when every row is selected."""
+        mask = self._segment.where_mask(where)
+        if self._alive is not None:
+            mask = self._alive.copy() if mask is None else mask & self._alive
+        return None if mask is None else np.flatnonzero(mask)
+
+    def _blocks(self, rows: Optional[np.ndarray]) -> Iterator[Tuple[np.ndarray, Any]]:
+        """(row numbers, selector) blocks; contiguous blocks are sliced without copying."""
+        if rows is None:
+            for start in range(0, len(self._segment), SEARCH_BLOCK_ROWS):
+                stop = min(start + SEARCH_BLOCK_ROWS, len(self._segment))
+                yield np.arange(start, stop), slice(start, stop)
+        else:
+            for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+                block = rows[start:start + SEARCH_BLOCK_ROWS]
+                yield block, block
+
+    def _ivf_rows(self, query: np.ndarray, query_norm: float, rows: Optional[np.ndarray], k):
+        """Rows of the nprobe nearest IVF lists that pass the filter."""
+        segment = self._segment
+        centroids = np.asarray(segment.ivf_centroids)
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        probe = np.argsort(_distances(centroids, centroid_norms, query, query_norm, self.metric))
+        offsets = segment.ivf_offsets
+        lists = [
+            segment.ivf_order[offsets[i]:offsets[i + 1]] for i in probe[:self.nprobe]
+        ]
+        candidates = np.sort(np.concatenate(lists)) if lists else np.zeros(0, dtype=np.int64)
+        if rows is not None:
+            candidates = candidates[np.isin(candidates, rows, assume_unique=True)]
+        # Too few candidates after filtering: search the filtered rows exactly
+        if len(candidates) < k:
+            return rows
+        return candidates
+
+    def _search(
+        self,
+        query: np.ndarray,
+        k: int,
+        rows: Optional[np.ndarray]
+    ) -> List[Tuple[float, str, Any]]:
+        """(distance, id, location) of the k nearest items; location is a row or the id."""
+        segment = self._segment
+        query_norm = float(query @ query)
+        best = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+        if len(segment) and k:
+            if segment.ivf_centroids is not None:
+                rows = self._ivf_rows(query, query_norm, rows, k)
+            for block_rows, selector in self._blocks(rows):
+                distances = _distances(
+                    segment.dequantize(selector), np.asarray(segment.norms[selector]),
+                    query, query_norm, self.metric
+                )
+                best = _merge_top_k(best, block_rows, distances, k)
+        hits = [(float(d), segment.ids[int(r)], int(r)) for r, d in zip(*best)]
+        return hits
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = DEFAULT_INCLUDE_QUERY
+    ) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._rows(where)
+            pending_ids, pending_vectors, pending_norms = self._pending_arrays()
+            pending_selected = [
+                i for i, item_id in enumerate(pending_ids)
+                if matches_where(self._pending[item_id][1], where)
+            ]
+            results: Dict[str, List[Any]] = {'ids': []}
+            for key in include:
+                results[key] = []
+            for embedding in np.asarray(query_embeddings, dtype=np.float32):
+                hits = self._search(embedding, n_results, rows)
+                if pending_selected:
+                    distances = _distances(
+                        pending_vectors[pending_selected], pending_norms[pending_selected],
+                        embedding, float(embedding @ embedding), self.metric
+                    )
+                    hits += [
+                        (float(d), pending_ids[i], pending_ids[i])
+                        for i, d in zip(pending_selected, distances)
+                    ]
+                hits.sort(key=lambda hit: hit[0])
+                hits = hits[:n_results]
+                results['ids'].append([item_id for _, item_id, _ in hits])
+                items = self._items([location for _, _, location in hits], include)
+                for key in include:
+                    if key == 'distances':
+                        results[key].append([d for d, _, _ in hits])
+                    else:
+                        results[key].append(items[key])
+            return results
+
+    def _items(self, locations: Sequence[Any], include: Sequence[str]) -> Dict[str, Any]:
+        """Documents, metadatas and embeddings of base rows (int) or pending ids (str)."""
+        items: Dict[str, Any] = {key: [] for key in include if key != 'distances'}
+        for location in locations:
+            if isinstance(location, str):
+                document, metadata, vector = self._pending[location]
+            else:
+                document = metadata = vector = None
+                if 'documents' in items:
+                    document = self._segment.documents[location]
+                if 'metadatas' in items:
+                    metadata = self._segment.metadata(location)
+                if 'embeddings' in items:
+                    vector = self._segment.dequantize([location])[0]
+            if 'documents' in items:
+                items['documents'].append(document)
+            if 'metadatas' in items:
+                items['metadatas'].append(dict(metadata))
+            if 'embeddings' in items:
+                items['embeddings'].append(vector)
+        if 'embeddings' in items:
+            dimensions = self._segment.dimensions or 0
+            items['embeddings'] = (
+                np.stack(items['embeddings']) if items['embeddings']
+                else np.zeros((0, dimensions), dtype=np.float32)
+            )
+        return items
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = DEFAULT_INCLUDE_GET,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        with self._lock:
+            locations: List[Any] = []
+            if ids is not None:
+                index = self._segment.id_index
+                alive = self._alive
+                for item_id in ids:
+                    if item_id in self._pending:
+                        if matches_where(self._pending[item_id][1], where):
+                            locations.append(item_id)
+                        continue
+                    row = index.get(item_id)
+                    if row is None or (alive is not None and not alive[row]):
+                        continue
+                    if not where or matches_where(self._segment.metadata(row), where):
+                        locations.append(row)
+            else:
+                rows = self._rows(where)
+                locations = list(range(len(self._segment))) if rows is None else rows.tolist()
+                locations += [
+                    item_id for item_id, (_, metadata, _) in self._pending.items()
+                    if matches_where(metadata, where)
+                ]
+            locations = locations[offset:offset + limit if limit else None]
+            result = {
+                'ids': [
+                    location if isinstance(location, str) else self._segment.ids[location]
+                    for location in locations
+                ]
+            }
+            result.update(self._items(locations, include))
+            return result
+
+    def flush(self):
+        """Write buffered changes into a new snapshot and map it."""
+        with self._lock:
+            if not self._pending and self._alive is None and self._version is not None:
+                return
+            generation = int(self._version[1:]) + 1 if self._version else 1
+            version = f"v{generation:06d}"
+            directory = os.path.join(self.path, version)
+            if os.path.exists(directory):
+                shutil.rmtree(directory)
+            os.makedirs(directory)
+            try:
+                self._write_snapshot(directory)
+            except Exception:
+                shutil.rmtree(directory, ignore_errors=True)
+                raise
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(version)
+            os.replace(tmp_path, os.path.join(self.path, 'CURRENT'))
+
+            previous = self._version
+            self._reset_pending()
+            self._load_current()
+            if previous:
+                # Processes still mapping the old files keep reading them until they reload
+                shutil.rmtree(os.path.join(self.path, previous), ignore_errors=True)
+
+    def _write_snapshot(self, directory: str):
+        segment = self._segment
+        base_rows = (
+            np.arange(len(segment)) if self._alive is None else np.flatnonzero(self._alive)
+        )
+        pending_ids, pending_vectors, _ = self._pending_arrays()
+        dimensions = segment.dimensions or (
+            pending_vectors.shape[1] if len(pending_vectors) else 0
+        )
+        total = len(base_rows) + len(pending_ids)
+
+        def path(name):
+            return os.path.join(directory, name + '.npy')
+
+        vectors = np.lib.format.open_memmap(
+            path('vectors'), mode='w+', dtype=self.dtype, shape=(total, dimensions)
+        )
+        scales = np.zeros(total, dtype=np.float32) if self.dtype == 'int8' else None
+        norms = np.zeros(total, dtype=np.float32)
+
+        def write_block(target, start, block):
+            quantized, block_scales = _quantize(block, self.dtype)
+            stop = start + len(block)
+            target[start:stop] = quantized
+            if scales is not None:
+                scales[start:stop] = block_scales
+            stored = quantized.astype(np.float32)
+            if block_scales is not None:
+                stored *= block_scales[:, None]
+            norms[start:stop] = np.einsum('ij,ij->i', stored, stored)
+
+        position = 0
+        for start in range(0, len(base_rows), SEARCH_BLOCK_ROWS):
+            block_rows = base_rows[start:start + SEARCH_BLOCK_ROWS]
+            write_block(vectors, position, segment.dequantize(block_rows))
+            position += len(block_rows)
+        if pending_ids:
+            write_block(vectors, position, pending_vectors)
+        vectors.flush()
+        del vectors
+
+        base = base_rows.tolist()
+        metadatas = [segment.metadata(r) for r in base] + [
+            self._pending[i][1] for i in pending_ids
+        ]
+        channel_vocab = sorted({str(m['channel']) for m in metadatas if 'channel' in m})
+        codes = {name: code for code, name in enumerate(channel_vocab)}
+        channels = np.array(
+            [codes[str(m['channel'])] if 'channel' in m else -1 for m in metadatas],
+            dtype=np.int32
+        )
+        published = np.array(
+            [int(m.get('published_at_int', MISSING_DATE)) for m in metadatas], dtype=np.int64
+        )
+        columns = {
+            'ids': [segment.ids.raw(r) for r in base] + [i.encode('utf-8') for i in pending_ids],
+            'documents': [segment.documents.raw(r) for r in base] + [
+                self._pending[i][0].encode('utf-8') for i in pending_ids
+            ],
+            'metadatas': [segment.metadatas.raw(r) for r in base] + [
+                json.dumps(self._pending[i][1], default=str).encode('utf-8')
+                for i in pending_ids
+            ]
+        }
+        for name, values in columns.items():
+            column = _StringColumn.pack(values)
+            np.save(path(f'{name}_blob'), column.blob)
+            np.save(path(f'{name}_offsets'), column.offsets)
+        np.save(path('norms'), norms)
+        np.save(path('channels'), channels)
+        np.save(path('published'), published)
+        if scales is not None:
+            np.save(path('scales'), scales)
+
+        build_ivf = self.index == 'ivf' or (self.index == 'auto' and total >= self.ivf_min_rows)
+        if build_ivf and total:
+            self._write_ivf(np.load(path('vectors'), mmap_mode='r'), scales, norms, path)
+
+        meta = {
+            'version': STORE_VERSION,
+            'dtype': self.dtype,
+            'dimensions': dimensions,
+            'count': total,
+            'channel_vocab': channel_vocab,
+            'ivf': bool(build_ivf and total)
+        }
+        with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    def _write_ivf(self, vectors: np.ndarray, scales, norms: np.ndarray, path):
+        """Train IVF centroids with k-means on a sample and assign every row to a list."""
+        total = len(vectors)
+        nlist = max(1, int(np.sqrt(total)))
+        rng = np.random.default_rng(0)
+
+        def rows_f32(rows):
+            block = np.asarray(vectors[rows], dtype=np.float32)
+            return block * scales[rows][:, None] if scales is not None else block
+
+        sample_rows = np.sort(rng.choice(total, min(total, IVF_TRAINING_SAMPLE), replace=False))
+        sample = rows_f32(sample_rows)
+        centroids = sample[rng.choice(len(sample), min(nlist, len(sample)), replace=False)]
+        for _ in range(IVF_ITERATIONS):
+            assignment = self._assign(sample, np.einsum('ij,ij->i', sample, sample), centroids)
+            for i in range(len(centroids)):
+                members = sample[assignment == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+
+        assignment = np.empty(total, dtype=np.int32)
+        for start in range(0, total, SEARCH_BLOCK_ROWS):
+            stop = min(start + SEARCH_BLOCK_ROWS, total)
+            assignment[start:stop] = self._assign(
+                rows_f32(slice(start, stop)), norms[start:stop], centroids
+            )
+        order = np.argsort(assignment, kind='stable').astype(np.int64)
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=len(centroids)), out=offsets[1:])
+        np.save(path('ivf_centroids'), centroids.astype(np.float32))
+        np.save(path('ivf_order'), order)
+        np.save(path('ivf_offsets'), offsets)
+
+    def _assign(self, block: np.ndarray, norms: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Nearest centroid of each row under the store metric."""
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        dots = block @ centroids.T
+        if self.metric == 'l2':
+            distances = centroid_norms[None, :] - 2 * dots
+        elif self.metric == 'cosine':
+            distances = -dots / (np.sqrt(norms[:, None] * centroid_norms[None, :]) + 1e-12)
+        else:
+            distances = -dots
+        return distances.argmin(axis=1)
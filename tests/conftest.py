@@ -1,14 +1,20 @@
 import pytest
 from unittest.mock import Mock
 
+
 @pytest.fixture
 def mock_openai_client():
     client = Mock()
     completion = Mock()
-    completion.choices = [Mock(message=Mock(content='{"query_type": "factual", "topics": ["AI"], "context_needs": ["general"], "expected_sources": ["any"], "time_relevance": "any_time", "summary_format": "general", "complexity_level": "intermediate", "key_terms": ["AI"]}'))]
+    completion.choices = [Mock(message=Mock(content=(
+        '{"query_type": "factual", "topics": ["AI"], "context_needs": ["general"], '
+        '"expected_sources": ["any"], "time_relevance": "any_time", '
+        '"summary_format": "general", "complexity_level": "intermediate", "key_terms": ["AI"]}'
+    )))]
     client.chat.completions.create.return_value = completion
     return client
 
+
 @pytest.fixture
 def mock_chroma_client():
     client = Mock()
@@ -19,4 +25,31 @@ def mock_chroma_client():
         'distances': [[0.5]]
     }
     client.get_or_create_collection.return_value = collection
-    return client
\ No newline at end of file
+    return client
+
+
+class FakeEmbeddingClient:
+    """Offline stand-in for the OpenAI embeddings API with deterministic vectors."""
+
+    def __init__(self, dimensions=8, fail_with=None):
+        self.dimensions = dimensions
+        self.fail_with = list(fail_with or [])
+        self.calls = []
+        self.embeddings = self
+
+    def vector(self, text):
+        import hashlib
+        digest = hashlib.sha256(text.encode('utf-8')).digest()
+        return [b / 255.0 for b in digest[:self.dimensions]]
+
+    def create(self, model, input):
+        if self.fail_with:
+            raise self.fail_with.pop(0)
+        inputs = [input] if isinstance(input, str) else list(input)
+        self.calls.append(inputs)
+        return Mock(data=[Mock(embedding=self.vector(text)) for text in inputs])
+
+
+@pytest.fixture
+def fake_embedding_client():
+    return FakeEmbeddingClient()
@@ -0,0 +1,97 @@
+"""
+Benchmark result recording and regression detection against a JSON baseline.
+"""
+import json
+import os
+import platform
+import statistics
+import time
+import warnings
+
+import pytest
+
+
+class BenchmarkRegression(UserWarning):
+    pass
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def time_calls(func, repeat):
+    """Call func repeatedly and return the per-call durations in milliseconds."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+class BenchmarkRecorder:
+    """
+    Collects benchmark metrics and compares them with a stored baseline.
+
+    Metrics are keyed by name and corpus scale, so a baseline recorded at
+    10k episodes is never compared with a run at 1k. A metric worse than its
+    baseline by more than `tolerance` is reported as a BenchmarkRegression
+    warning, or fails the benchmark when `strict` is set.
+    """
+
+    def __init__(
+        self, baseline_path, results_path, scale, tolerance=0.5, strict=False, noise_floor_ms=5.0
+    ):
+        self.baseline_path = baseline_path
+        self.results_path = results_path
+        self.scale = scale
+        self.tolerance = tolerance
+        self.strict = strict
+        # Millisecond metrics closer than this to their baseline are never flagged
+        self.noise_floor_ms = noise_floor_ms
+        self.results = {}
+        self.regressions = []
+        self.baseline = {}
+        if os.path.exists(baseline_path):
+            with open(baseline_path, 'r', encoding='utf-8') as f:
+                self.baseline = json.load(f).get('metrics', {})
+
+    def record(self, name, value, unit, higher_is_better=False):
+        """Record one metric and flag it if it regressed against the baseline."""
+        key = f"{name}@{self.scale}"
+        self.results[key] = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+        reference = self.baseline.get(key, {}).get('value')
+        if not reference:
+            return
+        ratio = reference / value if higher_is_better else value / reference
+        if unit == 'ms' and abs(value - reference) < self.noise_floor_ms:
+            return
+        if ratio > 1 + self.tolerance:
+            message = f"{key} regressed: {value:.2f} {unit} vs baseline {reference:.2f} {unit}"
+            self.regressions.append(message)
+            if self.strict:
+                pytest.fail(message)
+            warnings.warn(message, BenchmarkRegression)
+
+    def record_latencies(self, name, durations_ms):
+        """Record p50 and p95 of a list of durations in milliseconds."""
+        self.record(f"{name}_p50", statistics.median(durations_ms), 'ms')
+        self.record(f"{name}_p95", percentile(durations_ms, 0.95), 'ms')
+
+    def _document(self, metrics):
+        return {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'metrics': metrics
+        }
+
+    def save(self, update_baseline=False):
+        """Write this run's results, and merge them into the baseline if requested."""
+        with open(self.results_path, 'w', encoding='utf-8') as f:
+            json.dump(self._document(self.results), f, indent=2, sort_keys=True)
+        if update_baseline or not os.path.exists(self.baseline_path):
+            with open(self.baseline_path, 'w', encoding='utf-8') as f:
+                json.dump(
+                    self._document({**self.baseline, **self.results}), f, indent=2, sort_keys=True
+                )
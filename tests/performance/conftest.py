@@ -0,0 +1,91 @@
+import importlib.util
+import os
+import time
+
+import pytest
+
+from src.chunking import TranscriptChunker
+from src.embeddings import EmbeddingService
+from src.ingest_manifest import IngestManifest
+from src.ingestion import TranscriptIngestor
+from src.lexical_index import LexicalIndex
+from tests.performance.benchmark import BenchmarkRecorder
+from tests.performance.fakes import FakeCollection, FakeOpenAI
+
+HERE = os.path.dirname(__file__)
+GENERATOR_PATH = os.path.join(HERE, '..', '..', 'data', 'tools', 'generate_test_data.py')
+
+# Corpus scale; the defaults keep the suite fast, use e.g.
+# BENCHMARK_EPISODES=10000 for representative numbers
+BENCHMARK_EPISODES = int(os.getenv('BENCHMARK_EPISODES', 60))
+BENCHMARK_SEGMENTS = int(os.getenv('BENCHMARK_SEGMENTS', 120))
+
+
+def pytest_collection_modifyitems(config, items):
+    # Benchmarks are slow and machine-specific: only run when selected with -m benchmark
+    if 'benchmark' in (config.getoption('markexpr') or ''):
+        return
+    skip = pytest.mark.skip(reason="benchmark; select it with -m benchmark")
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+def load_generator():
+    spec = importlib.util.spec_from_file_location('generate_test_data', GENERATOR_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope='session')
+def benchmark_recorder():
+    recorder = BenchmarkRecorder(
+        baseline_path=os.path.join(HERE, 'benchmark_baseline.json'),
+        results_path=os.path.join(HERE, 'benchmark_results.json'),
+        scale=f"{BENCHMARK_EPISODES}x{BENCHMARK_SEGMENTS}",
+        tolerance=float(os.getenv('BENCHMARK_TOLERANCE', 0.5)),
+        strict=os.getenv('BENCHMARK_STRICT') == '1'
+    )
+    yield recorder
+    recorder.save(update_baseline=os.getenv('BENCHMARK_UPDATE_BASELINE') == '1')
+
+
+@pytest.fixture(scope='session')
+def synthetic_corpus(tmp_path_factory):
+    base = tmp_path_factory.mktemp('synthetic_transcripts')
+    paths = load_generator().generate_corpus(
+        str(base), BENCHMARK_EPISODES, segments=BENCHMARK_SEGMENTS
+    )
+    return str(base), paths
+
+
+@pytest.fixture(scope='session')
+def ingested_backend(synthetic_corpus, tmp_path_factory):
+    """Synthetic corpus ingested into fake backends, with the sync duration."""
+    base, paths = synthetic_corpus
+    state = tmp_path_factory.mktemp('ingest_state')
+    openai_client = FakeOpenAI()
+    embedding_service = EmbeddingService(openai_client)
+    collection = FakeCollection()
+    lexical_index = LexicalIndex(str(state / 'lexical_index.npz'))
+    ingestor = TranscriptIngestor(
+        collection,
+        base,
+        IngestManifest(str(state / 'ingest_manifest.json')),
+        TranscriptChunker(),
+        embedding_service=embedding_service,
+        lexical_index=lexical_index
+    )
+    start = time.perf_counter()
+    stats = ingestor.sync()
+    elapsed = time.perf_counter() - start
+    return {
+        'collection': collection,
+        'embedding_service': embedding_service,
+        'lexical_index': lexical_index,
+        'ingestor': ingestor,
+        'stats': stats,
+        'seconds': elapsed,
+        'files': len(paths)
+    }
@@ -0,0 +1,203 @@
+"""
+In-process stand-ins for the OpenAI and Chroma backends with configurable latency.
+"""
+import hashlib
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+ANALYSIS_JSON = json.dumps({
+    "query_type": "factual", "topics": ["sleep"], "context_needs": ["general"],
+    "expected_sources": ["any"], "time_relevance": "any_time", "summary_format": "general",
+    "complexity_level": "intermediate", "key_terms": ["sleep"]
+})
+
+
+class FakeOpenAI:
+    """
+    Embeddings and chat completions answered locally after a fixed delay.
+
+    Embeddings are deterministic unit vectors derived from the text hash.
+    """
+
+    def __init__(
+        self,
+        dimensions=64,
+        embedding_latency=0.0,
+        chat_latency=0.0,
+        token_latency=0.0,
+        answer="Sleep matters. " * 20
+    ):
+        self.dimensions = dimensions
+        self.embedding_latency = embedding_latency
+        self.chat_latency = chat_latency
+        self.token_latency = token_latency
+        self.answer = answer
+        self.embedding_requests = 0
+        self.chat_requests = 0
+        self._lock = threading.Lock()
+        self.embeddings = SimpleNamespace(create=self._create_embeddings)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+
+    def vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+        vector = np.random.default_rng(seed).standard_normal(self.dimensions)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _create_embeddings(self, model, input):
+        with self._lock:
+            self.embedding_requests += 1
+        time.sleep(self.embedding_latency)
+        inputs = [input] if isinstance(input, str) else list(input)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=self.vector(t)) for t in inputs])
+
+    def _create_completion(self, model, messages, stream=False, **kwargs):
+        with self._lock:
+            self.chat_requests += 1
+        time.sleep(self.chat_latency)
+        is_analysis = 'structured classification' in messages[-1]['content']
+        content = ANALYSIS_JSON if is_analysis else self.answer
+        if not stream:
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                usage=None
+            )
+        return self._stream(content)
+
+    def _stream(self, content):
+        for word in content.split(' '):
+            time.sleep(self.token_latency)
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=word + ' '))]
+            )
+
+
+def _matches(metadata, where):
+    """Evaluate the subset of Chroma's where syntax used by the app."""
+    if not where:
+        return True
+    if '$and' in where:
+        return all(_matches(metadata, clause) for clause in where['$and'])
+    if '$or' in where:
+        return any(_matches(metadata, clause) for clause in where['$or'])
+    for field, condition in where.items():
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for op, operand in condition.items():
+            if op == '$eq' and value != operand:
+                return False
+            if op == '$ne' and value == operand:
+                return False
+            if op == '$in' and value not in operand:
+                return False
+            if op == '$nin' and value in operand:
+                return False
+            if op in ('$gt', '$gte', '$lt', '$lte') and value is None:
+                return False
+            if op == '$gt' and not value > operand:
+                return False
+            if op == '$gte' and not value >= operand:
+                return False
+            if op == '$lt' and not value < operand:
+                return False
+            if op == '$lte' and not value <= operand:
+                return False
+    return True
+
+
+class FakeCollection:
+    """
+    Brute-force vector collection implementing the Chroma calls used by the app.
+
+    Distances follow Chroma's default squared L2 space.
+    """
+
+    metadata = {'hnsw:space': 'l2'}
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._ids = []
+        self._index = {}
+        self._documents = []
+        self._metadatas = []
+        self._vectors = []
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def count(self):
+        return len(self._index)
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        time.sleep(self.latency)
+        with self._lock:
+            for id_, doc, meta, vector in zip(ids, documents, metadatas, embeddings):
+                position = self._index.get(id_)
+                if position is None:
+                    self._index[id_] = len(self._ids)
+                    self._ids.append(id_)
+                    self._documents.append(doc)
+                    self._metadatas.append(meta)
+                    self._vectors.append(vector)
+                else:
+                    self._documents[position] = doc
+                    self._metadatas[position] = meta
+                    self._vectors[position] = vector
+            self._matrix = None
+
+    def delete(self, ids):
+        with self._lock:
+            doomed = {self._index[i] for i in ids if i in self._index}
+            if not doomed:
+                return
+            keep = [p for p in range(len(self._ids)) if p not in doomed]
+            self._ids = [self._ids[p] for p in keep]
+            self._documents = [self._documents[p] for p in keep]
+            self._metadatas = [self._metadatas[p] for p in keep]
+            self._vectors = [self._vectors[p] for p in keep]
+            self._index = {id_: p for p, id_ in enumerate(self._ids)}
+            self._matrix = None
+
+    def _positions(self, where):
+        return [p for p, meta in enumerate(self._metadatas) if _matches(meta, where)]
+
+    def get(self, ids=None, where=None, include=(), limit=None, offset=0):
+        time.sleep(self.latency)
+        if ids is not None:
+            positions = [self._index[i] for i in ids if i in self._index]
+            positions = [p for p in positions if _matches(self._metadatas[p], where)]
+        else:
+            positions = self._positions(where)
+        positions = positions[offset:offset + limit if limit else None]
+        return {
+            'ids': [self._ids[p] for p in positions],
+            'documents': [self._documents[p] for p in positions],
+            'metadatas': [self._metadatas[p] for p in positions],
+            'embeddings': np.array([self._vectors[p] for p in positions])
+        }
+
+    def query(self, query_embeddings, n_results=10, where=None, include=()):
+        time.sleep(self.latency)
+        if self._matrix is None:
+            self._matrix = np.asarray(self._vectors, dtype=np.float32)
+        positions = np.asarray(self._positions(where) if where else range(len(self._ids)))
+        results = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        for embedding in query_embeddings:
+            if not len(positions):
+                top, distances = [], []
+            else:
+                query = np.asarray(embedding, dtype=np.float32)
+                candidates = self._matrix[positions]
+                all_distances = ((candidates - query) ** 2).sum(axis=1)
+                k = min(n_results, len(positions))
+                best = np.argpartition(all_distances, k - 1)[:k]
+                best = best[np.argsort(all_distances[best])]
+                top, distances = positions[best], all_distances[best]
+            results['ids'].append([self._ids[p] for p in top])
+            results['documents'].append([self._documents[p] for p in top])
+            results['metadatas'].append([self._metadatas[p] for p in top])
+            results['distances'].append([float(d) for d in distances])
+        return results
@@ -0,0 +1,151 @@
+import importlib.util
+import random
+import time
+
+import numpy as np
+import pytest
+
+from src.embeddings import EmbeddingService
+from src.query_processor import QueryProcessor
+from src.scoring import BatchRelevanceScorer
+from src.vector_store import NumpyVectorStore
+from tests.performance.benchmark import time_calls
+from tests.performance.fakes import FakeOpenAI
+
+QUERIES = [
+    "What does Huberman say about sleep and melatonin?",
+    "How do startups think about money?",
+    "Is DOGE discussed with Lex Fridman?",
+    "Explain the theory of consciousness",
+    "Compare views on artificial intelligence and creativity",
+]
+ANALYSIS = {
+    'query_type': 'factual', 'topics': ['sleep', 'melatonin'],
+    'key_terms': ['sleep', 'melatonin', 'huberman'], 'expected_sources': ['Andrew Huberman']
+}
+
+
+def make_processor(backend, openai_client=None, classifier_mode='local'):
+    return QueryProcessor(
+        backend['collection'],
+        openai_client or FakeOpenAI(),
+        backend['embedding_service'],
+        classifier_mode=classifier_mode,
+        lexical_index=backend['lexical_index']
+    )
+
+
+@pytest.mark.benchmark
+def test_ingestion_throughput(ingested_backend, benchmark_recorder):
+    stats = ingested_backend['stats']
+    seconds = ingested_backend['seconds']
+    assert stats['added'] == ingested_backend['files']
+    assert stats['failed'] == 0
+
+    benchmark_recorder.record('ingest_files_per_s', stats['added'] / seconds, 'files/s', True)
+    benchmark_recorder.record('ingest_chunks_per_s', stats['chunks'] / seconds, 'chunks/s', True)
+
+    # A second sync with nothing changed only stats the files
+    start = time.perf_counter()
+    resync = ingested_backend['ingestor'].sync()
+    assert resync['unchanged'] == ingested_backend['files']
+    benchmark_recorder.record('ingest_noop_sync', (time.perf_counter() - start) * 1000, 'ms')
+
+
+@pytest.mark.benchmark
+def test_scoring_throughput(ingested_backend, benchmark_recorder):
+    page = ingested_backend['collection'].get(limit=2000)
+    documents, metadatas = page['documents'], page['metadatas']
+    distances = [random.random() * 2 for _ in documents]
+    scorer = BatchRelevanceScorer(ANALYSIS)
+
+    durations = time_calls(lambda: scorer.score(documents, metadatas, distances), repeat=5)
+    candidates_per_s = len(documents) / (min(durations) / 1000)
+    benchmark_recorder.record('scoring_candidates_per_s', candidates_per_s, 'candidates/s', True)
+
+
+@pytest.mark.benchmark
+def test_retrieval_latency(ingested_backend, benchmark_recorder):
+    processor = make_processor(ingested_backend)
+    vector_only = make_processor(ingested_backend)
+    vector_only.lexical_index = None
+
+    hybrid = time_calls(
+        lambda: [processor.retrieve_candidates(q, 10) for q in QUERIES], repeat=3
+    )
+    vector = time_calls(
+        lambda: [vector_only.retrieve_candidates(q, 10) for q in QUERIES], repeat=3
+    )
+    lexical = time_calls(
+        lambda: [ingested_backend['lexical_index'].search(q, 10) for q in QUERIES], repeat=3
+    )
+    benchmark_recorder.record_latencies('retrieval_hybrid', [d / len(QUERIES) for d in hybrid])
+    benchmark_recorder.record_latencies('retrieval_vector', [d / len(QUERIES) for d in vector])
+    benchmark_recorder.record_latencies('lexical_search', [d / len(QUERIES) for d in lexical])
+
+
+@pytest.mark.benchmark
+def test_process_query_end_to_end(ingested_backend, benchmark_recorder):
+    # Latencies in the range of the hosted APIs
+    openai_client = FakeOpenAI(embedding_latency=0.01, chat_latency=0.05)
+    backend = dict(ingested_backend, embedding_service=EmbeddingService(openai_client))
+    processor = make_processor(backend, openai_client, classifier_mode='llm')
+
+    durations = []
+    stage_totals = {}
+    for query in QUERIES:
+        start = time.perf_counter()
+        results, analysis = processor.process_query(query, max_results=5)
+        durations.append((time.perf_counter() - start) * 1000)
+        assert results
+        for stage, value in analysis['timings'].items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + value
+
+    benchmark_recorder.record_latencies('process_query', durations)
+    # Analysis and retrieval overlap, so the total is below the sum of the two
+    assert stage_totals['total_ms'] < stage_totals['analysis_ms'] + stage_totals['retrieval_ms']
+
+
+@pytest.mark.benchmark
+def test_vector_store_backends(ingested_backend, benchmark_recorder, tmp_path):
+    """NumPy store variants, and Chroma when installed, searched over the same chunks."""
+    page = ingested_backend['collection'].get(include=['documents', 'metadatas', 'embeddings'])
+    items = (page['ids'], page['documents'], page['metadatas'], page['embeddings'])
+    queries = ingested_backend['embedding_service'].embed_many(QUERIES)
+    exact = ingested_backend['collection'].query(queries, n_results=10)['ids']
+
+    backends = {}
+    for dtype, index in (('float32', 'flat'), ('float16', 'flat'), ('int8', 'flat'),
+                         ('float32', 'ivf')):
+        path = str(tmp_path / f"{dtype}_{index}")
+        writer = NumpyVectorStore(path, dtype=dtype, index=index)
+        writer.upsert(*items)
+        writer.flush()
+        start = time.perf_counter()
+        backends[f"numpy_{dtype}_{index}"] = NumpyVectorStore(path, dtype=dtype, index=index)
+        benchmark_recorder.record(
+            f"vector_store_load_numpy_{dtype}_{index}", (time.perf_counter() - start) * 1000, 'ms'
+        )
+    if importlib.util.find_spec('chromadb') is not None:
+        import chromadb
+        collection = chromadb.EphemeralClient().get_or_create_collection('benchmark_chunks')
+        ids, documents, metadatas, embeddings = items
+        for i in range(0, len(ids), 5000):
+            collection.upsert(
+                ids=ids[i:i + 5000], documents=documents[i:i + 5000],
+                metadatas=metadatas[i:i + 5000], embeddings=np.asarray(embeddings[i:i + 5000])
+            )
+        backends['chroma'] = collection
+
+    for name, store in backends.items():
+        durations = time_calls(
+            lambda: [store.query(query_embeddings=[q], n_results=10) for q in queries], repeat=3
+        )
+        benchmark_recorder.record_latencies(
+            f"vector_store_query_{name}", [d / len(queries) for d in durations]
+        )
+        found = store.query(query_embeddings=queries, n_results=10)['ids']
+        recall = np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, exact)])
+        benchmark_recorder.record(f"vector_store_recall_{name}", float(recall), 'ratio', True)
+        if name == 'numpy_float32_flat':
+            assert recall == 1.0
@@ -1,10 +1,14 @@
 import pytest
 import time
+from src.embeddings import EmbeddingService
 from src.query_processor import QueryProcessor
 
 @pytest.mark.performance
-def test_query_processing_time(mock_chroma_client, mock_openai_client):
-    processor = QueryProcessor(mock_chroma_client, mock_openai_client)
+def test_query_processing_time(mock_chroma_client, mock_openai_client, fake_embedding_client):
+    collection = mock_chroma_client.get_or_create_collection("youtube_transcripts")
+    processor = QueryProcessor(
+        collection, mock_openai_client, EmbeddingService(fake_embedding_client)
+    )
     
     start_time = time.time()
     result = processor.process_query("What is AI?", max_results=5)
@@ -0,0 +1,86 @@
+import importlib.util
+import os
+import sqlite3
+
+import pytest
+
+BACKUP_TOOL = os.path.join(os.path.dirname(__file__), '..', 'data', 'tools', 'backup_chromadb.py')
+
+
+@pytest.fixture(scope='module')
+def backup_tool():
+    spec = importlib.util.spec_from_file_location('backup_chromadb', BACKUP_TOOL)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def store(tmp_path):
+    source = tmp_path / 'chroma_db'
+    (source / 'segment').mkdir(parents=True)
+    (source / 'segment' / 'data_level0.bin').write_bytes(b'\x01' * 4096)
+    (source / 'lexical_index.npz').write_bytes(b'index')
+    db = sqlite3.connect(str(source / 'chroma.sqlite3'))
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("CREATE TABLE embeddings (id TEXT)")
+    db.execute("INSERT INTO embeddings VALUES ('a')")
+    db.commit()
+    yield source, tmp_path / 'backups', db
+    db.close()
+
+
+def count_objects(backup_dir):
+    return sum(
+        len(files) for root, _, files in os.walk(backup_dir / 'objects')
+        if os.path.basename(root) != 'tmp'
+    )
+
+
+def test_incremental_snapshots_reuse_unchanged_files(backup_tool, store):
+    source, backups, db = store
+    first = backup_tool.backup_chromadb(str(source), str(backups))
+    objects = count_objects(backups)
+    assert objects == 3
+
+    db.execute("INSERT INTO embeddings VALUES ('b')")
+    db.commit()
+    second = backup_tool.backup_chromadb(str(source), str(backups), compress=True)
+
+    assert backup_tool.list_snapshots(str(backups)) == sorted([first, second])
+    # Only the changed database is stored again
+    assert count_objects(backups) == objects + 1
+    files = backup_tool.load_snapshot(second, str(backups))['files']
+    assert files['chroma.sqlite3']['sqlite'] and files['chroma.sqlite3']['compressed']
+    assert not any(name.endswith('-wal') for name in files)
+
+
+def test_restore_gives_a_consistent_database(backup_tool, store, tmp_path):
+    source, backups, db = store
+    db.execute("INSERT INTO embeddings VALUES ('b')")
+    db.commit()
+    backup_tool.backup_chromadb(str(source), str(backups), compress=True)
+
+    target = tmp_path / 'restored'
+    target.mkdir()
+    moved = backup_tool.restore_chromadb('latest', str(target), str(backups))
+
+    assert moved and os.path.isdir(moved)
+    # Rows still in the write-ahead log are part of the snapshot
+    restored = sqlite3.connect(str(target / 'chroma.sqlite3'))
+    assert restored.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 2
+    restored.close()
+    assert (target / 'segment' / 'data_level0.bin').read_bytes() == b'\x01' * 4096
+
+
+def test_cleanup_keeps_newest_snapshots_and_collects_objects(backup_tool, store):
+    source, backups, db = store
+    backup_tool.backup_chromadb(str(source), str(backups))
+    (source / 'lexical_index.npz').write_bytes(b'rebuilt index')
+    os.utime(source / 'lexical_index.npz', ns=(1, 1))
+    latest = backup_tool.backup_chromadb(str(source), str(backups))
+
+    backup_tool.cleanup_old_backups(1, str(backups))
+
+    assert backup_tool.list_snapshots(str(backups)) == [latest]
+    assert count_objects(backups) == 3
@@ -0,0 +1,106 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from src.batch_runner import BatchRunner, load_questions
+from src.embeddings import EmbeddingService
+from src.query_processor import QueryProcessor
+from tests.performance.fakes import FakeCollection, FakeOpenAI
+
+DOCUMENTS = [
+    ("Sleep and melatonin with Andrew Huberman", 'Andrew Huberman'),
+    ("Artificial intelligence and consciousness", 'Lex Fridman'),
+    ("Startup fundraising and money", 'Y Combinator'),
+]
+
+
+@pytest.fixture
+def processor():
+    openai_client = FakeOpenAI(answer="Sleep matters.")
+    embedding_service = EmbeddingService(openai_client)
+    collection = FakeCollection()
+    texts = [text for text, _ in DOCUMENTS]
+    collection.upsert(
+        ids=[f"doc-{i}" for i in range(len(texts))],
+        documents=texts,
+        metadatas=[{'title': text, 'channel': channel} for text, channel in DOCUMENTS],
+        embeddings=embedding_service.embed_many(texts)
+    )
+    return QueryProcessor(collection, openai_client, embedding_service, classifier_mode='local')
+
+
+def write_questions(path, questions):
+    path.write_text(''.join(json.dumps(q) + '\n' for q in questions))
+
+
+def read_output(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_batch_answers_deduplicates_and_retrieves_in_bulk(tmp_path, processor):
+    questions_path = tmp_path / 'questions.jsonl'
+    write_questions(questions_path, [
+        {'id': 'q1', 'query': 'What about sleep?', 'max_results': 2},
+        {'id': 'q2', 'query': 'what about   SLEEP?', 'max_results': 2},
+        {'query': 'How do startups raise money?', 'max_results': 2},
+    ])
+    processor.collection.query = Mock(wraps=processor.collection.query)
+
+    stats = BatchRunner(processor, workers=2).run(
+        load_questions(str(questions_path)), str(tmp_path / 'answers.jsonl')
+    )
+
+    assert stats == {'answered': 3, 'failed': 0, 'skipped': 0, 'duplicates': 1}
+    # Both unique queries are searched with a single multi-embedding query
+    assert processor.collection.query.call_count == 1
+    assert len(processor.collection.query.call_args.kwargs['query_embeddings']) == 2
+
+    records = {r['id']: r for r in read_output(tmp_path / 'answers.jsonl')}
+    assert set(records) == {'q1', 'q2', 'line-3'}
+    assert records['q2']['duplicate_of'] == 'q1'
+    assert records['q1']['answer'] == "Sleep matters."
+    assert records['q1']['sources'][0]['channel'] == 'Andrew Huberman'
+    assert {'analysis_ms', 'scoring_ms', 'generation_ms', 'batch_search_ms'} <= set(
+        records['q1']['timings']
+    )
+
+
+def test_batch_run_resumes_after_interruption(tmp_path, processor):
+    questions_path = tmp_path / 'questions.jsonl'
+    write_questions(questions_path, [
+        {'id': 'q1', 'query': 'What about sleep?'},
+        {'id': 'q2', 'query': 'What is consciousness?'},
+    ])
+    output_path = tmp_path / 'answers.jsonl'
+    # q1 was answered and q2 was being written when the run stopped
+    output_path.write_text(
+        json.dumps({'id': 'q1', 'status': 'ok'}) + '\n' + '{"id": "q2", "sta'
+    )
+
+    stats = BatchRunner(processor, generate=False).run(
+        load_questions(str(questions_path)), str(output_path)
+    )
+
+    assert stats['answered'] == 1
+    assert stats['skipped'] == 1
+    lines = output_path.read_text().splitlines()
+    # The cut-short line is terminated and q2 is written after it
+    assert lines[1] == '{"id": "q2", "sta'
+    record = json.loads(lines[2])
+    assert record['id'] == 'q2'
+    assert record['answer'] is None
+
+
+def test_failed_questions_are_recorded_and_retried(tmp_path, processor):
+    questions_path = tmp_path / 'questions.jsonl'
+    write_questions(questions_path, [{'id': 'q1', 'query': 'What about sleep?'}])
+    output_path = tmp_path / 'answers.jsonl'
+    questions = load_questions(str(questions_path))
+
+    processor.embedding_service.embed_many = Mock(side_effect=RuntimeError("API down"))
+    assert BatchRunner(processor).run(questions, str(output_path))['failed'] == 1
+    assert read_output(output_path)[0]['status'] == 'error'
+
+    del processor.embedding_service.embed_many
+    assert BatchRunner(processor).run(questions, str(output_path))['answered'] == 1
@@ -0,0 +1,64 @@
+import json
+import pytest
+from src.chunking import TranscriptChunker, channel_name, make_chunk_id
+from src.transcript_reader import TranscriptReader
+
+
+def make_segments(count, words_per_segment=5):
+    return [
+        {'text': ' '.join(['word'] * words_per_segment), 'start': i * 2.0, 'duration': 2.0}
+        for i in range(count)
+    ]
+
+
+def test_chunk_segments_overlap_and_timestamps():
+    chunker = TranscriptChunker(chunk_tokens=20, stride=10)
+    windows = list(chunker.chunk_segments(make_segments(10)))
+    assert [(w['seg_start'], w['seg_end']) for w in windows] == [(0, 4), (2, 6), (4, 8), (6, 10)]
+    assert windows[1]['start'] == 4.0
+    assert windows[1]['end'] == 12.0
+    assert all(w['token_count'] == 20 for w in windows)
+
+
+def test_chunk_segments_covers_tail():
+    chunker = TranscriptChunker(chunk_tokens=20, stride=20)
+    windows = list(chunker.chunk_segments(make_segments(5)))
+    assert windows[-1]['seg_end'] == 5
+    assert windows[-1]['token_count'] == 5
+
+
+def test_chunk_transcript_metadata():
+    chunker = TranscriptChunker(chunk_tokens=10, stride=5)
+    data = {
+        'metadata': {
+            'channel_name': 'Lex Fridman', 'video_title': 'Episode', 'published_at': '2024-11-11'
+        },
+        'transcript': make_segments(4),
+    }
+    chunks = list(chunker.chunk_transcript(data, 'Lex_Fridman', '2024-11-11_episode.json'))
+    assert chunks[0]['id'] == make_chunk_id('Lex_Fridman_2024-11-11_episode.json', 0)
+    assert chunks[0]['metadata']['channel'] == 'Lex Fridman'
+    assert chunks[0]['metadata']['published_at'] == '2024-11-11'
+    assert chunks[0]['metadata']['end'] == 4.0
+
+
+def test_chunk_reader_falls_back_to_full_text(tmp_path):
+    path = tmp_path / '2024-11-11_episode.json'
+    path.write_text(json.dumps({
+        'metadata': {'channel_name': 'Lex Fridman'},
+        'transcript': [],
+        'full_text': ' '.join(['word'] * 12),
+    }))
+    chunker = TranscriptChunker(chunk_tokens=10, stride=5)
+    chunks = list(chunker.chunk_reader(TranscriptReader(str(path)), 'Lex_Fridman', path.name))
+    assert chunks and chunks[0]['document'].startswith('word word')
+
+
+def test_channel_name_falls_back_to_the_directory():
+    assert channel_name('The_Diary_Of_A_CEO') == 'The Diary Of A CEO'
+    assert channel_name('Huberman_Lab', {'channel_name': 'Andrew Huberman'}) == 'Andrew Huberman'
+
+
+def test_invalid_stride():
+    with pytest.raises(ValueError):
+        TranscriptChunker(chunk_tokens=10, stride=20)
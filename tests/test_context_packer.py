@@ -0,0 +1,85 @@
+from src.context_packer import ContextPacker, count_tokens, split_sentences, stitch_passages
+
+
+def result(text, score, **metadata):
+    metadata.setdefault('title', 'Episode')
+    metadata.setdefault('channel', 'Lex Fridman')
+    return {'content': text, 'metadata': metadata, 'relevance_score': score}
+
+
+def test_split_sentences_handles_unpunctuated_text():
+    assert split_sentences("One. Two! Three?") == ['One.', 'Two!', 'Three?']
+    words = ' '.join(['word'] * 100)
+    assert [len(s.split()) for s in split_sentences(words)] == [30, 30, 30, 10]
+
+
+def test_pack_orders_by_relevance_and_skips_duplicates():
+    packed = ContextPacker().pack("sleep", [
+        result("Low scoring passage about food.", 0.2),
+        result("Sleep is vital for memory.", 0.9),
+        result("Sleep  is vital for memory.", 0.8),
+    ])
+    assert [p['text'] for p in packed['passages']] == [
+        "Sleep is vital for memory.", "Low scoring passage about food."
+    ]
+    assert packed['dropped'] == 1
+    assert packed['context'].startswith("[1] Episode | Lex Fridman")
+
+
+def test_pack_removes_overlap_between_chunks_of_an_episode():
+    first = "a b c d e f g h"
+    second = "f g h i j k"
+    packed = ContextPacker().pack("query", [
+        result(first, 0.9, episode_id='ep', seg_start=0, seg_end=8),
+        result(second, 0.8, episode_id='ep', seg_start=5, seg_end=11),
+        result("c d e", 0.7, episode_id='ep', seg_start=2, seg_end=5),
+    ])
+    assert [p['text'] for p in packed['passages']] == [first, "i j k"]
+
+
+def test_pack_keeps_overlap_with_the_trimmed_part_of_a_passage():
+    closing = [f"Closing remark number {i}." for i in range(40)]
+    first = "Creatine improves cognition in older adults. " + ' '.join(closing)
+    second = ' '.join(closing[35:]) + " Sponsors follow."
+    packer = ContextPacker(token_budget=400, max_passage_tokens=50, min_passage_tokens=5)
+    packed = packer.pack("creatine cognition", [
+        result(first, 0.9, episode_id='ep', seg_start=0, seg_end=41),
+        result(second, 0.8, episode_id='ep', seg_start=35, seg_end=41),
+    ])
+
+    trimmed, kept = [p['text'] for p in packed['passages']]
+    assert trimmed.startswith("Creatine") and "number 35." not in trimmed
+    assert kept == second
+
+
+def test_pack_trims_long_passages_to_relevant_sentences():
+    intro = ' '.join(f"Welcome back everyone number {i}." for i in range(40))
+    text = intro + " Creatine improves cognition in older adults. Thanks for listening."
+    packer = ContextPacker(token_budget=200, max_passage_tokens=50, min_passage_tokens=5)
+    packed = packer.pack("does creatine help cognition", [result(text, 0.9)])
+
+    passage = packed['passages'][0]['text']
+    assert "Creatine improves cognition in older adults." in passage
+    assert count_tokens(passage) <= 50
+    assert passage.endswith('.')
+
+
+def test_pack_trims_to_content_terms_rather_than_stopwords():
+    chatter = "What do you think about how it is for them and what they do with it?"
+    text = (' '.join([chatter] * 12)
+            + " Magnesium glycinate improves sleep quality. " + ' '.join([chatter] * 12))
+    packer = ContextPacker(token_budget=200, max_passage_tokens=60, min_passage_tokens=5)
+    packed = packer.pack("what do you think about magnesium and sleep", [result(text, 0.9)])
+
+    assert "Magnesium glycinate improves sleep quality." in packed['passages'][0]['text']
+
+
+def test_pack_respects_token_budget():
+    results = [result(f"Passage {i}. " + "filler words here. " * 40, 1 - i / 10) for i in range(10)]
+    packed = ContextPacker(token_budget=300, max_passage_tokens=120).pack("filler", results)
+    assert sum(p['tokens'] for p in packed['passages']) <= 300
+    assert 0 < len(packed['passages']) < 10
+
+
+def test_stitch_passages_drops_repeated_words():
+    assert stitch_passages(["a b c d", "c d e f", "f g"]) == "a b c d e f g"
@@ -0,0 +1,38 @@
+import pytest
+from src.embeddings import EmbeddingCache, EmbeddingService
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def test_embed_many_batches_and_deduplicates(fake_embedding_client):
+    service = EmbeddingService(fake_embedding_client, batch_size=2, max_concurrency=2)
+    vectors = service.embed_many(['a', 'b', 'a', 'c'])
+    assert vectors[0] == vectors[2] == fake_embedding_client.vector('a')
+    assert sorted(len(call) for call in fake_embedding_client.calls) == [1, 2]
+
+
+def test_disk_cache_avoids_api_calls(fake_embedding_client, tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    EmbeddingService(fake_embedding_client, cache=EmbeddingCache(path)).embed_many(['a', 'b'])
+    calls = len(fake_embedding_client.calls)
+
+    service = EmbeddingService(fake_embedding_client, cache=EmbeddingCache(path))
+    vector = service.embed('b')
+    assert service.api_requests == 0
+    assert len(fake_embedding_client.calls) == calls
+    assert vector == pytest.approx(fake_embedding_client.vector('b'))
+
+
+def test_rate_limit_retries(fake_embedding_client):
+    fake_embedding_client.fail_with = [RateLimited(), RateLimited()]
+    service = EmbeddingService(fake_embedding_client, backoff_base=0)
+    assert service.embed('a') == fake_embedding_client.vector('a')
+    assert service.api_requests == 3
+
+
+def test_other_errors_are_raised(fake_embedding_client):
+    fake_embedding_client.fail_with = [ValueError('bad input')]
+    with pytest.raises(ValueError):
+        EmbeddingService(fake_embedding_client, backoff_base=0).embed('a')
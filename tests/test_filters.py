@@ -0,0 +1,27 @@
+from datetime import date
+from src.filters import build_where_filter, date_to_int
+
+
+def test_date_to_int():
+    assert date_to_int(date(2024, 11, 11)) == 20241111
+    assert date_to_int('2024-11-11T10:00:00Z') == 20241111
+    assert date_to_int('Unknown Date') is None
+
+
+def test_where_filter_excludes_deselected_channels_only():
+    where = build_where_filter({'Lex Fridman': True, 'Andrew Huberman': False})
+    assert where == {'channel': {'$nin': ['Andrew Huberman']}}
+    assert build_where_filter({'Lex Fridman': True}) is None
+
+
+def test_where_filter_combines_channels_and_dates():
+    where = build_where_filter({'Lex Fridman': False}, (date(2024, 1, 1), date(2024, 12, 31)))
+    assert where == {'$and': [
+        {'channel': {'$nin': ['Lex Fridman']}},
+        {'published_at_int': {'$gte': 20240101}},
+        {'published_at_int': {'$lte': 20241231}},
+    ]}
+
+
+def test_where_filter_partial_date_range():
+    assert build_where_filter(None, (date(2024, 1, 1),)) == {'published_at_int': {'$gte': 20240101}}
@@ -0,0 +1,142 @@
+import json
+import time
+
+from src.embeddings import EmbeddingService
+from src.ingest_manifest import IngestManifest
+from src.ingest_worker import SYNC_JOB, IngestWorker, JobQueue, WriterLock
+from src.ingestion import TranscriptIngestor
+from tests.performance.fakes import FakeCollection, FakeOpenAI
+
+
+def write_transcript(base, channel, filename, text='hello world ' * 50):
+    path = base / channel / filename
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        'metadata': {'channel_name': channel},
+        'transcript': [{'text': text, 'start': 0.0, 'duration': 1.0}],
+        'full_text': text,
+    }), encoding='utf-8')
+    return path
+
+
+def make_worker(tmp_path, base, collection, **kwargs):
+    embedding_service = EmbeddingService(FakeOpenAI())
+    manifest_path = str(tmp_path / 'manifest.json')
+
+    def ingestor_factory():
+        return TranscriptIngestor(
+            collection, str(base), IngestManifest(manifest_path),
+            embedding_service=embedding_service
+        )
+
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'))
+    lock = WriterLock(str(tmp_path / 'ingest.lock'))
+    return IngestWorker(ingestor_factory, queue, lock, progress_interval=0, **kwargs)
+
+
+def test_queued_jobs_are_coalesced_and_claimed_once(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'))
+
+    first = queue.enqueue(SYNC_JOB)
+    assert queue.enqueue(SYNC_JOB) == first
+    job = queue.claim('worker-a')
+
+    assert job['id'] == first and job['status'] == 'running' and job['attempts'] == 1
+    assert queue.claim('worker-b') is None
+    # A sync requested while one runs is queued behind it
+    assert queue.enqueue(SYNC_JOB) != first
+    # Jobs survive the process: a new handle sees them
+    reopened = JobQueue(str(tmp_path / 'jobs.sqlite3'))
+    assert reopened.pending() == 2
+    assert reopened.requeue_running() == 1
+
+
+def test_writer_lock_admits_a_single_holder(tmp_path):
+    path = str(tmp_path / 'ingest.lock')
+    first, second = WriterLock(path), WriterLock(path)
+
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_worker_syncs_in_background_and_reports_progress(tmp_path):
+    base = tmp_path / 'transcripts'
+    for i in range(3):
+        write_transcript(base, 'Lex_Fridman', f'2024-01-0{i + 1}_episode.json')
+    collection = FakeCollection()
+    worker = make_worker(tmp_path, base, collection, poll_interval=0.01)
+    job_id = worker.queue.enqueue(SYNC_JOB)
+
+    worker.start()
+    deadline = time.monotonic() + 5
+    while worker.queue.get(job_id)['status'] != 'done' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    worker.stop(timeout=5)
+
+    job = worker.queue.get(job_id)
+    assert job['status'] == 'done'
+    assert job['result']['added'] == 3 and job['result']['failed_files'] == []
+    assert job['result']['generation'] >= 1
+    assert job['progress']['files_done'] == job['progress']['files_total'] == 3
+    assert job['progress']['files_per_s'] > 0
+    assert collection.count() > 0
+    assert not worker.running and not worker.lock.held
+
+
+def test_failed_files_are_retried_with_backoff(tmp_path):
+    base = tmp_path / 'transcripts'
+    write_transcript(base, 'Lex_Fridman', '2024-01-01_good.json')
+    bad = base / 'Lex_Fridman' / '2024-01-02_bad.json'
+    bad.write_text('{not json', encoding='utf-8')
+    worker = make_worker(tmp_path, base, FakeCollection(), max_attempts=2, retry_delay=60)
+    job_id = worker.queue.enqueue(SYNC_JOB)
+
+    assert worker.run_pending()
+    job = worker.queue.get(job_id)
+    assert job['status'] == 'queued' and job['not_before'] > time.time() + 30
+    assert job['result']['failed_files'] == [str(bad)]
+    # Not due yet
+    assert not worker.run_pending()
+
+    write_transcript(base, 'Lex_Fridman', '2024-01-02_bad.json')
+    worker.queue.retry(job_id, delay=0, result=job['result'])
+    assert worker.run_pending()
+    job = worker.queue.get(job_id)
+    assert job['status'] == 'done' and job['attempts'] == 2
+    assert job['result']['added'] == 1 and job['result']['failed'] == 0
+
+
+def test_only_the_lock_holder_runs_jobs(tmp_path):
+    base = tmp_path / 'transcripts'
+    write_transcript(base, 'Lex_Fridman', '2024-01-01_episode.json')
+    worker = make_worker(tmp_path, base, FakeCollection())
+    other = WriterLock(str(tmp_path / 'ingest.lock'))
+    worker.queue.enqueue(SYNC_JOB)
+
+    assert other.acquire()
+    assert not worker.run_pending()
+    other.release()
+    assert worker.run_pending()
+    # The lock is only held while a job runs
+    assert not worker.lock.held and other.acquire()
+    other.release()
+
+
+def test_wait_returns_once_a_job_run_ends(tmp_path):
+    base = tmp_path / 'transcripts'
+    write_transcript(base, 'Lex_Fridman', '2024-01-01_episode.json')
+    worker = make_worker(tmp_path, base, FakeCollection(), poll_interval=0.01)
+    job_id = worker.queue.enqueue(SYNC_JOB)
+
+    worker.start()
+    job = worker.queue.wait(job_id, timeout=5, poll_interval=0.01)
+    worker.stop(timeout=5)
+
+    assert job['status'] == 'done' and job['result']['added'] == 1
+    # A retry waiting for its delay is made due by a new request
+    worker.queue.retry(job_id, delay=60)
+    assert worker.queue.enqueue(SYNC_JOB) == job_id
+    assert worker.queue.claim('worker')['id'] == job_id
@@ -0,0 +1,243 @@
+import json
+import os
+import pytest
+from src.chunking import CHUNK_SCHEMA_VERSION, TranscriptChunker
+from src.embeddings import DEFAULT_EMBEDDING_MODEL, EmbeddingService
+from src.ingest_manifest import IngestManifest
+from src import ingestion
+from src.ingestion import TranscriptIngestor
+from src.lexical_index import LexicalIndex
+from tests.performance.fakes import FakeCollection, FakeOpenAI
+
+
+class InMemoryCollection:
+    def __init__(self):
+        self.records = {}
+        self.upsert_calls = 0
+
+    def upsert(self, documents, metadatas, ids):
+        self.upsert_calls += 1
+        for doc, meta, id_ in zip(documents, metadatas, ids):
+            self.records[id_] = (doc, meta)
+
+    def delete(self, ids):
+        for id_ in ids:
+            self.records.pop(id_, None)
+
+    def count(self):
+        return len(self.records)
+
+    def get(self, include=None, limit=None, offset=0):
+        ids = sorted(self.records)[offset:offset + limit if limit else None]
+        return {'ids': ids, 'documents': [self.records[i][0] for i in ids]}
+
+
+def write_transcript(path, words):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'metadata': {'channel_name': 'Lex Fridman', 'published_at': '2024-11-11'},
+            'transcript': [{'text': w, 'start': i, 'duration': 1} for i, w in enumerate(words)]
+        }, f)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    base = tmp_path / 'transcripts'
+    write_transcript(str(base / 'Lex_Fridman' / '2024-11-11_a.json'), ['alpha'] * 8)
+    write_transcript(str(base / 'Lex_Fridman' / '2024-11-12_b.json'), ['beta'] * 8)
+    return base
+
+
+def make_ingestor(collection, base, tmp_path):
+    manifest = IngestManifest(str(tmp_path / 'manifest.json'))
+    return TranscriptIngestor(collection, str(base), manifest, TranscriptChunker(4, 4))
+
+
+def test_sync_skips_unchanged_files(corpus, tmp_path):
+    collection = InMemoryCollection()
+    stats = make_ingestor(collection, corpus, tmp_path).sync()
+    assert stats['added'] == 2
+    assert len(collection.records) == 4
+
+    calls = collection.upsert_calls
+    stats = make_ingestor(collection, corpus, tmp_path).sync()
+    assert stats['unchanged'] == 2
+    assert collection.upsert_calls == calls
+
+
+def test_sync_updates_and_removes(corpus, tmp_path):
+    collection = InMemoryCollection()
+    make_ingestor(collection, corpus, tmp_path).sync()
+
+    write_transcript(str(corpus / 'Lex_Fridman' / '2024-11-11_a.json'), ['gamma'] * 4)
+    os.remove(corpus / 'Lex_Fridman' / '2024-11-12_b.json')
+    stats = make_ingestor(collection, corpus, tmp_path).sync()
+
+    assert stats['updated'] == 1
+    assert stats['removed'] == 1
+    assert [doc for doc, _ in collection.records.values()] == ['gamma gamma gamma gamma']
+    assert IngestManifest(str(tmp_path / 'manifest.json')).generation == 2
+
+
+def test_schema_rebuild_is_not_repeated_for_a_failed_file(corpus, tmp_path, monkeypatch):
+    collection = InMemoryCollection()
+    make_ingestor(collection, corpus, tmp_path).sync()
+    manifest = IngestManifest(str(tmp_path / 'manifest.json'))
+    manifest.schema_version = CHUNK_SCHEMA_VERSION - 1
+    manifest.save()
+    chunk_file = ingestion.chunk_file
+
+    def fail_on_b(file_path, *args):
+        if file_path.endswith('_b.json'):
+            raise ValueError("malformed transcript")
+        return chunk_file(file_path, *args)
+
+    monkeypatch.setattr(ingestion, 'chunk_file', fail_on_b)
+    stats = make_ingestor(collection, corpus, tmp_path).sync()
+    assert stats['updated'] == 1 and stats['failed'] == 1
+    assert IngestManifest(str(tmp_path / 'manifest.json')).schema_version == CHUNK_SCHEMA_VERSION
+
+    # Only the failed file is read again
+    monkeypatch.setattr(ingestion, 'chunk_file', chunk_file)
+    stats = make_ingestor(collection, corpus, tmp_path).sync()
+    assert stats['unchanged'] == 1 and stats['updated'] == 1 and stats['failed'] == 0
+    assert len(collection.records) == 4
+
+
+def test_reloading_an_unreadable_manifest_starts_from_scratch(tmp_path):
+    path = tmp_path / 'manifest.json'
+    manifest = IngestManifest(str(path))
+    manifest.schema_version = CHUNK_SCHEMA_VERSION
+    manifest.embedding = {'model': DEFAULT_EMBEDDING_MODEL, 'dimensions': 16}
+    manifest.layout = {'vector_store': 'numpy', 'shard_by': ''}
+    manifest.save()
+    path.write_text(path.read_text()[:-10], encoding='utf-8')
+
+    manifest.load()
+
+    assert manifest.schema_version == 0
+    assert manifest.embedding is None and manifest.layout is None and manifest.files == {}
+
+
+def test_sync_in_process_pool(corpus, tmp_path):
+    collection = InMemoryCollection()
+    manifest = IngestManifest(str(tmp_path / 'manifest.json'))
+    ingestor = TranscriptIngestor(
+        collection, str(corpus), manifest, TranscriptChunker(4, 4), process_pool_threshold=1
+    )
+    assert ingestor.sync()['added'] == 2
+    assert len(collection.records) == 4
+
+
+def test_sync_maintains_lexical_index(corpus, tmp_path):
+    collection = InMemoryCollection()
+    index_path = str(tmp_path / 'lexical.npz')
+
+    def sync():
+        manifest = IngestManifest(str(tmp_path / 'manifest.json'))
+        lexical_index = LexicalIndex.load(index_path)
+        TranscriptIngestor(
+            collection, str(corpus), manifest, TranscriptChunker(4, 4), lexical_index=lexical_index
+        ).sync()
+        return LexicalIndex.load(index_path)
+
+    index = sync()
+    assert len(index) == 4
+    assert index.search("beta")
+
+    write_transcript(str(corpus / 'Lex_Fridman' / '2024-11-12_b.json'), ['gamma'] * 4)
+    index = sync()
+    assert index.search("beta") == []
+    assert [doc_id for doc_id, _ in index.search("gamma")] == [
+        'Lex_Fridman_2024-11-12_b.json::00000'
+    ]
+
+    # A lost index is rebuilt from the collection
+    os.remove(index_path)
+    index = sync()
+    assert len(index) == len(collection.records)
+
+
+def test_lexical_rebuild_keeps_serving_the_previous_index(corpus, tmp_path):
+    collection = InMemoryCollection()
+    make_ingestor(collection, corpus, tmp_path).sync()
+    lexical_index = LexicalIndex()
+    lexical_index.add(list(collection.records), [doc for doc, _ in collection.records.values()])
+    lexical_index.commit()
+    seen = []
+    get = collection.get
+
+    def get_while_searching(**kwargs):
+        seen.append(len(lexical_index.search("alpha beta")))
+        return get(**kwargs)
+
+    collection.get = get_while_searching
+    ingestor = make_ingestor(collection, corpus, tmp_path)
+    ingestor.lexical_index = lexical_index
+    ingestor.rebuild_lexical_index(page_size=1)
+
+    assert seen == [4] * 5
+    assert len(lexical_index) == 4 and len(lexical_index.search("alpha beta")) == 4
+
+
+def test_sync_reingests_everything_when_the_store_layout_changes(corpus, tmp_path):
+    chroma, numpy_store = InMemoryCollection(), InMemoryCollection()
+    manifest_path = str(tmp_path / 'manifest.json')
+
+    def sync(collection, layout, reset_collection=None):
+        return TranscriptIngestor(
+            collection, str(corpus), IngestManifest(manifest_path), TranscriptChunker(4, 4),
+            reset_collection=reset_collection, layout=layout
+        ).sync()
+
+    assert sync(chroma, {'vector_store': 'chroma', 'shard_by': ''})['added'] == 2
+    assert IngestManifest(manifest_path).layout == {'vector_store': 'chroma', 'shard_by': ''}
+    numpy_store.records['stale'] = ('left from an earlier run', {})
+
+    def reset_numpy_store():
+        numpy_store.records.clear()
+        return numpy_store
+
+    stats = sync(numpy_store, {'vector_store': 'numpy', 'shard_by': ''}, reset_numpy_store)
+    assert stats['added'] == 2 and stats['unchanged'] == 0
+    assert sorted(numpy_store.records) == sorted(chroma.records)
+
+    # A manifest from before layouts were recorded, next to an empty collection
+    manifest = IngestManifest(manifest_path)
+    manifest.layout = None
+    manifest.save()
+    assert sync(InMemoryCollection(), {'vector_store': 'chroma', 'shard_by': ''})['added'] == 2
+
+
+def test_collection_with_other_embedding_dimension_is_recreated(corpus, tmp_path):
+    legacy = FakeCollection()
+    # Whole-episode document embedded by Chroma's default 384-dim function
+    legacy.upsert(
+        ['Lex_Fridman_2024-11-11_a.json'], ['alpha ' * 8], [{'channel': 'Lex Fridman'}],
+        [[0.1] * 384]
+    )
+    manifest = IngestManifest(str(tmp_path / 'manifest.json'))
+    path = corpus / 'Lex_Fridman' / '2024-11-11_a.json'
+    manifest.record('Lex_Fridman/2024-11-11_a.json', str(path), os.stat(path), 'x', [])
+    recreated = FakeCollection()
+    ingestor = TranscriptIngestor(
+        legacy, str(corpus), manifest, TranscriptChunker(4, 4),
+        embedding_service=EmbeddingService(FakeOpenAI(dimensions=16)),
+        reset_collection=lambda: recreated
+    )
+
+    stats = ingestor.sync()
+
+    assert stats['added'] == 2 and stats['failed'] == 0
+    assert ingestor.collection is recreated and recreated.count() == 4
+    assert IngestManifest(str(tmp_path / 'manifest.json')).embedding == {
+        'model': DEFAULT_EMBEDDING_MODEL, 'dimensions': 16
+    }
+    # Once recorded, the model is not probed again
+    openai_client = FakeOpenAI(dimensions=16)
+    stats = TranscriptIngestor(
+        recreated, str(corpus), IngestManifest(str(tmp_path / 'manifest.json')),
+        TranscriptChunker(4, 4), embedding_service=EmbeddingService(openai_client)
+    ).sync()
+    assert stats['unchanged'] == 2 and openai_client.embedding_requests == 0
@@ -0,0 +1,55 @@
+from src.lexical_index import LexicalIndex, tokenize
+
+
+def build_index(path=None):
+    index = LexicalIndex(path)
+    index.add(
+        ['a', 'b', 'c'],
+        ['DOGE wants to cut spending', 'Claude is an AI model', 'doge the meme, doge the coin']
+    )
+    index.commit()
+    return index
+
+
+def test_tokenize_keeps_acronyms_and_numbers():
+    assert tokenize("GPT-4 and DOGE's plan") == ['gpt', '4', 'and', 'doge', 's', 'plan']
+
+
+def test_search_ranks_by_bm25():
+    index = build_index()
+    hits = index.search("doge")
+    assert [doc_id for doc_id, _ in hits] == ['c', 'a']
+    assert hits[0][1] > hits[1][1] > 0
+    assert index.search("claude")[0][0] == 'b'
+    assert index.search("unknown term") == []
+
+
+def test_replace_and_remove():
+    index = build_index()
+    index.add(['b'], ['nothing about models'])
+    index.remove(['c'])
+    index.commit()
+
+    assert len(index) == 2
+    assert index.search("claude") == []
+    assert index.search("doge") == [('a', index.search("doge")[0][1])]
+    assert index.search("models")[0][0] == 'b'
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    path = str(tmp_path / 'lexical.npz')
+    index = build_index(path)
+    index.generation = 3
+    index.save()
+
+    loaded = LexicalIndex.load(path)
+    assert loaded.generation == 3
+    assert len(loaded) == 3
+    assert loaded.search("doge the coin") == index.search("doge the coin")
+
+
+def test_load_missing_or_corrupt_file_is_empty(tmp_path):
+    path = tmp_path / 'lexical.npz'
+    assert len(LexicalIndex.load(str(path))) == 0
+    path.write_bytes(b'not an index')
+    assert len(LexicalIndex.load(str(path))) == 0
@@ -0,0 +1,54 @@
+import time
+from src.query_cache import QueryCache
+
+CONTROLS = {'max_sources': 5, 'podcast_sources': {'Lex Fridman': True}}
+
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = QueryCache()
+    cache.put("What is AI?", CONTROLS, 'answer')
+    assert cache.get("  what is   AI", CONTROLS) == 'answer'
+    assert cache.get("What is AI?", {'max_sources': 3}) is None
+    assert cache.stats()['exact_hits'] == 1
+
+
+def test_semantic_hit_within_distance():
+    cache = QueryCache(semantic_distance=0.05)
+    cache.put("What is AI?", CONTROLS, 'answer', embedding=[1.0, 0.0])
+    assert cache.get("Explain AI", CONTROLS, embedding=[0.99, 0.05]) == 'answer'
+    assert cache.get("Explain sleep", CONTROLS, embedding=lambda: [0.0, 1.0]) is None
+    stats = cache.stats()
+    assert stats['semantic_hits'] == 1
+    assert stats['misses'] == 1
+
+
+def test_embedding_callable_not_called_on_exact_hit():
+    cache = QueryCache()
+    cache.put("What is AI?", CONTROLS, 'answer', embedding=[1.0, 0.0])
+
+    def fail():
+        raise AssertionError("embedding should not be computed")
+
+    assert cache.get("What is AI?", CONTROLS, embedding=fail) == 'answer'
+
+
+def test_lru_eviction_and_ttl():
+    cache = QueryCache(max_entries=2, ttl_seconds=0.05)
+    cache.put("a", CONTROLS, 1)
+    cache.put("b", CONTROLS, 2)
+    cache.get("a", CONTROLS)
+    cache.put("c", CONTROLS, 3)
+    assert cache.get("b", CONTROLS) is None
+    assert cache.get("a", CONTROLS) == 1
+    time.sleep(0.06)
+    assert cache.get("a", CONTROLS) is None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_generation_change_invalidates():
+    cache = QueryCache(generation=1)
+    cache.put("a", CONTROLS, 1)
+    cache.set_generation(1)
+    assert cache.get("a", CONTROLS) == 1
+    cache.set_generation(2)
+    assert cache.get("a", CONTROLS) is None
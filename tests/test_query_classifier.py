@@ -0,0 +1,70 @@
+import time
+import pytest
+from src.query_classifier import ClassificationLog, RuleBasedQueryClassifier, decompose_query
+
+
+@pytest.mark.parametrize('query,expected', [
+    ("What does Lex Fridman think about AI?", 'opinion'),
+    ("How do Huberman and Lex Fridman differ on sleep?", 'comparison'),
+    ("How can I improve my sleep routine?", 'procedural'),
+    ("Why do we dream?", 'conceptual'),
+    ("Who is Dario Amodei?", 'factual'),
+])
+def test_rule_classifier_query_types(query, expected):
+    analysis, confidence = RuleBasedQueryClassifier().classify(query)
+    assert analysis['query_type'] == expected
+    assert confidence >= 0.75
+
+
+def test_rule_classifier_schema_and_terms():
+    analysis, _ = RuleBasedQueryClassifier().classify(
+        "What does Lex Fridman say about DOGE recently?"
+    )
+    assert 'lex fridman' in analysis['topics']
+    assert 'doge' in analysis['key_terms']
+    assert analysis['expected_sources'] == ['Lex Fridman']
+    assert analysis['time_relevance'] == 'recent_only'
+
+
+def test_rule_classifier_is_fast():
+    classifier = RuleBasedQueryClassifier()
+    start = time.perf_counter()
+    for _ in range(100):
+        classifier.classify("How do Huberman and Lex Fridman differ on sleep?")
+    assert (time.perf_counter() - start) / 100 < 0.001
+
+
+def test_classification_log_roundtrip(tmp_path):
+    log = ClassificationLog(str(tmp_path / 'log.jsonl'))
+    log.append("Why do we dream?", {'query_type': 'conceptual', 'topics': ['dreams']})
+    assert log.read()[0]['query_type'] == 'conceptual'
+
+
+@pytest.mark.parametrize('query,expected', [
+    ("How do Huberman and Lex Fridman differ on sleep?",
+     ['Lex Fridman sleep', 'Andrew Huberman sleep']),
+    ("Compare intermittent fasting and keto diets", ['intermittent fasting', 'keto diets']),
+    ("What do guests say about sleep, caffeine and exercise?", ['sleep', 'caffeine', 'exercise']),
+    ("What is consciousness?", []),
+])
+def test_decompose_query(query, expected):
+    analysis, _ = RuleBasedQueryClassifier().classify(query)
+    assert decompose_query(query, analysis) == expected
+
+
+@pytest.mark.parametrize('query,subject', [
+    ("What did Bernie Sanders say about healthcare and education?", ['bernie', 'sanders']),
+    ("How does caffeine affect sleep and focus?", ['caffeine']),
+    ("Did Elon Musk talk about Mars, Tesla and Neuralink?", ['elon', 'musk']),
+])
+def test_sub_queries_keep_the_subject_of_the_question(query, subject):
+    analysis, _ = RuleBasedQueryClassifier().classify(query)
+    sub_queries = decompose_query(query, analysis)
+    assert len(sub_queries) >= 2
+    assert all(set(subject) <= set(sub_query.split()) for sub_query in sub_queries)
+
+
+def test_single_subject_questions_are_not_split():
+    for query in ("Who is Lex Fridman and what does he do?", "What is sleep and why?"):
+        analysis, _ = RuleBasedQueryClassifier().classify(query)
+        assert decompose_query(query, analysis) == []
@@ -1,6 +1,10 @@
+import time
 import pytest
+from unittest.mock import Mock
+from src.embeddings import EmbeddingService
 from src.query_processor import QueryProcessor
 
+
 def test_detect_query_type(mock_openai_client):
     processor = QueryProcessor(None, mock_openai_client)
     query = "What does Lex Fridman say about AI?"
@@ -9,12 +13,14 @@ def test_detect_query_type(mock_openai_client):
     assert 'query_type' in result
     assert 'topics' in result
 
+
 def test_calculate_temporal_relevance():
     processor = QueryProcessor(None, None)
     metadata = {'published_at': '2024-01-01'}
     score = processor.calculate_temporal_relevance(metadata)
     assert 0 <= score <= 1
 
+
 def test_calculate_content_relevance():
     processor = QueryProcessor(None, None)
     text = "AI and consciousness discussion"
@@ -25,4 +31,297 @@ def test_calculate_content_relevance():
         'key_terms': ['AI', 'consciousness']
     }
     score = processor.calculate_content_relevance(text, metadata, query_analysis)
-    assert 0 <= score <= 1
\ No newline at end of file
+    assert 0 <= score <= 1
+
+
+def make_collection():
+    collection = Mock()
+    collection.query.return_value = {
+        'documents': [['AI and consciousness discussion']],
+        'metadatas': [[{'title': 'AI Ethics', 'channel': 'Lex Fridman'}]],
+        'distances': [[0.3]]
+    }
+    return collection
+
+
+def test_process_query_runs_analysis_and_retrieval_concurrently(
+    mock_openai_client, fake_embedding_client
+):
+    def slow(result):
+        def call(*args, **kwargs):
+            time.sleep(0.2)
+            return result
+        return call
+
+    completion = mock_openai_client.chat.completions.create.return_value
+    mock_openai_client.chat.completions.create.side_effect = slow(completion)
+    collection = make_collection()
+    collection.query.side_effect = slow(collection.query.return_value)
+    processor = QueryProcessor(
+        collection, mock_openai_client, EmbeddingService(fake_embedding_client)
+    )
+
+    start = time.perf_counter()
+    results, analysis = processor.process_query("What is AI?", max_results=5)
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == 1
+    assert elapsed < 0.35
+    assert {
+        'analysis_ms', 'retrieval_ms', 'embedding_ms', 'search_ms', 'scoring_ms', 'total_ms'
+    } <= set(analysis['timings'])
+
+
+def test_process_query_sequential(mock_openai_client, fake_embedding_client):
+    processor = QueryProcessor(
+        make_collection(), mock_openai_client, EmbeddingService(fake_embedding_client)
+    )
+    results, analysis = processor.process_query("What is AI?", parallel=False)
+    assert results[0]['metadata']['title'] == 'AI Ethics'
+    assert analysis['results_found'] == 1
+
+
+def test_generate_response_stream_yields_tokens(mock_openai_client):
+    def chunk(content):
+        return Mock(choices=[Mock(delta=Mock(content=content))])
+
+    mock_openai_client.chat.completions.create.return_value = iter(
+        [chunk('Hello'), chunk(None), chunk(' world')]
+    )
+    processor = QueryProcessor(None, mock_openai_client)
+    analysis = {}
+    result = {'content': 'AI discussion', 'metadata': {'title': 'AI'}, 'relevance_score': 0.8}
+    tokens = list(processor.generate_response_stream("What is AI?", [result], analysis))
+
+    assert tokens == ['Hello', ' world']
+    assert mock_openai_client.chat.completions.create.call_args.kwargs['stream'] is True
+    assert analysis['timings']['first_token_ms'] <= analysis['timings']['generation_ms']
+
+
+def test_hybrid_mode_skips_llm_when_confident(mock_openai_client):
+    processor = QueryProcessor(None, mock_openai_client, classifier_mode='hybrid')
+    analysis = processor.detect_query_type("How do Huberman and Lex Fridman differ on sleep?")
+    assert analysis['query_type'] == 'comparison'
+    assert analysis['classifier'] == 'local'
+    mock_openai_client.chat.completions.create.assert_not_called()
+
+
+def test_hybrid_mode_escalates_when_unsure(mock_openai_client):
+    processor = QueryProcessor(None, mock_openai_client, classifier_mode='hybrid')
+    analysis = processor.detect_query_type("sleep")
+    assert analysis['topics'] == ['AI']
+    mock_openai_client.chat.completions.create.assert_called_once()
+
+
+def test_process_query_pushes_filters_into_collection(mock_openai_client, fake_embedding_client):
+    collection = make_collection()
+    processor = QueryProcessor(
+        collection, mock_openai_client, EmbeddingService(fake_embedding_client)
+    )
+    processor.process_query("What is AI?", channels={'Lex Fridman': True, 'Andrew Huberman': False})
+    assert collection.query.call_args.kwargs['where'] == {'channel': {'$nin': ['Andrew Huberman']}}
+
+
+def test_retrieval_fuses_lexical_hits(mock_openai_client, fake_embedding_client):
+    from src.lexical_index import LexicalIndex
+
+    collection = make_collection()
+    collection.query.return_value['ids'] = [['vector-hit']]
+    collection.get.return_value = {
+        'ids': ['lexical-hit'],
+        'documents': ['DOGE budget cuts'],
+        'metadatas': [{'title': 'Policy', 'channel': 'Lex Fridman'}],
+        'embeddings': [[0.0] * 8]
+    }
+    index = LexicalIndex()
+    index.add(['lexical-hit', 'other'], ['DOGE budget cuts', 'unrelated chatter'])
+    index.commit()
+    processor = QueryProcessor(
+        collection, mock_openai_client, EmbeddingService(fake_embedding_client), lexical_index=index
+    )
+
+    timings = {}
+    results = processor.retrieve_candidates("What is DOGE?", 4, timings, where={'channel': 'x'})
+
+    assert results['ids'][0] == ['vector-hit', 'lexical-hit']
+    assert collection.get.call_args.kwargs['ids'] == ['lexical-hit']
+    assert collection.get.call_args.kwargs['where'] == {'channel': 'x'}
+    assert 'lexical_ms' in timings
+    scored = processor.score_candidates(results, {'key_terms': ['doge']})
+    assert scored[1]['content'] == 'DOGE budget cuts'
+
+
+def test_filtered_lexical_fusion_looks_past_hits_the_filter_drops(mock_openai_client):
+    from src.lexical_index import LexicalIndex
+    from tests.performance.fakes import FakeCollection
+
+    collection = FakeCollection()
+    ids = [f"lex-{i}" for i in range(4)] + ['huberman-0']
+    channels = ['Lex Fridman'] * 4 + ['Andrew Huberman']
+    documents = ['creatine creatine creatine'] * 4 + ['creatine and sleep']
+    collection.upsert(ids, documents, [{'channel': c} for c in channels], [[0.0] * 4] * 5)
+    index = LexicalIndex()
+    index.add(ids, documents)
+    index.commit()
+    processor = QueryProcessor(collection, mock_openai_client, lexical_index=index)
+
+    empty = {'ids': [[]], 'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+    fused = processor.fuse_lexical(
+        "creatine", [0.0] * 4, empty, 2, where={'channel': 'Andrew Huberman'}
+    )
+    assert fused['ids'] == [['huberman-0']]
+
+
+def test_generate_response_records_prompt_token_counts(mock_openai_client):
+    processor = QueryProcessor(Mock(), mock_openai_client)
+    results = [{
+        'content': "AI and consciousness discussion",
+        'metadata': {'title': 'AI Ethics', 'channel': 'Lex Fridman'},
+        'relevance_score': 0.8
+    }]
+    analysis = {}
+
+    processor.generate_response("What is AI?", results, analysis)
+
+    messages = mock_openai_client.chat.completions.create.call_args.kwargs['messages']
+    assert "AI and consciousness discussion" in messages[1]['content']
+    assert analysis['context']['passages'] == 1
+    assert 0 < analysis['context']['context_tokens'] < analysis['context']['prompt_tokens']
+
+
+def test_process_query_attaches_trace(mock_openai_client, fake_embedding_client):
+    from src.tracing import MetricsRegistry, Tracer
+
+    tracer = Tracer(metrics_registry=MetricsRegistry())
+    processor = QueryProcessor(
+        make_collection(), mock_openai_client, EmbeddingService(fake_embedding_client),
+        tracer=tracer
+    )
+    results, analysis = processor.process_query("What is AI?", max_results=5)
+    processor.generate_response("What is AI?", results, analysis)
+
+    trace = analysis['trace']
+    names = [span['name'] for span in trace['spans']]
+    assert {'analysis', 'retrieval', 'embedding', 'search', 'scoring', 'generation'} <= set(names)
+    assert trace['attributes']['candidates'] == 1
+    generation = trace['spans'][-1]
+    assert generation['attributes']['prompt_tokens'] > 0
+    assert 'stage_duration_ms_count{stage="scoring"} 1' in tracer.metrics.render()
+
+
+def make_episode_collection(segment_count=12):
+    from src.chunking import TranscriptChunker
+    from tests.performance.fakes import FakeCollection
+
+    segments = [
+        {'text': f"segment {i} words here", 'start': i * 5.0, 'duration': 5.0}
+        for i in range(segment_count)
+    ]
+    chunks = list(TranscriptChunker(chunk_tokens=8, stride=4).chunk_transcript(
+        {'transcript': segments}, 'Lex_Fridman', '2024-01-01_ep.json'
+    ))
+    collection = FakeCollection()
+    collection.upsert(
+        ids=[c['id'] for c in chunks],
+        documents=[c['document'] for c in chunks],
+        metadatas=[c['metadata'] for c in chunks],
+        embeddings=[[1.0, 0.0]] * len(chunks)
+    )
+    return collection, chunks, segments
+
+
+def test_expand_context_merges_neighbour_windows_in_one_get(mock_openai_client):
+    collection, chunks, _ = make_episode_collection()
+    processor = QueryProcessor(collection, mock_openai_client, context_window=1)
+    results = [
+        {'id': chunks[i]['id'], 'content': chunks[i]['document'],
+         'metadata': dict(chunks[i]['metadata']), 'relevance_score': score}
+        for i, score in ((3, 0.9), (1, 0.5), (8, 0.4))
+    ]
+    collection.get = Mock(wraps=collection.get)
+    stats = {}
+
+    expanded = processor.expand_context(results, stats=stats)
+
+    assert collection.get.call_count == 1
+    assert stats['neighbour_chunks'] == 5
+    # Chunks 0-4 form one passage at the best hit, chunks 7-9 another
+    assert [r['relevance_score'] for r in expanded] == [0.9, 0.4]
+    first = expanded[0]
+    assert first['metadata']['seg_start'] == chunks[0]['metadata']['seg_start']
+    assert first['metadata']['seg_end'] == chunks[4]['metadata']['seg_end']
+    # Overlapping chunk text appears once
+    assert first['content'] == ' '.join(
+        f"segment {i} words here" for i in range(first['metadata']['seg_end'])
+    )
+
+
+def test_expand_context_reads_neighbours_from_transcript_store(mock_openai_client, tmp_path):
+    from src.transcript_store import TranscriptStore
+
+    collection, chunks, segments = make_episode_collection()
+    store = TranscriptStore(str(tmp_path / 'store'))
+    store.write(chunks[0]['metadata']['episode_id'], segments)
+    processor = QueryProcessor(
+        collection, mock_openai_client, transcript_store=store, context_window=2
+    )
+    collection.get = Mock(wraps=collection.get)
+    hit = chunks[4]
+
+    expanded = processor.build_response_messages("segment", [{
+        'id': hit['id'], 'content': hit['document'],
+        'metadata': dict(hit['metadata']), 'relevance_score': 0.9
+    }])
+
+    assert collection.get.call_args.kwargs['include'] == ['metadatas']
+    assert "segment 2 words here" in expanded[1]['content']
+
+
+def test_comparison_is_searched_with_sub_queries_in_one_batch(mock_openai_client):
+    from tests.performance.fakes import FakeCollection, FakeOpenAI
+
+    openai_client = FakeOpenAI()
+    embedding_service = EmbeddingService(openai_client)
+    texts = [
+        ("Lex Fridman sleep schedule and late nights", 'Lex Fridman'),
+        ("Andrew Huberman sleep protocol morning light", 'Andrew Huberman'),
+        ("Startup fundraising", 'Y Combinator'),
+    ]
+    collection = FakeCollection()
+    collection.upsert(
+        ids=[f"doc-{i}" for i in range(len(texts))],
+        documents=[text for text, _ in texts],
+        metadatas=[{'title': text, 'channel': channel} for text, channel in texts],
+        embeddings=embedding_service.embed_many([text for text, _ in texts])
+    )
+    processor = QueryProcessor(
+        collection, openai_client, embedding_service, classifier_mode='local', max_sub_queries=4
+    )
+    collection.query = Mock(wraps=collection.query)
+    embedding_service.embed_many = Mock(wraps=embedding_service.embed_many)
+
+    results, analysis = processor.process_query(
+        "How do Huberman and Lex Fridman differ on sleep?", max_results=2
+    )
+
+    assert analysis['sub_queries'] == ['Lex Fridman sleep', 'Andrew Huberman sleep']
+    assert embedding_service.embed_many.call_count == 1
+    assert collection.query.call_count == 1
+    assert len(collection.query.call_args.kwargs['query_embeddings']) == 3
+    assert {r['metadata']['channel'] for r in results} == {'Lex Fridman', 'Andrew Huberman'}
+
+
+def test_fuse_rankings_deduplicates_and_keeps_closest_distance():
+    def ranking(ids, distances):
+        return {
+            'ids': [ids], 'documents': [[f"text {i}" for i in ids]],
+            'metadatas': [[{} for _ in ids]], 'distances': [distances]
+        }
+
+    fused = QueryProcessor.fuse_rankings(
+        [ranking(['a', 'b'], [0.1, 0.5]), ranking(['b', 'c'], [0.2, 0.3])], n_results=3
+    )
+
+    assert fused['ids'][0][0] == 'b'
+    assert sorted(fused['ids'][0]) == ['a', 'b', 'c']
+    assert fused['distances'][0][0] == 0.2
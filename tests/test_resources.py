@@ -0,0 +1,85 @@
+import threading
+
+from src.resources import ResourceRegistry
+
+
+def test_resource_created_once():
+    registry = ResourceRegistry()
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return object()
+
+    first = registry.get('client', factory)
+    assert registry.get('client', factory) is first
+    assert len(calls) == 1
+
+
+def test_concurrent_get_builds_once():
+    registry = ResourceRegistry()
+    calls = []
+    started = threading.Event()
+
+    def factory():
+        calls.append(1)
+        started.wait(0.1)
+        return object()
+
+    values = []
+    threads = [
+        threading.Thread(target=lambda: values.append(registry.get('db', factory)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(value is values[0] for value in values)
+
+
+def test_failed_health_check_rebuilds():
+    registry = ResourceRegistry()
+    healthy = {'ok': True}
+
+    def check(_):
+        return healthy['ok']
+
+    first = registry.get('db', object, health_check=check, health_interval=0)
+    assert registry.get('db', object, health_check=check, health_interval=0) is first
+
+    healthy['ok'] = False
+    assert registry.health() == {'db': False}
+    assert registry.get('db', object, health_check=lambda _: True, health_interval=0) is not first
+
+
+def test_invalidate_cascades_to_dependents():
+    registry = ResourceRegistry()
+    registry.get('client', object)
+    registry.get('collection', object, depends_on=('client',))
+    registry.get('processor', object, depends_on=('collection',))
+    registry.get('cache', object)
+
+    registry.invalidate('client')
+
+    assert 'client' not in registry
+    assert 'collection' not in registry
+    assert 'processor' not in registry
+    assert 'cache' in registry
+
+
+def test_factory_error_is_not_cached():
+    registry = ResourceRegistry()
+
+    def failing():
+        raise RuntimeError("database locked")
+
+    try:
+        registry.get('db', failing)
+    except RuntimeError:
+        pass
+    assert 'db' not in registry
+    assert registry.get('db', lambda: 42) == 42
@@ -0,0 +1,51 @@
+import pickle
+from unittest.mock import Mock
+
+from src.query_processor import QueryProcessor
+from src.results import EXCERPT_CHARS, SearchResult
+
+LONG_DOCUMENT = "Sleep is important. " * 200
+
+
+def test_long_documents_are_dropped_and_loaded_on_demand():
+    loader = Mock(return_value=[LONG_DOCUMENT])
+    result = SearchResult.from_document(
+        'chunk-1', LONG_DOCUMENT, {'title': 'Sleep'}, 0.2, 0.9, loader=loader
+    )
+
+    assert not result.has_content
+    assert result['excerpt'] == LONG_DOCUMENT[:EXCERPT_CHARS]
+    assert result['metadata']['title'] == 'Sleep'
+    assert result.get('relevance_score', 0.0) == 0.9
+    assert result.get('missing', 'default') == 'default'
+    loader.assert_not_called()
+    assert result['content'] == LONG_DOCUMENT
+    loader.assert_called_once_with(['chunk-1'])
+    assert not hasattr(result, '__dict__')
+
+
+def test_short_or_unfetchable_documents_are_kept():
+    short = SearchResult.from_document('chunk-1', "Short text", {}, 0.1, 0.5, loader=Mock())
+    orphan = SearchResult.from_document(None, LONG_DOCUMENT, {}, 0.1, 0.5, loader=Mock())
+
+    assert short.has_content and short['content'] == "Short text"
+    assert orphan.has_content and orphan['content'] == LONG_DOCUMENT
+    restored = pickle.loads(pickle.dumps(short))
+    assert restored.to_dict() == short.to_dict()
+
+
+def test_full_text_is_fetched_in_one_batch_for_the_prompt():
+    collection = Mock()
+    collection.get.return_value = {
+        'ids': ['b', 'a'], 'documents': ["B " * 400, "A " * 400]
+    }
+    processor = QueryProcessor(collection, Mock())
+    results = [
+        SearchResult.from_document(i, "x" * 1000, {'title': i}, 0.1, 0.5, processor.load_documents)
+        for i in ('a', 'b')
+    ]
+
+    packed = processor.with_full_text(results)
+
+    collection.get.assert_called_once_with(ids=['a', 'b'], include=['documents'])
+    assert [p['content'][:2] for p in packed] == ['A ', 'B ']
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+import pytest
+from src.query_processor import QueryProcessor
+from src.scoring import BatchRelevanceScorer, parse_dates, semantic_from_distance
+
+RECENT = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+
+DOCUMENTS = [
+    "AI and consciousness discussion about the air we breathe",
+    "Sleep, dreams and the brain",
+    {'text': 'Artificial intelligence and AI safety'},
+    "",
+]
+METADATAS = [
+    {'title': 'AI Ethics', 'channel': 'Lex Fridman', 'published_at': '2024-01-01'},
+    {'title': 'Sleep', 'channel': 'Andrew Huberman', 'published_at': RECENT},
+    {'title': 'Unknown Title', 'channel': 'Unknown Channel', 'published_at': 'Unknown Date'},
+    {'title': 'Company', 'channel': 'Company Podcast'},
+]
+ANALYSES = [
+    {
+        'query_type': 'factual', 'topics': ['AI', 'ethics'],
+        'key_terms': ['AI', 'air', 'ai', 'consciousness']
+    },
+    {'query_type': 'opinion', 'topics': ['sleep'], 'key_terms': ['sleep', 'brain'],
+     'expected_sources': ['Huberman']},
+    {'query_type': 'unknown', 'topics': [], 'key_terms': []},
+]
+
+
+@pytest.mark.parametrize('analysis', ANALYSES)
+def test_batch_scores_match_calculate_content_relevance(analysis):
+    processor = QueryProcessor(None, None)
+    expected = [
+        processor.calculate_content_relevance(doc, meta, analysis)
+        for doc, meta in zip(DOCUMENTS, METADATAS)
+    ]
+    scores = BatchRelevanceScorer(analysis, use_distance=False).score(DOCUMENTS, METADATAS)
+    assert scores == pytest.approx(expected)
+
+
+def test_distance_drives_semantic_component():
+    analysis = ANALYSES[0]
+    scorer = BatchRelevanceScorer(analysis)
+    near, far = scorer.score(DOCUMENTS[:1] * 2, METADATAS[:1] * 2, [0.1, 1.5])
+    assert near > far
+
+
+def test_semantic_from_distance_metrics():
+    assert semantic_from_distance([0.0, 2.0, 4.0], 'l2').tolist() == [1.0, 0.0, 0.0]
+    assert semantic_from_distance([0.25], 'cosine').tolist() == [0.75]
+
+
+def test_parse_dates_handles_invalid_values():
+    dates = parse_dates(['2024-11-11', 'Unknown Date', None, '2024-13-45', '2024-12-02T10:00:00Z'])
+    assert str(dates[0]) == '2024-11-11'
+    assert [str(d) for d in dates[1:4]] == ['NaT'] * 3
+    assert str(dates[4]) == '2024-12-02'
@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+from starlette.testclient import TestClient
+
+from src.service import create_app, parse_query_request, ServiceError
+
+
+class FakeCollection:
+    def count(self):
+        return 3
+
+
+class FakeProcessor:
+    def __init__(self, block=None):
+        self.collection = FakeCollection()
+        self.block = block
+        self.calls = []
+
+    def process_query(self, query, **kwargs):
+        self.calls.append((query, kwargs))
+        if self.block is not None:
+            self.block.wait(5)
+        results = [{'text': 'Sleep matters.', 'relevance_score': np.float32(0.8),
+                    'metadata': {'title': 'Sleep', 'channel': 'Andrew Huberman'}}]
+        return results, {'query_type': 'factual', 'timings': {'total_ms': 1.0}}
+
+    def generate_response(self, query, results, query_analysis):
+        return "Sleep is important [1]."
+
+    def generate_response_stream(self, query, results, query_analysis):
+        yield "Sleep "
+        yield "is important."
+
+
+def make_client(processor, **kwargs):
+    return TestClient(create_app(lambda: processor, **kwargs))
+
+
+def test_search_returns_results_and_analysis():
+    processor = FakeProcessor()
+    with make_client(processor) as client:
+        response = client.post('/search', json={
+            'query': ' sleep ', 'max_results': 3, 'channels': {'Lex Fridman': False},
+            'date_range': ['2024-01-01', None]
+        })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body['results'][0]['relevance_score'] == pytest.approx(0.8)
+    assert body['analysis']['query_type'] == 'factual'
+    query, kwargs = processor.calls[-1]
+    assert query == 'sleep'
+    assert kwargs['max_results'] == 3
+    assert kwargs['channels'] == {'Lex Fridman': False}
+
+
+def test_answer_and_streamed_answer():
+    with make_client(FakeProcessor()) as client:
+        answer = client.post('/answer', json={'query': 'sleep'}).json()
+        streamed = client.post('/answer', json={'query': 'sleep', 'stream': True})
+
+    assert answer['answer'] == "Sleep is important [1]."
+    assert streamed.headers['content-type'].startswith('application/x-ndjson')
+    events = [json.loads(line) for line in streamed.text.splitlines()]
+    assert [e['type'] for e in events] == ['sources', 'token', 'token', 'done']
+    assert ''.join(e['text'] for e in events if e['type'] == 'token') == "Sleep is important."
+
+
+@pytest.mark.parametrize('payload', [
+    {}, {'query': '  '}, {'query': 'sleep', 'max_results': 0}, {'query': 'sleep', 'channels': []}
+])
+def test_invalid_requests_are_rejected(payload):
+    with pytest.raises(ServiceError) as error:
+        parse_query_request(payload)
+    assert error.value.status_code == 400
+
+    with make_client(FakeProcessor()) as client:
+        assert client.post('/search', json=payload).status_code == 400
+
+
+def test_busy_service_sheds_load_and_slow_requests_time_out():
+    release = threading.Event()
+    processor = FakeProcessor(block=release)
+    with make_client(processor, max_concurrency=1, queue_timeout=0.05) as client:
+        first = {}
+        worker = threading.Thread(
+            target=lambda: first.update(response=client.post('/search', json={'query': 'a'}))
+        )
+        worker.start()
+        while not processor.calls:
+            time.sleep(0.01)
+        busy = client.post('/search', json={'query': 'b'})
+        release.set()
+        worker.join()
+
+    assert busy.status_code == 503
+    assert first['response'].status_code == 200
+
+    with make_client(FakeProcessor(block=threading.Event()), request_timeout=0.05) as client:
+        assert client.post('/search', json={'query': 'a'}).status_code == 504
+
+
+def test_health_and_metrics():
+    with make_client(FakeProcessor()) as client:
+        health = client.get('/health').json()
+        metrics = client.get('/metrics')
+
+    assert health['documents'] == 3
+    assert health['status'] in ('ok', 'degraded')
+    assert metrics.status_code == 200
+    assert metrics.headers['content-type'].startswith('text/plain')
+
+
+def test_timed_out_call_keeps_its_slot_until_it_finishes():
+    release = threading.Event()
+    processor = FakeProcessor(block=release)
+    with make_client(
+        processor, max_concurrency=1, request_timeout=0.05, queue_timeout=0.05
+    ) as client:
+        assert client.post('/search', json={'query': 'a'}).status_code == 504
+        # The first call still runs in its thread, so the only slot is taken
+        assert client.post('/search', json={'query': 'b'}).status_code == 503
+        release.set()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            response = client.post('/search', json={'query': 'c'})
+            if response.status_code != 503:
+                break
+        assert response.status_code == 200
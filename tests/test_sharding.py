@@ -0,0 +1,141 @@
+import time
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+from src.filters import build_where_filter
+from src.sharding import ShardedCollection, open_numpy_shards, shard_name
+from tests.performance.fakes import FakeCollection
+
+CHANNELS = ['Lex Fridman', 'Andrew Huberman', 'The Diary Of A CEO']
+
+
+def make_items(count, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [f"chunk-{i}" for i in range(count)]
+    documents = [f"document {i}" for i in range(count)]
+    metadatas = [
+        {'channel': CHANNELS[i % 3], 'published_at_int': 20210101 + (i % 4) * 10000}
+        for i in range(count)
+    ]
+    return ids, documents, metadatas, rng.standard_normal((count, 8)).astype(np.float32)
+
+
+def fake_shards(shard_by='channel', latency=0.0):
+    shards = {}
+
+    def open_shard(name):
+        shards[name] = FakeCollection(latency=latency)
+        return shards[name]
+
+    return ShardedCollection(open_shard, shard_by), shards
+
+
+def test_query_merges_top_k_across_shards_like_one_collection():
+    ids, documents, metadatas, vectors = make_items(90)
+    sharded, shards = fake_shards()
+    single = FakeCollection()
+    for collection in (sharded, single):
+        collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=vectors)
+
+    expected = single.query(query_embeddings=vectors[:2], n_results=7)
+    results = sharded.query(query_embeddings=vectors[:2], n_results=7)
+
+    assert set(shards) == {'lex_fridman', 'andrew_huberman', 'the_diary_of_a_ceo'}
+    assert sharded.count() == 90
+    assert results['ids'] == expected['ids']
+    assert results['metadatas'] == expected['metadatas']
+    np.testing.assert_allclose(results['distances'], expected['distances'])
+
+
+def test_channel_filter_only_queries_matching_shards():
+    ids, documents, metadatas, vectors = make_items(30)
+    sharded, shards = fake_shards()
+    sharded.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=vectors)
+    for shard in shards.values():
+        shard.query = Mock(wraps=shard.query)
+    where = build_where_filter({'Lex Fridman': True, 'Andrew Huberman': False,
+                                'The Diary Of A CEO': False})
+
+    results = sharded.query(query_embeddings=vectors[:1], n_results=5, where=where)
+
+    assert {meta['channel'] for meta in results['metadatas'][0]} == {'Lex Fridman'}
+    assert shards['lex_fridman'].query.call_count == 1
+    assert not shards['andrew_huberman'].query.called
+
+
+def test_year_shards_are_pruned_by_date_range():
+    ids, documents, metadatas, vectors = make_items(40)
+    sharded, shards = fake_shards('year')
+    sharded.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=vectors)
+
+    selected = sharded.select(build_where_filter(date_range=('2022-06-01', '2023-03-01')))
+
+    assert set(shards) == {'2021', '2022', '2023', '2024'}
+    assert set(selected) == {'2022', '2023'}
+    assert shard_name({'published_at_int': 0}, 'year') == 'unknown'
+
+
+def test_shards_are_queried_in_parallel():
+    ids, documents, metadatas, vectors = make_items(30)
+    sharded, _ = fake_shards(latency=0.1)
+    sharded.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=vectors)
+
+    start = time.perf_counter()
+    sharded.query(query_embeddings=vectors[:1], n_results=5)
+
+    assert time.perf_counter() - start < 0.25
+
+
+def test_get_delete_and_paging_span_shards():
+    ids, documents, metadatas, vectors = make_items(30)
+    sharded, _ = fake_shards()
+    sharded.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=vectors)
+
+    fetched = sharded.get(ids=['chunk-0', 'chunk-1'], include=['documents'])
+    assert sorted(fetched['documents']) == ['document 0', 'document 1']
+
+    sharded.delete(['chunk-0', 'chunk-1'])
+    pages = [sharded.get(include=['documents'], limit=7, offset=offset)['ids']
+             for offset in range(0, 28, 7)]
+    paged = [item_id for page in pages for item_id in page]
+    assert len(paged) == 28 and len(set(paged)) == 28
+    assert 'chunk-0' not in paged
+
+
+def test_upsert_moves_a_chunk_whose_year_changed():
+    ids, documents, metadatas, vectors = make_items(8)
+    sharded, shards = fake_shards('year')
+    sharded.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=vectors)
+
+    sharded.upsert(['chunk-0'], ['document 0'], [{'published_at_int': 20240301}], vectors[:1])
+
+    assert 'chunk-0' not in shards['2021'].get(include=[])['ids']
+    assert 'chunk-0' in shards['2024'].get(include=[])['ids']
+    assert sharded.count() == 8
+    assert sharded.get(ids=['chunk-0'], include=['metadatas'])['metadatas'] == [
+        {'published_at_int': 20240301}
+    ]
+
+
+def test_numpy_shards_are_discovered_after_reopen(tmp_path):
+    ids, documents, metadatas, vectors = make_items(30)
+    sharded = open_numpy_shards(str(tmp_path / 'shards'), 'channel')
+    sharded.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=vectors)
+    sharded.flush()
+
+    reopened = open_numpy_shards(str(tmp_path / 'shards'), 'channel')
+
+    assert reopened.count() == 30
+    assert reopened.query(query_embeddings=vectors[:1], n_results=1)['ids'] == [['chunk-0']]
+    assert reopened.is_current()
+    other = open_numpy_shards(str(tmp_path / 'shards'), 'channel')
+    other.upsert(['new'], ['new'], [{'channel': 'Y Combinator'}], vectors[:1])
+    other.flush()
+    assert not reopened.is_current()
+
+
+def test_shard_key_is_validated():
+    with pytest.raises(ValueError):
+        ShardedCollection(lambda name: FakeCollection(), shard_by='guest')
@@ -0,0 +1,76 @@
+import json
+import urllib.request
+
+import pytest
+
+from src.tracing import JsonLinesExporter, MetricsRegistry, Span, Tracer, start_metrics_server
+
+
+def test_trace_records_spans_and_errors(tmp_path):
+    metrics = MetricsRegistry()
+    tracer = Tracer(JsonLinesExporter(str(tmp_path / 'traces.jsonl')), metrics)
+
+    trace = tracer.start('process_query', max_results=5)
+    with trace.span('analysis') as span:
+        span.set(query_type='factual')
+    trace.record('embedding', 12.5, parent='retrieval')
+    with pytest.raises(ValueError):
+        with trace.span('scoring'):
+            raise ValueError("bad candidate")
+    record = tracer.finish(trace)
+
+    spans = {s['name']: s for s in record['spans']}
+    assert spans['analysis']['attributes'] == {'query_type': 'factual'}
+    assert spans['embedding']['duration_ms'] == 12.5
+    assert spans['embedding']['parent'] == 'retrieval'
+    assert spans['scoring']['error'] == "ValueError: bad candidate"
+
+    exported = [json.loads(line) for line in open(tmp_path / 'traces.jsonl')]
+    assert exported[0]['trace_id'] == record['trace_id']
+
+
+def test_late_span_is_appended_and_exported(tmp_path):
+    tracer = Tracer(JsonLinesExporter(str(tmp_path / 'traces.jsonl')), MetricsRegistry())
+    record = tracer.finish(tracer.start('process_query'))
+
+    span = Span('generation', stream=True)
+    span.duration_ms = 250.0
+    span.set(prompt_tokens=900, completion_tokens=120)
+    tracer.add_span(record, span)
+
+    assert record['spans'][-1]['name'] == 'generation'
+    lines = [json.loads(line) for line in open(tmp_path / 'traces.jsonl')]
+    assert lines[-1] == {'trace_id': record['trace_id'], 'span': record['spans'][-1]}
+    rendered = tracer.metrics.render()
+    assert 'podcast_insights_prompt_tokens_total 900' in rendered
+    assert 'podcast_insights_completion_tokens_total 120' in rendered
+
+
+def test_prometheus_rendering():
+    metrics = MetricsRegistry()
+    metrics.observe('search', 7)
+    metrics.observe('search', 700)
+    metrics.increment('cache_lookups_total', tier='exact')
+    metrics.increment('stage_errors_total', stage='a"b')
+
+    text = metrics.render()
+    assert '# TYPE podcast_insights_stage_duration_ms histogram' in text
+    assert 'podcast_insights_stage_duration_ms_bucket{le="5",stage="search"} 0' in text
+    assert 'podcast_insights_stage_duration_ms_bucket{le="10",stage="search"} 1' in text
+    assert 'podcast_insights_stage_duration_ms_bucket{le="+Inf",stage="search"} 2' in text
+    assert 'podcast_insights_stage_duration_ms_count{stage="search"} 2' in text
+    assert 'podcast_insights_cache_lookups_total{tier="exact"} 1' in text
+    assert 'podcast_insights_stage_errors_total{stage="a\\"b"} 1' in text
+
+
+def test_metrics_server():
+    metrics = MetricsRegistry()
+    metrics.increment('requests_total')
+    server = start_metrics_server(0, metrics, host='127.0.0.1')
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert b'podcast_insights_requests_total 1' in response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
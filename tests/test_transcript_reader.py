@@ -0,0 +1,60 @@
+import hashlib
+import json
+import pytest
+from src.transcript_reader import TranscriptReader
+
+
+@pytest.fixture
+def transcript_file(tmp_path):
+    data = {
+        'metadata': {'channel_name': 'Lex Fridman', 'published_at': '2024-11-11'},
+        'transcript': [
+            {'text': 'café "quoted"\nline', 'start': 0.09, 'duration': 1.86},
+            {'text': 'back\\slash', 'start': 1234.5, 'duration': 2.0},
+        ],
+        'full_text': 'x\\"y ' * 500,
+    }
+    path = tmp_path / 'episode.json'
+    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding='utf-8')
+    return path, data
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 1 << 16])
+def test_reader_matches_json_load(transcript_file, block_size):
+    path, data = transcript_file
+    reader = TranscriptReader(str(path), block_size=block_size)
+    assert list(reader.iter_segments()) == data['transcript']
+    assert reader.metadata == data['metadata']
+    assert reader.digest == hashlib.md5(path.read_bytes()).hexdigest()
+
+
+def test_reader_handles_any_key_order(tmp_path):
+    path = tmp_path / 'episode.json'
+    path.write_text(json.dumps({
+        'full_text': 'skipped',
+        'transcript': [{'text': 'a', 'start': 0, 'duration': 1}],
+        'extra': {'nested': [1, 2]},
+        'metadata': {'video_id': 'abc'},
+    }))
+    reader = TranscriptReader(str(path), block_size=3)
+    assert [s['text'] for s in reader.iter_segments()] == ['a']
+    assert reader.metadata == {'video_id': 'abc'}
+
+
+def test_reader_keeps_full_text_only_without_segments(tmp_path, transcript_file):
+    path = tmp_path / 'text_only.json'
+    path.write_text(json.dumps({'transcript': [], 'full_text': 'whole episode'}))
+    reader = TranscriptReader(str(path), block_size=3)
+    assert list(reader.iter_segments()) == []
+    assert reader.untimed_text == 'whole episode'
+
+    reader = TranscriptReader(str(transcript_file[0]))
+    list(reader.iter_segments())
+    assert reader.full_text is None and reader.untimed_text is None
+
+
+def test_reader_rejects_truncated_file(tmp_path):
+    path = tmp_path / 'episode.json'
+    path.write_text('{"transcript": [{"text": "a"')
+    with pytest.raises(ValueError):
+        list(TranscriptReader(str(path)).iter_segments())
@@ -0,0 +1,135 @@
+import json
+import os
+from unittest.mock import Mock
+
+from src.chunking import TranscriptChunker
+from src.embeddings import EmbeddingService
+from src.ingest_manifest import IngestManifest
+from src.ingestion import TranscriptIngestor
+from src.query_processor import QueryProcessor
+from src.results import SearchResult
+from src.transcript_store import TranscriptStore
+from tests.performance.fakes import FakeCollection, FakeOpenAI
+
+SEGMENTS = [
+    {'text': 'Bonjour  à tous,\nbienvenue', 'start': 0.0, 'duration': 2.5},
+    {'text': '   ', 'start': 2.5, 'duration': 0.5},
+    {'text': 'le café ☕ est prêt', 'start': 3.0, 'duration': 4.0},
+    {'text': 'parlons de sommeil', 'start': 7.0, 'duration': 3.0},
+    {'text': 'et de mélatonine', 'start': 3735.0, 'duration': 5.0},
+]
+
+
+def write_transcript(base, channel, filename, segments):
+    path = base / channel / filename
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        'metadata': {'channel_name': channel.replace('_', ' ')},
+        'transcript': segments,
+        'full_text': ' '.join(s['text'] for s in segments),
+    }), encoding='utf-8')
+    return path
+
+
+def test_slices_match_chunk_documents_and_time_lookup(tmp_path):
+    store = TranscriptStore(str(tmp_path / 'store'))
+    assert store.write('ep', SEGMENTS) == 4
+
+    episode = store.open('ep')
+    # Empty segments are dropped, as by the chunker, so seg ranges line up
+    for chunk in TranscriptChunker(chunk_tokens=4, stride=2).chunk_segments(SEGMENTS):
+        assert episode.text(chunk['seg_start'], chunk['seg_end']) == chunk['text']
+    assert isinstance(episode.text_bytes(1, 3), memoryview)
+    assert episode.segment(1) == {'text': 'le café ☕ est prêt', 'start': 3.0, 'duration': 4.0}
+
+    assert episode.segment_at(0) == 0
+    assert episode.segment_at(5.2) == 1
+    assert episode.segment_at(3735 + 1) == 3
+    assert episode.segments_between(4.0, 3735.0) == (1, 3)
+    passage = episode.passage_at(8.0, before=1, after=5)
+    assert passage['seg_start'] == 1 and passage['seg_end'] == 4
+    assert passage['start'] == 3.0 and passage['end'] == 3740.0
+    # Excerpts never cut a multi-byte character
+    assert episode.excerpt(1, 2, max_chars=10) == 'le café ☕ '
+
+
+def test_rewrite_is_seen_by_open_and_delete_removes(tmp_path):
+    store = TranscriptStore(str(tmp_path / 'store'))
+    store.write('ep', SEGMENTS[:1], digest='a')
+    first = store.open('ep')
+    store.write('ep', SEGMENTS, digest='b')
+
+    assert first.text() == 'Bonjour à tous, bienvenue'
+    assert len(store.open('ep')) == 4
+    assert store.digest('ep') == 'b'
+    assert store.episode_ids() == ['ep']
+    store.delete('ep')
+    assert 'ep' not in store and store.open('ep') is None
+
+
+def test_convert_directory_skips_unchanged_and_removes_deleted(tmp_path):
+    base = tmp_path / 'transcripts'
+    path = write_transcript(base, 'Lex_Fridman', '2024-01-01_a.json', SEGMENTS)
+    write_transcript(base, 'Lex_Fridman', '2024-01-02_b.json', SEGMENTS[:2])
+    store = TranscriptStore(str(tmp_path / 'store'))
+
+    assert store.convert_directory(str(base))['converted'] == 2
+    path.unlink()
+    stats = store.convert_directory(str(base))
+
+    assert stats == {'converted': 0, 'unchanged': 1, 'removed': 1, 'failed': 0}
+    assert store.episode_ids() == ['Lex_Fridman_2024-01-02_b.json']
+
+
+def test_ingestion_packs_transcripts_used_for_full_text(tmp_path):
+    base = tmp_path / 'transcripts'
+    write_transcript(base, 'Lex_Fridman', '2024-01-01_a.json', SEGMENTS * 60)
+    openai_client = FakeOpenAI()
+    embedding_service = EmbeddingService(openai_client)
+    collection = FakeCollection()
+    store = TranscriptStore(str(tmp_path / 'store'))
+    TranscriptIngestor(
+        collection, str(base), IngestManifest(str(tmp_path / 'manifest.json')),
+        embedding_service=embedding_service, transcript_store=store
+    ).sync()
+    processor = QueryProcessor(
+        collection, openai_client, embedding_service, classifier_mode='local',
+        transcript_store=store
+    )
+    stored = collection.get(include=['documents', 'metadatas'])
+    results = [
+        SearchResult.from_document(item_id, document, metadata, 0.1, 0.9, processor.load_documents)
+        for item_id, document, metadata in zip(
+            stored['ids'], stored['documents'], stored['metadatas']
+        )
+    ]
+    collection.get = Mock(side_effect=AssertionError("read from the transcript store"))
+
+    full = processor.with_full_text(results)
+
+    assert [r['content'] for r in full] == stored['documents']
+
+
+def test_ingestion_packs_from_pooled_segments_only_when_changed(tmp_path):
+    base = tmp_path / 'transcripts'
+    path = write_transcript(base, 'Lex_Fridman', '2024-01-01_a.json', SEGMENTS)
+    store = TranscriptStore(str(tmp_path / 'store'))
+    ingestor = TranscriptIngestor(
+        FakeCollection(), str(base), IngestManifest(str(tmp_path / 'manifest.json')),
+        embedding_service=EmbeddingService(FakeOpenAI()), transcript_store=store
+    )
+    store.convert_file = Mock(side_effect=AssertionError("transcript parsed twice"))
+    ingestor.sync()
+    store.write = Mock(wraps=store.write)
+
+    # Touched but unchanged: already stored under that digest, nothing rewritten
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 60))
+    stats = ingestor.sync()
+    assert stats['unchanged'] == 1
+    assert not store.write.called
+
+    write_transcript(base, 'Lex_Fridman', '2024-01-01_a.json', SEGMENTS[:3])
+    ingestor.sync()
+    assert store.write.call_count == 1
+    episode = store.open('Lex_Fridman_2024-01-01_a.json')
+    assert episode.text(0, 2) == 'Bonjour à tous, bienvenue le café ☕ est prêt'
@@ -1,6 +1,7 @@
 import pytest
 from src.ui_components import UIComponents
 
+
 def test_create_controls(mocker):
     ui = UIComponents()
     # Mock streamlit components
@@ -13,6 +14,7 @@ def test_create_controls(mocker):
     assert 'query' in controls
     assert 'max_sources' in controls
 
+
 def test_display_results(mocker):
     ui = UIComponents()
     results = [{
@@ -30,4 +32,14 @@ def test_display_results(mocker):
     mocker.patch('streamlit.markdown')
     mocker.patch('streamlit.expander')
     
-    ui.display_results(results, analysis)
\ No newline at end of file
+    ui.display_results(results, analysis)
+
+
+def test_render_stream(mocker):
+    ui = UIComponents()
+    placeholder = mocker.Mock()
+    mocker.patch('streamlit.empty', return_value=placeholder)
+
+    text = ui.render_stream(iter(['Hello', ' world']))
+    assert text == 'Hello world'
+    placeholder.markdown.assert_called_with('Hello world')
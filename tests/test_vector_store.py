@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from src.embeddings import EmbeddingService
+from src.filters import build_where_filter
+from src.query_processor import QueryProcessor
+from src.vector_store import NumpyVectorStore, matches_where
+from tests.performance.fakes import FakeOpenAI
+
+CHANNELS = ['Lex Fridman', 'Andrew Huberman', 'Y Combinator']
+
+
+def make_items(count, dimensions=16, seed=0):
+    rng = np.random.default_rng(seed)
+    # Clustered vectors, closer to real embeddings than uniform noise
+    centers = rng.standard_normal((8, dimensions))
+    vectors = centers[rng.integers(0, 8, count)] + 0.3 * rng.standard_normal((count, dimensions))
+    ids = [f"chunk-{i}" for i in range(count)]
+    documents = [f"document {i}" for i in range(count)]
+    metadatas = [
+        {'channel': CHANNELS[i % 3], 'published_at_int': 20230101 + i, 'episode_id': f"ep{i // 4}"}
+        for i in range(count)
+    ]
+    return ids, documents, metadatas, vectors.astype(np.float32)
+
+
+def exact_neighbours(vectors, query, k, mask=None):
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    if mask is not None:
+        distances[~mask] = np.inf
+    return set(np.argsort(distances)[:k].tolist())
+
+
+def test_query_and_get_match_exact_search_across_reopen(tmp_path):
+    ids, documents, metadatas, vectors = make_items(200)
+    store = NumpyVectorStore(str(tmp_path / 'store'), index='flat')
+    store.upsert(ids, documents, metadatas, vectors)
+    before_flush = store.query([vectors[0]], n_results=5)
+    store.flush()
+
+    reopened = NumpyVectorStore(str(tmp_path / 'store'), index='flat')
+    results = reopened.query([vectors[0], vectors[1]], n_results=5)
+
+    assert reopened.count() == 200
+    assert results['ids'][0] == before_flush['ids'][0]
+    assert results['ids'][0][0] == 'chunk-0'
+    assert results['distances'][0][0] == pytest.approx(0.0, abs=1e-4)
+    assert {int(i.split('-')[1]) for i in results['ids'][1]} == exact_neighbours(
+        vectors, vectors[1], 5
+    )
+    fetched = reopened.get(ids=['chunk-3', 'missing'], include=['documents', 'embeddings'])
+    assert fetched['ids'] == ['chunk-3']
+    assert fetched['documents'] == ['document 3']
+    np.testing.assert_allclose(fetched['embeddings'][0], vectors[3], atol=1e-6)
+    page = reopened.get(include=['documents'], limit=50, offset=150)
+    assert page['ids'][0] == 'chunk-150' and len(page['ids']) == 50
+
+
+def test_where_filters_are_applied_before_ranking(tmp_path):
+    ids, documents, metadatas, vectors = make_items(300)
+    store = NumpyVectorStore(str(tmp_path / 'store'), index='flat')
+    store.upsert(ids, documents, metadatas, vectors)
+    store.flush()
+    where = build_where_filter({'Lex Fridman': False}, ('2023-02-01', None))
+
+    results = store.query([vectors[0]], n_results=10, where=where)
+
+    assert len(results['ids'][0]) == 10
+    assert all(matches_where(meta, where) for meta in results['metadatas'][0])
+    mask = np.array([matches_where(meta, where) for meta in metadatas])
+    assert {int(i.split('-')[1]) for i in results['ids'][0]} == exact_neighbours(
+        vectors, vectors[0], 10, mask
+    )
+    # Fields without a column fall back to the stored metadata
+    assert store.get(where={'episode_id': 'ep2'})['ids'] == [f"chunk-{i}" for i in range(8, 12)]
+
+
+def test_upserts_and_deletes_are_visible_before_and_after_flush(tmp_path):
+    ids, documents, metadatas, vectors = make_items(20)
+    store = NumpyVectorStore(str(tmp_path / 'store'))
+    store.upsert(ids, documents, metadatas, vectors)
+    store.flush()
+
+    store.delete(['chunk-0', 'chunk-1'])
+    store.upsert(['chunk-2'], ['rewritten'], [metadatas[2]], [vectors[5]])
+    for current in (store, None):
+        if current is None:
+            store.flush()
+            current = NumpyVectorStore(str(tmp_path / 'store'))
+        assert current.count() == 18
+        assert current.get(ids=['chunk-0', 'chunk-2'])['documents'] == ['rewritten']
+        assert 'chunk-0' not in current.query([vectors[0]], n_results=20)['ids'][0]
+    assert len(list((tmp_path / 'store').glob('v*'))) == 1
+
+
+@pytest.mark.parametrize('dtype,index', [('float16', 'flat'), ('int8', 'flat'), ('float32', 'ivf')])
+def test_quantized_and_ivf_search_keep_recall(tmp_path, dtype, index):
+    ids, documents, metadatas, vectors = make_items(2000, dimensions=32)
+    store = NumpyVectorStore(str(tmp_path / 'store'), dtype=dtype, index=index, nprobe=16)
+    store.upsert(ids, documents, metadatas, vectors)
+    store.flush()
+
+    recalls = []
+    for query in vectors[:20] + 0.05:
+        found = {int(i.split('-')[1]) for i in store.query([query], n_results=10)['ids'][0]}
+        recalls.append(len(found & exact_neighbours(vectors, query, 10)) / 10)
+    assert np.mean(recalls) >= 0.8
+
+
+def test_query_processor_runs_on_numpy_store(tmp_path):
+    openai_client = FakeOpenAI()
+    embedding_service = EmbeddingService(openai_client)
+    texts = ["Sleep and melatonin", "Startup fundraising", "Consciousness and AI"]
+    store = NumpyVectorStore(str(tmp_path / 'store'))
+    store.upsert(
+        [f"doc-{i}" for i in range(3)], texts,
+        [{'title': t, 'channel': c} for t, c in zip(texts, CHANNELS)],
+        embedding_service.embed_many(texts)
+    )
+    processor = QueryProcessor(store, openai_client, embedding_service, classifier_mode='local')
+
+    results, analysis = processor.process_query("Sleep and melatonin", max_results=1)
+
+    assert results[0]['content'] == "Sleep and melatonin"
+    assert analysis['results_found'] == 1